@@ -0,0 +1,170 @@
+"""
+Batch BOM sourcing for many projects at once (e.g. a whole classroom cohort).
+
+    python -m agents.bill_of_material.batch_bom projects.jsonl results.jsonl
+
+Each input line is a JSON object with an "id" and a "description". Results
+are appended to the output file as each project finishes, one JSON line per
+project. Every unique part name is searched only once across the batch.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from agents.bill_of_material.bom_stream import ClarificationNeeded
+from agents.bill_of_material.cli_bom import (
+    PROMPT_INSTRUCTION, call_gemini, make_part_sourcer, parse_bom,
+)
+from database.sqlite_demo.part_cache import normalize_query
+from middleware.llm_scheduler import BATCH, llm_priority
+from middleware.resources import get_http_client, close_http_client
+
+# Projects whose BOM extraction and sourcing run at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def read_projects(path):
+    projects = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            projects.append({
+                "id": record.get("id", line_no),
+                "description": record.get("description") or record.get("project_description", ""),
+            })
+    return projects
+
+
+class BatchSourcer:
+    """Sources BOM items for a whole batch, searching each unique part name once."""
+
+    def __init__(self, http_client):
+        # One sourcer serves every project in the batch; only per-part deadlines apply
+        self._source_one = make_part_sourcer(http_client, bom_deadline=0)
+        self._lookups = {}
+        self.requested = 0
+
+    @property
+    def unique(self):
+        return len(self._lookups)
+
+    async def source(self, item):
+        part_name = item.get("part", "")
+        key = normalize_query(part_name)
+        self.requested += 1
+        if key not in self._lookups:
+            self._lookups[key] = asyncio.ensure_future(
+                self._source_one({"part": part_name, "quantity": 1}))
+        entry = dict(await self._lookups[key])
+        entry["part"] = part_name
+        entry["quantity"] = item.get("quantity", 1)
+        return entry
+
+
+async def run_project(project, sourcer):
+    started = time.perf_counter()
+    result = {"id": project["id"]}
+    try:
+        response_text = await call_gemini([
+            {"role": "user", "content": PROMPT_INSTRUCTION},
+            {"role": "user", "content": project["description"]},
+        ])
+        bom = parse_bom(response_text)
+        result["status"] = "ok"
+        result["sourced_parts"] = await asyncio.gather(*(sourcer.source(item) for item in bom))
+    except ClarificationNeeded as e:
+        result["status"] = "clarification"
+        result["message"] = e.text
+    except Exception as e:
+        result["status"] = "error"
+        result["message"] = str(e)
+    result["latency_s"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+async def run_batch(projects, output_path, concurrency=None, http_client=None):
+    """
+    Run BOM extraction and sourcing for every project with bounded
+    parallelism, streaming results to output_path as they complete.
+    Returns a summary with throughput, latency percentiles and dedup savings.
+    """
+    sourcer = BatchSourcer(http_client or get_http_client())
+    limit = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+
+    async def limited(project):
+        async with limit:
+            return await run_project(project, sourcer)
+
+    started = time.perf_counter()
+    latencies = []
+    statuses = {}
+    # Batch Gemini calls queue behind interactive UI traffic for the shared quota
+    with llm_priority(BATCH), open(output_path, "w", encoding="utf-8") as out:
+        for finished in asyncio.as_completed([limited(p) for p in projects]):
+            result = await finished
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            latencies.append(result["latency_s"])
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "projects": len(projects),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_projects_per_s": round(len(projects) / elapsed, 3) if elapsed else 0.0,
+        "latency_s": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        "part_lookups": {
+            "requested": sourcer.requested,
+            "searched": sourcer.unique,
+            "saved": sourcer.requested - sourcer.unique,
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Source BOMs for many projects at once.")
+    parser.add_argument("input", help="JSONL file of {\"id\", \"description\"} projects")
+    parser.add_argument("output", help="JSONL file to write per-project results to")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="projects processed at the same time")
+    args = parser.parse_args()
+
+    projects = read_projects(args.input)
+    print(f"Sourcing {len(projects)} projects (concurrency {args.concurrency}) ...")
+    try:
+        summary = await run_batch(projects, args.output, args.concurrency)
+    finally:
+        await close_http_client()
+
+    latency = summary["latency_s"]
+    lookups = summary["part_lookups"]
+    print(f"Done in {summary['elapsed_s']}s — {summary['throughput_projects_per_s']} projects/s")
+    print(f"Statuses: {summary['statuses']}")
+    print(f"Latency p50 {latency['p50']}s · p95 {latency['p95']}s · p99 {latency['p99']}s")
+    print(f"Part searches: {lookups['searched']} for {lookups['requested']} BOM lines "
+          f"({lookups['saved']} saved by dedup)")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+import json
+
+
+class ClarificationNeeded(Exception):
+    """Raised when the model asks a question instead of returning a BOM."""
+
+    def __init__(self, text):
+        super().__init__(text)
+        self.text = text
+
+
+class BomStreamParser:
+    """
+    Incrementally extracts BOM items from streamed model output of the form
+    'BOM: [ {...}, {...} ]'. feed() returns every item object completed by the
+    new chunk, so sourcing can start before the model finishes the array.
+    Scanning stops at the ']' closing the array: objects in any prose or code
+    after it are not BOM items.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.items_seen = 0
+        self._pos = None  # scan position; None until the opening '[' is found
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escape = False
+        self.finished = False
+
+    @property
+    def is_bom(self):
+        """True/False once the response prefix is known, None while still undecided."""
+        head = self.text.lstrip()
+        if len(head) < len("BOM:"):
+            return None
+        return head.startswith("BOM:")
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self.finished:
+            return []
+        if self._pos is None:
+            if not self.is_bom:
+                return []
+            array_start = self.text.find("[", self.text.index("BOM:"))
+            if array_start < 0:
+                return []
+            self._pos = array_start + 1
+
+        items = []
+        text = self.text
+        end = len(text)
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "]" and self._depth == 0:
+                self.finished = True
+                end = i + 1
+                break
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(json.loads(text[self._start:i + 1]))
+                    except json.JSONDecodeError as e:
+                        print(f"[ERROR] Skipping unparsable BOM item: {e}")
+        self._pos = end
+        self.items_seen += len(items)
+        return items
@@ -1,23 +1,60 @@
 import streamlit as st
-import json
+from database.sqlite_demo.project_store import get_project_store
+from frontend.rendering import option_labels
+from frontend.project_picker import session_project_id
+from agents.bill_of_material.cost_optimizer import optimize_selection, landed_cost
 
-# Load sourced parts from JSON file
+# Load the sourced parts of the project picked for this session
 
 
-def load_sourced_parts(json_path="sourced_parts.json"):
+@st.cache_data(max_entries=32)
+def _load_project(project_id, version):
+    # `version` keys the cache: reruns reuse the loaded project until it changes
+    return get_project_store().load_project(project_id)
+
+
+def load_sourced_parts(project_id):
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        store = get_project_store()
+        version = store.project_version(project_id) if project_id else None
+        if version is None:
+            return None, [], {}
+        project = _load_project(project_id, version)
+        return project_id, project["parts"], project["selections"]
     except Exception as e:
         st.error(f"Error loading sourced parts: {e}")
-        return []
+        return None, [], {}
 
 
 st.title("BOM Parts Purchase Selector")
 
-sourced_parts = load_sourced_parts()
+@st.cache_data(max_entries=32)
+def _optimize(project_id, version, max_vendors, budget):
+    project = _load_project(project_id, version)
+    return optimize_selection(project["parts"], max_vendors=max_vendors or None, budget=budget)
+
+
+project_id, sourced_parts, saved_selections = load_sourced_parts(session_project_id())
+optimized = None
+if sourced_parts:
+    max_vendors = st.sidebar.number_input("Max vendors (0 = no limit)", min_value=0, value=0, step=1)
+    # Same formats as the chat answer ("₹2,500", "$50", "1000-1500"); blank means no budget check
+    budget = st.sidebar.text_input("Budget", placeholder="e.g. ₹3000").strip() or None
+    optimized = _optimize(project_id, get_project_store().project_version(project_id),
+                          int(max_vendors), budget)
+    st.markdown(
+        f"**Lowest landed cost: ₹{optimized['total']:.2f}** "
+        f"(items ₹{optimized['items_total']:.2f} + shipping ₹{optimized['shipping_total']:.2f} "
+        f"from {len(optimized['vendors'])} vendor(s))")
+    if optimized["within_budget"] is False:
+        st.warning(f"Even the cheapest selection exceeds the budget of ₹{optimized['budget']:.2f}.")
+    if optimized["uncovered"]:
+        st.warning("Not available within the vendor limit: " + ", ".join(optimized["uncovered"]))
 
-if not sourced_parts:
+if project_id is None:
+    st.info("Choose one of this session's projects in the sidebar, "
+            "or open this page with ?session=<token>&project=<id>.")
+elif not sourced_parts:
     st.warning("No sourced parts found. Please run the BOM sourcing agent first.")
 else:
     selected_parts = []
@@ -25,18 +62,22 @@ else:
         st.subheader(f"{part['part']} (Qty: {part['quantity']})")
         options = part["options"]
         if options:
-            option_labels = [
-                f"{opt['name']} | ₹{opt['price']} | [Link]({opt['link']})" for opt in options]
-            selected = st.radio(
+            labels = option_labels(options)
+            # Saved choices win; otherwise start from the optimized selection
+            saved_idx = saved_selections.get(part["position"], optimized["selections"].get(part["part"]))
+            # The radio's value is the option index itself, so no label lookup
+            selected_idx = st.radio(
                 f"Select option for {part['part']}",
-                option_labels,
-                key=part['part']
+                range(len(options)),
+                index=saved_idx if saved_idx is not None and saved_idx < len(options) else 0,
+                format_func=labels.__getitem__,
+                key=f"line_{part['position']}"
             )
-            # Find the selected option
-            selected_idx = option_labels.index(selected)
             selected_parts.append({
+                "position": part["position"],
                 "part": part["part"],
                 "quantity": part["quantity"],
+                "selected_index": selected_idx,
                 "selected_option": options[selected_idx]
             })
         else:
@@ -53,7 +94,12 @@ else:
                 f"{item['part']} (Qty: {qty}) - {opt['name']} | ₹{price} | [Link]({opt['link']})")
             total_cost += price * qty
         st.markdown(f"**Total Cost: ₹{total_cost:.2f}**")
-        # Optionally, save the user's selection to a file
-        with open("selected_parts.json", "w", encoding="utf-8") as f:
-            json.dump(selected_parts, f, indent=2, ensure_ascii=False)
-        st.info("Selection saved to selected_parts.json")
+        chosen = {item["position"]: item["selected_index"] for item in selected_parts}
+        landed = landed_cost(sourced_parts, [chosen.get(part["position"]) for part in sourced_parts])
+        st.markdown(f"**Landed Cost (incl. shipping): ₹{landed['total']:.2f}**")
+        # Upsert the selections for this project only
+        get_project_store().save_selections(project_id, [
+            (item["position"], item["selected_index"], item["selected_option"])
+            for item in selected_parts
+        ])
+        st.info(f"Selection saved to project {project_id}")
@@ -1,67 +1,438 @@
 import os
 import asyncio
-from google import genai
 import httpx
-from bs4 import BeautifulSoup
 import json
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+from middleware.retry import retry_async, gather_limited, is_retryable
+from middleware.circuit_breaker import CircuitBreaker, OPEN
+from middleware.hedging import Hedger
+from database.sqlite_demo.part_cache import get_part_cache, normalize_query
+from database.sqlite_demo.llm_cache import get_llm_cache, cache_key
+from database.sqlite_demo.parts_catalog import get_parts_catalog
+from database.sqlite_demo.project_store import get_project_store
+from middleware.resources import get_genai_client, get_http_client, close_http_client
+from agents.bill_of_material.bom_stream import BomStreamParser, ClarificationNeeded
+from agents.bill_of_material.conversation import Conversation, render_turn
+from middleware.singleflight import SingleFlight
+from middleware.llm_scheduler import scheduled_async, scheduled_async_stream, estimate_tokens
+from middleware.tracing import span, current_span, register_gauges
+from agents.bill_of_material.part_ranking import QueryProfile, rank_options
+
+# The Gemini client (Google AI Studio key) and the pooled HTTP client are
+# owned by middleware.resources and shared across calls.
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+# How many independent LLM calls call_gemini_many runs at once
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+
+FINDPARTS_SEARCH_URL = "https://search.findparts.in/search"
+FINDPARTS_FILTERS = json.dumps({"vendors": []}, separators=(",", ":"))
+# Result pages fetched per search when the first page has too few relevant hits
+SEARCH_MAX_PAGES = int(os.getenv("SEARCH_MAX_PAGES", "2"))
+# Catalog entries handed to the ranking stage per offline lookup
+CATALOG_CANDIDATES = int(os.getenv("CATALOG_CANDIDATES", "20"))
+
+# Sourcing concurrency: in-flight part lookups across all pipelines on an
+# event loop, and in-flight HTTP requests per search host
+SOURCING_CONCURRENCY = int(os.getenv("SOURCING_CONCURRENCY", "8"))
+SOURCING_PER_HOST_LIMIT = int(os.getenv("SOURCING_PER_HOST_LIMIT", "4"))
+
+# Tail-latency controls for part search: a timeout per HTTP request, retries
+# for 429/5xx/dropped connections, and deadlines per part lookup and per BOM
+# (seconds, 0 disables). Lookups past a deadline are served from the last
+# known cached result when there is one, else reported as failed.
+SEARCH_REQUEST_TIMEOUT = float(os.getenv("SEARCH_REQUEST_TIMEOUT", "5"))
+SEARCH_RETRIES = int(os.getenv("SEARCH_RETRIES", "3"))
+PART_DEADLINE = float(os.getenv("PART_DEADLINE", "10"))
+BOM_DEADLINE = float(os.getenv("BOM_DEADLINE", "30"))
+# A duplicate search request fires once one is slower than the observed p95
+SEARCH_HEDGE_QUANTILE = float(os.getenv("SEARCH_HEDGE_QUANTILE", "0.95"))
+SEARCH_HEDGE_MAX_RATIO = float(os.getenv("SEARCH_HEDGE_MAX_RATIO", "0.1"))
+# Consecutive failures that open the search circuit, and seconds until it is probed again
+SEARCH_BREAKER_THRESHOLD = int(os.getenv("SEARCH_BREAKER_THRESHOLD", "5"))
+SEARCH_BREAKER_RESET = float(os.getenv("SEARCH_BREAKER_RESET", "30"))
+
+# Where part options come from: "online" (findparts search), "offline" (local
+# catalog only, no network) or "auto" (local catalog, falling back to search)
+PARTS_SOURCE = os.getenv("PARTS_SOURCE", "online")
+
+# Identical in-flight Gemini prompts and part searches share one outbound request
+gemini_calls = SingleFlight()
+part_searches = SingleFlight()
+register_gauges("gemini_calls", gemini_calls.stats)
+register_gauges("part_searches", part_searches.stats)
+register_gauges("part_cache", lambda: get_part_cache().stats())
+
+search_hedger = Hedger(hedge_quantile=SEARCH_HEDGE_QUANTILE, max_ratio=SEARCH_HEDGE_MAX_RATIO)
+search_breaker = CircuitBreaker("findparts", SEARCH_BREAKER_THRESHOLD, SEARCH_BREAKER_RESET)
+# search_retries, deadline_exceeded, served_last_known, served_catalog, failed
+sourcing_counters = Counter()
+_counters_lock = threading.Lock()
+register_gauges("part_search_hedging", search_hedger.stats)
+register_gauges("part_search_breaker", search_breaker.stats)
+register_gauges("part_sourcing", lambda: dict(sourcing_counters))
+
+# Semaphores shared by every sourcing pipeline, per event loop (asyncio
+# primitives are bound to one loop) and keyed by name and size
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _limiter(name, limit):
+    loop = asyncio.get_running_loop()
+    key = (loop, name, limit)
+    with _limiters_lock:
+        semaphore = _limiters.get(key)
+        if semaphore is None:
+            for stale in [k for k in _limiters if k[0].is_closed()]:
+                del _limiters[stale]
+            semaphore = _limiters[key] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+def _count(name):
+    with _counters_lock:
+        sourcing_counters[name] += 1
 
-# Initialize Gemini client (Google AI Studio key)
-client = genai.Client(api_key="")
 
 # --- Gemini helper ---------------------------------------------------------- #
 
 
-async def call_gemini(conversation, retries=3, delay=2):
-    prompt_text = ""
-    for m in conversation:
-        prompt_text += f"{m['role'].upper()}: {m['content']}\n"
+def build_prompt(conversation):
+    """Prompt text for a Conversation or a list of {"role", "content"} messages."""
+    if isinstance(conversation, Conversation):
+        return conversation.render()
+    return "".join(render_turn(m["role"], m["content"]) for m in conversation)
 
-    for attempt in range(retries):
-        try:
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt_text
+
+async def call_gemini(conversation, retries=4, delay=1.0, use_cache=True):
+    with span("llm.call", model=GEMINI_MODEL) as s:
+        prompt_text = build_prompt(conversation)
+
+        # Identical prompts are answered from the response cache at no token cost
+        if use_cache:
+            cached = get_llm_cache().get(GEMINI_MODEL, prompt_text)
+            if cached is not None:
+                s.set("cache_hit", True)
+                return cached
+
+        async def generate():
+            # Use the SDK's async surface so the event loop keeps serving other
+            # requests (e.g. part searches) during the LLM round-trip.
+            # 429/5xx/timeouts are retried with jittered exponential backoff.
+            # Every attempt queues with the shared scheduler for quota first.
+            response = await retry_async(
+                lambda: scheduled_async(
+                    lambda: get_genai_client().aio.models.generate_content(
+                        model=GEMINI_MODEL,
+                        contents=prompt_text
+                    ),
+                    estimate_tokens(prompt_text),
+                    timeout=GEMINI_TIMEOUT,
+                ),
+                retries=retries,
+                base_delay=delay,
             )
-            return response.text.strip()
+            text = response.text.strip()
+            if use_cache:
+                get_llm_cache().put(GEMINI_MODEL, prompt_text, text)
+            return text
+
+        # Concurrent callers with the same prompt share one request. Cached and
+        # uncached calls fly separately: a use_cache=False caller wants its own
+        # fresh answer, and a cached caller's answer must reach the cache.
+        return await gemini_calls.do((cache_key(GEMINI_MODEL, prompt_text), use_cache), generate)
+
+
+async def stream_gemini(conversation, retries=4, delay=1.0, use_cache=True):
+    """Async generator yielding response text chunks as Gemini produces them."""
+    prompt_text = build_prompt(conversation)
+
+    if use_cache:
+        cached = get_llm_cache().get(GEMINI_MODEL, prompt_text)
+        if cached is not None:
+            yield cached
+            return
+
+    # Only opening the stream is retried; once chunks flow they are consumed as-is
+    stream = await retry_async(
+        lambda: scheduled_async_stream(
+            lambda: get_genai_client().aio.models.generate_content_stream(
+                model=GEMINI_MODEL,
+                contents=prompt_text
+            ),
+            estimate_tokens(prompt_text),
+            timeout=GEMINI_TIMEOUT,
+        ),
+        retries=retries,
+        base_delay=delay,
+    )
+    chunks = []
+    async for chunk in stream:
+        if chunk.text:
+            chunks.append(chunk.text)
+            yield chunk.text
+    if use_cache and chunks:
+        get_llm_cache().put(GEMINI_MODEL, prompt_text, "".join(chunks).strip())
+
+
+async def call_gemini_many(conversations, concurrency=None):
+    """Run several independent conversations through Gemini in parallel, preserving order."""
+    return await gather_limited(
+        [call_gemini(conversation) for conversation in conversations],
+        concurrency or LLM_CONCURRENCY,
+    )
+
+
+# Background refreshes of stale cache entries, keyed by normalized query
+_revalidations = {}
+
+
+async def fetch_part_options(part_name: str, client: httpx.AsyncClient, use_cache=True):
+    """
+    Return the 3 best options for a part (ranked by relevance and price),
+    served from the persistent part-search cache when possible. Stale
+    entries are returned immediately and refreshed in the background.
+    With PARTS_SOURCE set to "offline" or "auto" the local parts catalog
+    is consulted first.
+    Returns a list of tuples: (title, price, url)
+    """
+    with span("part.lookup", part=part_name) as s:
+        if PARTS_SOURCE in ("offline", "auto"):
+            results, _ = rank_options(part_name, get_parts_catalog().search(part_name, k=CATALOG_CANDIDATES))
+            if results or PARTS_SOURCE == "offline":
+                s.set("source", "catalog")
+                return results
+
+        s.set("source", "search")
+        if not use_cache:
+            return await _coalesced_search(part_name, client)
+
+        cache = get_part_cache()
+        cached, is_stale = cache.get(part_name)
+        s.set("cache_hit", cached is not None)
+        if cached is not None:
+            s.set("source", "cache")
+            s.set("stale", is_stale)
+            if is_stale and search_breaker.state != OPEN:
+                _revalidate_in_background(part_name, client)
+            return cached
+
+        try:
+            return await _coalesced_search(part_name, client, cache)
+        except Exception:
+            fallback = fallback_options(part_name)
+            if fallback is None:
+                raise
+            s.set("source", fallback[0])
+            return fallback[1]
+
+
+def fallback_options(part_name):
+    """
+    (source, results) to serve while search is down or too slow: the last
+    known search result for the part, however old, or the local catalog's
+    matches. None if neither has anything.
+    """
+    last_known = get_part_cache().get_last_known(part_name)
+    if last_known is not None:
+        _count("served_last_known")
+        return "last_known", last_known
+    if PARTS_SOURCE == "online":
+        results, _ = rank_options(part_name, get_parts_catalog().search(part_name, k=CATALOG_CANDIDATES))
+        if results:
+            _count("served_catalog")
+            return "catalog", results
+    return None
+
+
+async def _coalesced_search(part_name, client, cache=None):
+    """search_findparts, shared by every concurrent caller with the same normalized query."""
+    async def search():
+        results = await search_findparts(part_name, client)
+        if cache is not None:
+            cache.put(part_name, results)
+        return results
+
+    return await part_searches.do(normalize_query(part_name), search)
+
+
+def _revalidate_in_background(part_name, client):
+    key = normalize_query(part_name)
+    if key in _revalidations:
+        return
+
+    async def refresh():
+        try:
+            await _coalesced_search(part_name, client, get_part_cache())
         except Exception as e:
-            # retry only for 503 or server errors
-            if "503" in str(e) and attempt < retries - 1:
-                await asyncio.sleep(delay * (attempt + 1))
-            else:
-                raise e
+            print(f"[DEBUG] Background refresh failed for {part_name}: {e}")
+        finally:
+            _revalidations.pop(key, None)
+
+    _revalidations[key] = asyncio.create_task(refresh())
+
 
+async def search_page(client, params):
+    """
+    One findparts result page as parsed JSON. Each request waits for a slot
+    under the search host's limit, has its own timeout and a status check,
+    goes through the circuit breaker, is hedged past the observed p95 and is
+    retried on 429/5xx/timeouts.
+    """
+    host_limit = _limiter("host:" + urlparse(FINDPARTS_SEARCH_URL).netloc, SOURCING_PER_HOST_LIMIT)
+
+    async def request():
+        search_breaker.check()
+        try:
+            r = await asyncio.wait_for(
+                client.get(FINDPARTS_SEARCH_URL, params=params), SEARCH_REQUEST_TIMEOUT)
+            r.raise_for_status()
+            payload = r.json()
+        except Exception as e:
+            # 4xx other than 408/429 is our request's fault, not the backend's
+            if is_retryable(e) or isinstance(e, ValueError):
+                search_breaker.record_failure()
+            raise
+        search_breaker.record_success()
+        return payload
+
+    async def attempt():
+        # The hedge timer starts once the request goes out, and a hedged
+        # duplicate shares its primary's slot
+        async with host_limit:
+            return await search_hedger.run(request)
+
+    return await retry_async(
+        attempt,
+        retries=SEARCH_RETRIES,
+        base_delay=0.2,
+        max_delay=2.0,
+        on_retry=lambda e: _count("search_retries"),
+    )
 
-async def fetch_part_options(part_name: str, client: httpx.AsyncClient):
+
+async def search_findparts(part_name: str, client: httpx.AsyncClient, k=3):
     """
-    Query the findparts search API and return the 3 cheapest options.
+    Query the findparts search API and return the top k options ranked by
+    relevance to the part and price. A further result page is requested only
+    while the top k isn't good enough, up to SEARCH_MAX_PAGES; if that page
+    fails, the options found so far are returned.
     Returns a list of tuples: (title, price, url)
     """
-    # URL encode the part name
-    query = part_name.replace(' ', '%20')
-    url = f"https://search.findparts.in/search?q={query}&filters=%7B%22vendors%22%3A%5B%5D%7D"
+    profile = QueryProfile(part_name)
+    candidates = []
+    top = []
+    for page in range(1, SEARCH_MAX_PAGES + 1):
+        # httpx encodes the query properly ("+", "&", "/" and non-ASCII included)
+        params = {"q": part_name, "filters": FINDPARTS_FILTERS}
+        if page > 1:
+            params["page"] = page
+        try:
+            hits = (await search_page(client, params)).get("hits", [])
+        except Exception as e:
+            if page == 1:
+                raise
+            print(f"[DEBUG] Search page {page} failed for {part_name}; keeping page {page - 1}: {e}")
+            break
+
+        for hit in hits:
+            src = hit.get("_source", {})
+            candidates.append((src.get("title"), src.get("price"), src.get("url")))
+
+        top, good_enough = rank_options(profile, candidates, k)
+        current_span().set("search_pages", page)
+        if good_enough or not hits:
+            break
+    return top
+
 
-    r = await client.get(url)
-    data = r.json()
+# --- Concurrent sourcing ---------------------------------------------------- #
 
-    # Extract list of hits
-    hits = data.get("hits", [])
 
-    # Extract name, price and url for each hit
-    results = []
-    for hit in hits:
-        src = hit.get("_source", {})
-        title = src.get("title")
-        price = src.get("price")
-        link = src.get("url")
-        # Only use entries that have both a price and link
-        if title and price and link:
-            results.append((title, price, link))
+def make_part_sourcer(http_client, bom_deadline=None):
+    """
+    Returns an async source_one(item) that looks up a single BOM item under
+    the lookup limit shared by all pipelines (search requests are further
+    limited per host in search_page). Each lookup must finish within
+    PART_DEADLINE of getting its slot, and all of them within bom_deadline
+    (default BOM_DEADLINE, 0 for none) of the first one starting. A lookup
+    that fails or runs out of time falls back to the last known result, else
+    yields an entry with empty options and an "error" message.
+    """
+    bom_deadline = BOM_DEADLINE if bom_deadline is None else bom_deadline
+    expires_at = None
+
+    def bom_time_left(loop):
+        nonlocal expires_at
+        if not bom_deadline:
+            return None
+        if expires_at is None:
+            expires_at = loop.time() + bom_deadline
+        return max(0.0, expires_at - loop.time())
+
+    async def source_one(item):
+        part_name = item.get("part", "")
+        entry = {"part": part_name, "quantity": item.get("quantity", 1), "options": []}
+
+        async def lookup():
+            async with _limiter("lookups", SOURCING_CONCURRENCY):
+                # Waiting for a slot counts toward the BOM's deadline, not the part's
+                return await asyncio.wait_for(
+                    fetch_part_options(part_name, http_client), PART_DEADLINE or None)
+
+        bom_timeout = bom_time_left(asyncio.get_running_loop())
+        try:
+            options = await asyncio.wait_for(lookup(), bom_timeout)
+        except asyncio.TimeoutError:
+            _count("deadline_exceeded")
+            fallback = fallback_options(part_name)
+            if fallback is None:
+                _count("failed")
+                print(f"[ERROR] Sourcing timed out for {part_name}")
+                entry["error"] = "Part search timed out"
+                return entry
+            options = fallback[1]
+        except Exception as e:
+            _count("failed")
+            print(f"[ERROR] Sourcing failed for {part_name}: {e}")
+            entry["error"] = str(e)
+            return entry
+        entry["options"] = [
+            {"name": name, "price": price, "link": link}
+            for name, price, link in options
+        ]
+        return entry
+
+    return source_one
+
+
+async def source_parts(bom, http_client, bom_deadline=None):
+    """
+    Fetch options for every BOM item concurrently.
+    Returns one entry per item, in BOM order. A failed lookup gets an empty
+    option list and an "error" message instead of aborting the whole BOM.
+    """
+    source_one = make_part_sourcer(http_client, bom_deadline)
+    # gather() keeps results in input order, so the stored BOM order is stable
+    return await asyncio.gather(*(source_one(item) for item in bom))
 
-    # Sort by price (ascending)
-    results.sort(key=lambda x: x[1])
 
-    # Return the 3 cheapest
-    return results[:3]
+def parse_bom(response_text):
+    """
+    Parse a complete 'BOM: [...]' reply into a list of items.
+    Raises ClarificationNeeded for a question and ValueError for invalid JSON.
+    """
+    if not response_text.startswith("BOM:"):
+        raise ClarificationNeeded(response_text)
+    with span("bom.parse"):
+        try:
+            return json.loads(response_text[len("BOM:"):].strip())
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Could not parse BOM JSON: {e}")
 
 
 PROMPT_INSTRUCTION = (
@@ -81,100 +452,176 @@ PROMPT_INSTRUCTION = (
     "]"
 )
 
-async def generate_bom_and_source_parts(project_description):
+_STREAM_DONE = object()
+
+
+async def stream_bom_and_source_parts(project_description, http_client=None):
+    """
+    Async generator that overlaps BOM extraction with sourcing: each BOM item
+    is sent to fetch_part_options as soon as its JSON object is complete in
+    the model's streamed output. Yields (index, sourced_entry) in completion
+    order; index is the item's position in the BOM.
+    Raises ClarificationNeeded if the model asks a question instead.
+    """
     conversation = [
         {"role": "user", "content": PROMPT_INSTRUCTION},
         {"role": "user", "content": project_description}
     ]
-    async with httpx.AsyncClient() as http_client:
-        response_text = await call_gemini(conversation)
-        print(f"[DEBUG] Gemini response_text: {response_text}")
-        if not response_text.startswith("BOM:"):
-            return None, "Clarification needed: " + response_text
-        bom_json = response_text[len("BOM:"):].strip()
+    source_one = make_part_sourcer(http_client or get_http_client())
+    parser = BomStreamParser()
+    results = asyncio.Queue()
+    tasks = []
+
+    async def source(index, item):
+        await results.put((index, await source_one(item)))
+
+    async def read_model():
         try:
-            bom = json.loads(bom_json)
-            print(f"[DEBUG] Parsed BOM: {bom}")
-        except Exception as e:
-            print(f"[ERROR] Could not parse BOM JSON: {e}")
+            with span("bom.extract", model=GEMINI_MODEL) as s:
+                parse_time = 0.0
+                async for chunk in stream_gemini(conversation):
+                    t0 = time.perf_counter()
+                    items = parser.feed(chunk)
+                    parse_time += time.perf_counter() - t0
+                    for item in items:
+                        tasks.append(asyncio.create_task(source(len(tasks), item)))
+                s.set("items", parser.items_seen)
+                s.set("parse_s", round(parse_time, 6))
+                print(f"[DEBUG] Gemini response_text: {parser.text}")
+                if parser.is_bom is not True:
+                    raise ClarificationNeeded(parser.text.strip())
+        finally:
+            results.put_nowait(_STREAM_DONE)
+
+    reader = asyncio.create_task(read_model())
+    reading = True
+    delivered = 0
+    try:
+        while reading or delivered < len(tasks):
+            message = await results.get()
+            if message is _STREAM_DONE:
+                reading = False
+                await reader  # re-raises ClarificationNeeded / LLM errors
+                continue
+            delivered += 1
+            yield message
+    finally:
+        for task in [reader, *tasks]:
+            task.cancel()
+
+
+async def source_bom_as_completed(bom, http_client=None):
+    """
+    Async generator sourcing an already known BOM (e.g. from
+    plan_bom.generate_plan_and_bom). Yields (index, sourced_entry) in
+    completion order, like stream_bom_and_source_parts.
+    """
+    source_one = make_part_sourcer(http_client or get_http_client())
+
+    async def source(index, item):
+        return index, await source_one(item)
+
+    tasks = [asyncio.create_task(source(index, item)) for index, item in enumerate(bom)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def generate_bom_and_source_parts(project_description, project_id=None, bom=None):
+    """
+    Extract and source a BOM, storing each part in the project store as soon
+    as it is sourced. A project is created on the first part unless
+    project_id is given. A BOM passed in is sourced as-is, skipping the
+    extraction call. Returns (sourced_parts, error_message).
+    """
+    store = get_project_store()
+    with span("bom.generate", extracted=bom is None) as s:
+        sourced = {}
+        if bom is None:
+            entries = stream_bom_and_source_parts(project_description)
+        else:
+            entries = source_bom_as_completed(bom)
+        try:
+            async for index, entry in entries:
+                print(f"[DEBUG] Sourced {entry['part']}: {entry['options']}")
+                if project_id is None:
+                    project_id = store.create_project(
+                        project_description[:80], description=project_description)
+                with span("store.upsert", part=entry["part"]):
+                    store.upsert_part(project_id, entry, position=index)
+                sourced[index] = entry
+        except ClarificationNeeded as e:
+            s.set("clarification", True)
+            return None, "Clarification needed: " + e.text
+        if not sourced:
+            print("[ERROR] Could not parse BOM JSON: no complete items in response")
             return None, "Could not parse BOM JSON."
-        sourced_parts = []
-        for item in bom:
-            part_name = item["part"]
-            options = await fetch_part_options(part_name, http_client)
-            print(f"[DEBUG] Options for {part_name}: {options}")
-            option_list = [
-                {"name": name, "price": price, "link": link}
-                for name, price, link in options
-            ]
-            sourced_parts.append({
-                "part": part_name,
-                "quantity": item["quantity"],
-                "options": option_list
-            })
-        # Save to file
-        with open("sourced_parts.json", "w", encoding="utf-8") as f:
-            json.dump(sourced_parts, f, indent=2, ensure_ascii=False)
-        return sourced_parts, None
+        s.set("parts", len(sourced))
+        s.set("project_id", project_id)
+        # Results arrive in completion order; return them in BOM order
+        return [sourced[i] for i in sorted(sourced)], None
 
 
 async def main():
-    conversation = [{"role": "user", "content": PROMPT_INSTRUCTION}]
+    conversation = Conversation(PROMPT_INSTRUCTION)
     print("Hardware Sourcing Agent (type 'exit' to quit)\n")
 
-    async with httpx.AsyncClient() as http_client:
+    async def summarize(prompt):
+        return await call_gemini([{"role": "user", "content": prompt}])
+
+    http_client = get_http_client()
+    try:
         while True:
             user_input = input("User: ")
             if user_input.lower() == "exit":
                 break
 
             # Add user's input to conversation
-            conversation.append({"role": "user", "content": user_input})
+            conversation.add("user", user_input)
 
             # Call Gemini
             response_text = await call_gemini(conversation)
-            conversation.append({"role": "model", "content": response_text})
+            conversation.add("model", response_text)
+            # Keep the prompt bounded: fold old turns into a summary past the token budget
+            await conversation.maybe_compact(summarize)
 
             # If response starts with 'BOM:' → we have the parts list
             if response_text.startswith("BOM:"):
                 # Parse JSON BOM
-                import json
-                bom_json = response_text[len("BOM:"):].strip()
                 try:
-                    bom = json.loads(bom_json)
-                except Exception:
+                    bom = parse_bom(response_text)
+                except ValueError:
                     print("❗ Could not parse BOM JSON.")
                     print(response_text)
                     return
 
-                # Fetch cheapest options for each part
+                # Fetch the best options for all parts concurrently
                 print("\nSourcing parts from findpart.in ...\n")
-                sourced_parts = []
-                for item in bom:
-                    part_name = item["part"]
-                    options = await fetch_part_options(part_name, http_client)
-                    print(f"{part_name} (qty {item['quantity']})")
-                    option_list = []
-                    for idx, (name, price, link) in enumerate(options, start=1):
-                        print(f"  {idx}. {name} — ₹{price}  →  {link}")
-                        option_list.append(
-                            {"name": name, "price": price, "link": link})
-                    sourced_parts.append({
-                        "part": part_name,
-                        "quantity": item["quantity"],
-                        "options": option_list
-                    })
+                sourced_parts = await source_parts(bom, http_client)
+                for entry in sourced_parts:
+                    print(f"{entry['part']} (qty {entry['quantity']})")
+                    if "error" in entry:
+                        print(f"  ❗ Lookup failed: {entry['error']}")
+                    for idx, opt in enumerate(entry["options"], start=1):
+                        print(f"  {idx}. {opt['name']} — ₹{opt['price']}  →  {opt['link']}")
                     print()
-                # Store sourced parts in JSON file
-                import json
-                with open("sourced_parts.json", "w", encoding="utf-8") as f:
-                    json.dump(sourced_parts, f, indent=2, ensure_ascii=False)
-                print("Sourced parts saved to sourced_parts.json\n")
+                # Store sourced parts as a new project
+                store = get_project_store()
+                description = conversation.first_user_message
+                project_id = store.create_project(description[:80], description=description)
+                store.upsert_parts(project_id, sourced_parts)
+                print(f"Sourced parts saved as project {project_id} in {store.db_path}\n")
                 break
 
             else:
                 # Otherwise this is a clarifying question
                 print(f"Gemini: {response_text}")
+    finally:
+        await close_http_client()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
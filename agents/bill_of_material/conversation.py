@@ -0,0 +1,99 @@
+# agents/bill_of_material/conversation.py
+#
+# Bounded conversation history for the clarification loop. The static
+# instruction (PROMPT_INSTRUCTION with its example BOM) is rendered once per
+# session and always leads the prompt byte-for-byte, so Gemini's implicit
+# prefix caching can reuse it across turns. Each turn is rendered once when
+# added. Once the turns exceed a token budget, the oldest ones are folded into
+# a running summary, so prompt size (and per-turn latency and token cost)
+# stays flat however long the session runs.
+
+import os
+
+from middleware.llm_scheduler import estimate_tokens
+
+# Estimated tokens of turn history kept verbatim before older turns are summarized
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+# Most recent turns always kept verbatim
+KEEP_RECENT_TURNS = int(os.getenv("KEEP_RECENT_TURNS", "4"))
+
+SUMMARY_INSTRUCTION = (
+    "Summarize this hardware project clarification conversation for the assistant that will continue it. "
+    "Keep every requirement, constraint, preference, chosen component and open question; drop pleasantries. "
+    "Answer with the summary only, as short bullet points.\n\n"
+)
+
+
+def render_turn(role, content):
+    return f"{role.upper()}: {content}\n"
+
+
+def _tokens(text):
+    return estimate_tokens(text, expected_output=0)
+
+
+class Conversation:
+    """
+    The instruction prefix, a running summary of compacted turns and the
+    recent turns, each kept as its rendered prompt text.
+    """
+
+    def __init__(self, instruction, budget=HISTORY_TOKEN_BUDGET, keep_recent=KEEP_RECENT_TURNS):
+        self.prefix = render_turn("user", instruction)
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.turns = []  # (role, content, rendered, tokens)
+        self.history_tokens = 0
+        self.first_user_message = None
+        self.compactions = 0
+
+    def add(self, role, content):
+        if role == "user" and self.first_user_message is None:
+            self.first_user_message = content
+        rendered = render_turn(role, content)
+        tokens = _tokens(rendered)
+        self.turns.append((role, content, rendered, tokens))
+        self.history_tokens += tokens
+
+    @property
+    def messages(self):
+        """Remaining verbatim turns as {"role", "content"} dicts."""
+        return [{"role": role, "content": content} for role, content, _, _ in self.turns]
+
+    def render(self):
+        """Prompt text: instruction prefix, summary of older turns, recent turns."""
+        parts = [self.prefix]
+        if self.summary:
+            parts.append(render_turn("user", "Summary of the conversation so far:\n" + self.summary))
+        parts.extend(rendered for _, _, rendered, _ in self.turns)
+        return "".join(parts)
+
+    def needs_compaction(self):
+        return self.history_tokens > self.budget and len(self.turns) > self.keep_recent
+
+    async def compact(self, summarize):
+        """
+        Fold all but the last keep_recent turns into the summary.
+        `summarize` is an async callable taking a prompt and returning text;
+        if it fails, the old turns are kept in the summary verbatim.
+        """
+        if len(self.turns) <= self.keep_recent:
+            return
+        old = self.turns[:-self.keep_recent]
+        transcript = "".join(rendered for _, _, rendered, _ in old)
+        if self.summary:
+            transcript = "Earlier summary:\n" + self.summary + "\n\n" + transcript
+        try:
+            summary = (await summarize(SUMMARY_INSTRUCTION + transcript)).strip()
+        except Exception as e:
+            print(f"[DEBUG] Conversation summary failed, keeping turns verbatim: {e}")
+            summary = transcript.strip()[-self.budget * 4:]
+        self.summary = summary
+        self.turns = self.turns[-self.keep_recent:]
+        self.history_tokens = sum(tokens for _, _, _, tokens in self.turns)
+        self.compactions += 1
+
+    async def maybe_compact(self, summarize):
+        if self.needs_compaction():
+            await self.compact(summarize)
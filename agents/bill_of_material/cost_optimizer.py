@@ -0,0 +1,376 @@
+# agents/bill_of_material/cost_optimizer.py
+#
+# Picks one purchase option per sourced part so that the landed cost (item
+# prices plus per-vendor shipping, waived above each vendor's free-shipping
+# threshold) is as low as possible, optionally using at most `max_vendors`
+# vendors and checking the result against the project budget.
+#
+#   python -m agents.bill_of_material.cost_optimizer sourced_parts.json --max-vendors 2 --budget "₹3000"
+#
+# Search: every part's cheapest option per vendor goes into a (parts x vendors)
+# cost matrix. Candidate vendor sets are evaluated together with NumPy (each
+# part takes its cheapest option within the set, then shipping is applied per
+# vendor). The best sets are then repaired greedily: parts are moved onto a
+# vendor that is just under its free-shipping threshold whenever the extra item
+# cost is smaller than the shipping saved. Sets are enumerated exhaustively
+# while that stays under MAX_VENDOR_SETS; beyond it the vendor pool is bounded
+# to sole-source vendors plus the vendors that are cheapest for the most parts,
+# and when even the sole-source vendors are too many to enumerate the set is
+# grown greedily, one vendor at a time.
+
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+from urllib.parse import urlparse
+
+import numpy as np
+
+# Placeholder rates in ₹; override with VENDOR_COSTS_PATH (a JSON object of
+# host -> {"shipping", "free_shipping_threshold"}) when real rates are known
+DEFAULT_VENDOR_COSTS = {
+    "robu.in": {"shipping": 60.0, "free_shipping_threshold": 499.0},
+    "sharvielectronics.com": {"shipping": 70.0, "free_shipping_threshold": 999.0},
+    "probots.co.in": {"shipping": 80.0, "free_shipping_threshold": 1000.0},
+}
+# Vendors missing from the table: flat shipping, never free
+DEFAULT_VENDOR = {"shipping": 100.0, "free_shipping_threshold": None}
+
+VENDOR_COSTS_PATH = os.getenv("VENDOR_COSTS_PATH")
+# Vendor sets evaluated exhaustively before the vendor pool is bounded
+MAX_VENDOR_SETS = int(os.getenv("OPTIMIZER_MAX_VENDOR_SETS", "4096"))
+# Best vendor sets handed to the free-shipping repair step
+REPAIR_CANDIDATES = 16
+# Added per part left without an option by a vendor cap, so sets covering
+# more parts always win over cheaper sets covering fewer
+UNCOVERED_PENALTY = 1e9
+# Budgets given in dollars ("$50") are converted to ₹ with this rate
+USD_TO_INR = float(os.getenv("USD_TO_INR", "83"))
+
+_EVAL_CHUNK = 256
+
+
+def vendor_of(link):
+    host = urlparse(link or "").netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def load_vendor_costs(path=None):
+    """DEFAULT_VENDOR_COSTS, overridden by the JSON table at `path` (or VENDOR_COSTS_PATH)."""
+    costs = {host: dict(entry) for host, entry in DEFAULT_VENDOR_COSTS.items()}
+    path = path or VENDOR_COSTS_PATH
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for host, entry in json.load(f).items():
+                costs[host.lower()] = dict(DEFAULT_VENDOR, **entry)
+    return costs
+
+
+def parse_budget(value):
+    """
+    Budget from user_inputs['budget'] (e.g. "₹2,500", "$50", "1000-1500",
+    "2k") as ₹, taking the largest amount mentioned. None if there is none.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).lower().replace(",", "")
+    amounts = [float(number) * (1000 if suffix == "k" else 1)
+               for number, suffix in re.findall(r"(\d+(?:\.\d+)?)\s*(k\b)?", text)]
+    if not amounts:
+        return None
+    budget = max(amounts)
+    if "$" in text or "usd" in text or "dollar" in text:
+        budget *= USD_TO_INR
+    return budget
+
+
+def _price(option):
+    try:
+        price = float(option.get("price"))
+    except (TypeError, ValueError):
+        return None
+    return price if math.isfinite(price) and price >= 0 else None
+
+
+class _Problem:
+    """The sourced parts reduced to a (parts x vendors) matrix of cheapest line costs."""
+
+    def __init__(self, sourced_parts, vendor_costs):
+        self.parts = []
+        self.unavailable = []
+        vendors = {}
+        cheapest = []  # per usable part: {vendor index: (line cost, option index)}
+        for entry in sourced_parts:
+            quantity = max(1, int(entry.get("quantity") or 1))
+            best = {}
+            for index, option in enumerate(entry.get("options", [])):
+                price = _price(option)
+                if price is None:
+                    continue
+                v = vendors.setdefault(vendor_of(option.get("link")), len(vendors))
+                if v not in best or price * quantity < best[v][0]:
+                    best[v] = (price * quantity, index)
+            if best:
+                self.parts.append(entry)
+                cheapest.append(best)
+            else:
+                self.unavailable.append(entry["part"])
+
+        self.vendors = list(vendors)
+        n_parts, n_vendors = len(self.parts), len(self.vendors)
+        # One extra all-inf column: the "no vendor" choice of uncovered parts
+        self.cost = np.full((n_parts, n_vendors + 1), np.inf)
+        self.option = np.full((n_parts, n_vendors + 1), -1, dtype=np.int64)
+        for p, best in enumerate(cheapest):
+            for v, (cost, index) in best.items():
+                self.cost[p, v] = cost
+                self.option[p, v] = index
+
+        table = [vendor_costs.get(host, DEFAULT_VENDOR) for host in self.vendors]
+        self.shipping = np.array([float(t.get("shipping") or 0.0) for t in table])
+        self.threshold = np.array([
+            np.inf if t.get("free_shipping_threshold") is None else float(t["free_shipping_threshold"])
+            for t in table])
+
+    def evaluate(self, masks):
+        """Cheapest-within-set assignment for each row of `masks` (sets x vendors)."""
+        masked = np.where(masks[:, None, :], self.cost[None, :, :-1], np.inf)
+        choice = masked.argmin(axis=2)
+        line = np.take_along_axis(masked, choice[:, :, None], axis=2)[:, :, 0]
+        covered = np.isfinite(line)
+        line = np.where(covered, line, 0.0)
+        # Per-set vendor subtotals in one bincount over (set, vendor) slots
+        n_sets, n_vendors = masks.shape
+        slots = (np.arange(n_sets)[:, None] * n_vendors + choice).ravel()
+        subtotal = np.bincount(slots, weights=line.ravel(),
+                               minlength=n_sets * n_vendors).reshape(n_sets, n_vendors)
+        used = np.bincount(slots, weights=covered.ravel(),
+                           minlength=n_sets * n_vendors).reshape(n_sets, n_vendors) > 0
+        shipping = (used & (subtotal < self.threshold)) @ self.shipping
+        uncovered = (~covered).sum(axis=1)
+        # Parts with no option in the set point at the sentinel "no vendor" column
+        choice = np.where(covered, choice, n_vendors)
+        return choice, line.sum(axis=1) + shipping + UNCOVERED_PENALTY * uncovered
+
+    def landed_cost(self, choice):
+        """Items, per-vendor shipping and subtotals, and uncovered parts of one assignment."""
+        line = self.cost[np.arange(len(choice)), choice]
+        missing = ~np.isfinite(line)
+        line = np.where(missing, 0.0, line)
+        n_vendors = len(self.vendors)
+        subtotal = np.bincount(choice, weights=line, minlength=n_vendors + 1)[:n_vendors]
+        used = np.bincount(choice[~missing], minlength=n_vendors + 1)[:n_vendors] > 0
+        shipping = np.where(used & (subtotal < self.threshold), self.shipping, 0.0)
+        return line.sum(), shipping, subtotal, missing
+
+    def objective(self, choice):
+        items, shipping, _, missing = self.landed_cost(choice)
+        return items + shipping.sum() + UNCOVERED_PENALTY * missing.sum()
+
+    def repair(self, choice, allowed):
+        """
+        Greedy free-shipping repair: for each vendor in `allowed` that is used
+        but under its threshold, move parts onto it in order of extra cost per
+        rupee of subtotal until the threshold is met; keep the move if the
+        landed cost drops. Repeats until no vendor improves.
+        """
+        choice = choice.copy()
+        _, shipping, subtotal, _ = self.landed_cost(choice)
+        best = self.objective(choice)
+        rows = np.arange(len(choice))
+        improved = True
+        while improved:
+            improved = False
+            for v in np.flatnonzero(allowed & (shipping > 0)):
+                shortfall = self.threshold[v] - subtotal[v]
+                current = self.cost[rows, choice]
+                movable = (choice != v) & np.isfinite(self.cost[:, v]) & np.isfinite(current)
+                candidates = np.flatnonzero(movable)
+                if candidates.size == 0 or self.cost[candidates, v].sum() < shortfall:
+                    continue
+                extra = self.cost[candidates, v] - current[candidates]
+                order = candidates[np.argsort(extra / np.maximum(self.cost[candidates, v], 1e-9))]
+                filled = np.cumsum(self.cost[order, v])
+                moved = order[:int(np.searchsorted(filled, shortfall)) + 1]
+                trial = choice.copy()
+                trial[moved] = v
+                total = self.objective(trial)
+                if total < best - 1e-9:
+                    _, shipping, subtotal, _ = self.landed_cost(trial)
+                    choice, best = trial, total
+                    improved = True
+        return choice, best
+
+
+def _n_sets(size, limit):
+    """Number of non-empty vendor sets of at most `limit` vendors drawn from `size`."""
+    return sum(math.comb(size, k) for k in range(1, min(limit, size) + 1))
+
+
+def _greedy_vendor_sets(problem, limit, start):
+    """
+    Vendor sets grown from `start` one vendor at a time, each step adding the
+    vendor that lowers the landed cost most, until `limit` vendors or no
+    vendor helps. Every set on the way is returned for the repair step.
+    """
+    n = len(problem.vendors)
+    current = np.zeros(n, dtype=bool)
+    current[list(start)] = True
+    masks = [current] if start else []
+    best_total = problem.evaluate(current[None, :])[1][0] if start else np.inf
+    while current.sum() < limit:
+        candidates = np.flatnonzero(~current)
+        if candidates.size == 0:
+            break
+        trials = np.repeat(current[None, :], candidates.size, axis=0)
+        trials[np.arange(candidates.size), candidates] = True
+        totals = np.concatenate([problem.evaluate(trials[i:i + _EVAL_CHUNK])[1]
+                                 for i in range(0, len(trials), _EVAL_CHUNK)])
+        best = int(totals.argmin())
+        if totals[best] >= best_total:
+            break
+        current, best_total = trials[best], totals[best]
+        masks.append(current)
+    return np.array(masks, dtype=bool).reshape(-1, n)
+
+
+def _vendor_sets(problem, max_vendors):
+    """Boolean masks of the vendor sets to evaluate, and whether they cover every set."""
+    n = len(problem.vendors)
+    limit = min(max_vendors or n, n)
+    pool = list(range(n))
+    exhaustive = True
+    if _n_sets(n, limit) > MAX_VENDOR_SETS:
+        exhaustive = False
+        finite = np.isfinite(problem.cost)
+        # Vendors that are the only source of some part must stay in the pool
+        sole = set(finite[finite.sum(axis=1) == 1].argmax(axis=1).tolist())
+        if _n_sets(len(sole), limit) > MAX_VENDOR_SETS:
+            # Too many to enumerate even on their own; start from all of them if the cap allows
+            return _greedy_vendor_sets(problem, limit, sole if len(sole) <= limit else ()), exhaustive
+        wins = np.bincount(problem.cost.argmin(axis=1), minlength=n)
+        ranked = [v for v in np.argsort(-wins).tolist() if v not in sole]
+        pool = sorted(sole)
+        for v in ranked:
+            if _n_sets(len(pool) + 1, limit) > MAX_VENDOR_SETS:
+                break
+            pool.append(v)
+    masks = []
+    for k in range(1, min(limit, len(pool)) + 1):
+        for combo in itertools.combinations(pool, k):
+            mask = np.zeros(n, dtype=bool)
+            mask[list(combo)] = True
+            masks.append(mask)
+    return np.array(masks, dtype=bool).reshape(-1, n), exhaustive
+
+
+def optimize_selection(sourced_parts, vendor_costs=None, max_vendors=None, budget=None):
+    """
+    Lowest landed-cost selection for sourced parts ([{"part", "quantity",
+    "options": [{"name", "price", "link"}]}], the sourced_parts.json shape).
+
+    Returns {"selections": {part: option_index}, "total", "items_total",
+    "shipping_total", "vendors": {host: {"subtotal", "shipping"}},
+    "budget", "within_budget", "lower_bound", "exhaustive", "unavailable",
+    "uncovered"}. "lower_bound" is the cheapest item total ignoring shipping and vendor caps,
+    so total - lower_bound bounds how far from optimal the answer can be.
+    "unavailable" parts have no priced option at all; "uncovered" parts have
+    none at the vendors chosen under max_vendors and are left unselected.
+    """
+    problem = _Problem(sourced_parts, vendor_costs or load_vendor_costs())
+    budget = parse_budget(budget)
+    if not problem.parts:
+        return {"selections": {}, "total": 0.0, "items_total": 0.0, "shipping_total": 0.0,
+                "vendors": {}, "budget": budget, "within_budget": None if budget is None else True,
+                "lower_bound": 0.0, "exhaustive": True, "unavailable": problem.unavailable,
+                "uncovered": []}
+
+    masks, exhaustive = _vendor_sets(problem, max_vendors)
+    totals, choices = [], []
+    for start in range(0, len(masks), _EVAL_CHUNK):
+        choice, total = problem.evaluate(masks[start:start + _EVAL_CHUNK])
+        totals.append(total)
+        choices.append(choice)
+    lower_bound = problem.cost[:, :-1].min(axis=1).sum()
+    totals = np.concatenate(totals)
+    choices = np.concatenate(choices)
+
+    best_choice, best_total = None, np.inf
+    for s in np.argsort(totals, kind="stable")[:REPAIR_CANDIDATES]:
+        choice, total = problem.repair(choices[s], masks[s])
+        if total < best_total:
+            best_choice, best_total = choice, total
+
+    items, shipping, subtotal, missing = problem.landed_cost(best_choice)
+    rows = np.arange(len(best_choice))
+    selections = {part["part"]: int(index) for part, index, skip
+                  in zip(problem.parts, problem.option[rows, best_choice], missing) if not skip}
+    vendors = {problem.vendors[v]: {"subtotal": round(float(subtotal[v]), 2),
+                                    "shipping": round(float(shipping[v]), 2)}
+               for v in np.unique(best_choice[~missing])}
+    total = float(items + shipping.sum())
+    return {
+        "selections": selections,
+        "total": round(total, 2),
+        "items_total": round(float(items), 2),
+        "shipping_total": round(float(shipping.sum()), 2),
+        "vendors": vendors,
+        "budget": budget,
+        "within_budget": None if budget is None else total <= budget,
+        "lower_bound": round(float(lower_bound), 2),
+        "exhaustive": exhaustive,
+        "unavailable": problem.unavailable,
+        "uncovered": [part["part"] for part, skip in zip(problem.parts, missing) if skip],
+    }
+
+
+def landed_cost(sourced_parts, selections, vendor_costs=None):
+    """
+    Items, shipping and total for a given {part: option_index} selection, or
+    a list of option indexes (None for none) in BOM line order when part
+    names repeat.
+    """
+    vendor_costs = vendor_costs or load_vendor_costs()
+    subtotals = {}
+    for line, entry in enumerate(sourced_parts):
+        index = selections[line] if isinstance(selections, list) else selections.get(entry["part"])
+        if index is None or not 0 <= index < len(entry.get("options", [])):
+            continue
+        option = entry["options"][index]
+        price = _price(option)
+        if price is None:
+            continue
+        host = vendor_of(option.get("link"))
+        subtotals[host] = subtotals.get(host, 0.0) + price * max(1, int(entry.get("quantity") or 1))
+    shipping = 0.0
+    for host, subtotal in subtotals.items():
+        table = vendor_costs.get(host, DEFAULT_VENDOR)
+        threshold = table.get("free_shipping_threshold")
+        if threshold is None or subtotal < threshold:
+            shipping += float(table.get("shipping") or 0.0)
+    items = sum(subtotals.values())
+    return {"items_total": round(items, 2), "shipping_total": round(shipping, 2),
+            "total": round(items + shipping, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lowest landed-cost option per sourced part.")
+    parser.add_argument("sourced", help="sourced_parts.json")
+    parser.add_argument("--vendor-costs", help="JSON table of host -> shipping/free_shipping_threshold")
+    parser.add_argument("--max-vendors", type=int)
+    parser.add_argument("--budget")
+    args = parser.parse_args()
+
+    with open(args.sourced, encoding="utf-8") as f:
+        sourced_parts = json.load(f)
+    result = optimize_selection(sourced_parts, load_vendor_costs(args.vendor_costs),
+                                args.max_vendors, args.budget)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
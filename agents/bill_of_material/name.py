@@ -1,24 +1,54 @@
-from composio import Composio
-from composio import Composio
-from composio_gemini import GeminiProvider
-from google import genai
-from google.genai import types
-composio = Composio(
-    api_key="",
-)
-
-client = genai.Client(api_key="")
-
-
-user_id = "0000-1111-2222"
-tools = composio.tools.get(
-    user_id, tools=["COMPOSIO_SEARCH_DUCK_DUCK_GO_SEARCH"])
-
-# Create genai client config
-config = types.GenerateContentConfig(tools=tools)
-
-# # Use the chat interface.
-chat = client.chats.create(model="gemini-2.0-flash", config=config)
-response = chat.send_message(
-    "search about the latest info on windsurf acquisition.")
-print(response.text)
+# agents/bill_of_material/name.py
+#
+# Web search through a Gemini chat with Composio's DuckDuckGo tool. Importing
+# this module has no side effects: the Composio and Gemini clients are built
+# on the first search, and nothing is sent until search() is called.
+#
+#   python -m agents.bill_of_material.name "latest info on windsurf acquisition"
+
+import os
+import sys
+import threading
+
+from middleware.llm_scheduler import scheduled, estimate_tokens
+
+SEARCH_MODEL = "gemini-2.0-flash"
+SEARCH_TOOLS = ["COMPOSIO_SEARCH_DUCK_DUCK_GO_SEARCH"]
+COMPOSIO_USER_ID = os.getenv("COMPOSIO_USER_ID", "0000-1111-2222")
+
+_lock = threading.Lock()
+_chat_config = None
+
+
+def _search_config():
+    """Gemini chat config carrying the Composio search tools, built once."""
+    global _chat_config
+    if _chat_config is None:
+        with _lock:
+            if _chat_config is None:
+                from composio import Composio
+                from google.genai import types
+
+                composio = Composio(api_key=os.getenv("COMPOSIO_API_KEY", ""))
+                tools = composio.tools.get(COMPOSIO_USER_ID, tools=SEARCH_TOOLS)
+                _chat_config = types.GenerateContentConfig(tools=tools)
+    return _chat_config
+
+
+def search(message):
+    """Ask a tool-using Gemini chat to search the web; returns the reply text."""
+    from middleware.resources import get_genai_client
+
+    chat = get_genai_client().chats.create(model=SEARCH_MODEL, config=_search_config())
+    # Tool-using chats share the Gemini quota with the rest of the app
+    response = scheduled(lambda: chat.send_message(message), estimate_tokens(message))
+    return response.text
+
+
+def main():
+    message = " ".join(sys.argv[1:]) or "search about the latest info on windsurf acquisition."
+    print(search(message))
+
+
+if __name__ == "__main__":
+    main()
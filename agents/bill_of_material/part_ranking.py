@@ -0,0 +1,142 @@
+# agents/bill_of_material/part_ranking.py
+#
+# Relevance ranking for part search hits. The search API matches loosely, so
+# "ESP32 Development Board" also returns breakout boards and expansion shields
+# *for* an ESP32 board, which used to win on price alone. Each hit is scored
+# for how well its title matches the query (shared tokens, plus agreement on
+# package, wattage, pin count, wavelength and other value+unit attributes),
+# penalised for accessories the query didn't ask for, and the top k by a
+# blend of relevance and price are kept with a heap.
+
+import heapq
+import os
+import re
+
+from database.sqlite_demo.parts_catalog import parse_price, part_term_groups
+
+# Share of the combined score given to relevance; the rest goes to price
+RELEVANCE_WEIGHT = float(os.getenv("RANK_RELEVANCE_WEIGHT", "0.75"))
+# Hits below this relevance are dropped outright
+MIN_RELEVANCE = float(os.getenv("RANK_MIN_RELEVANCE", "0.3"))
+# A top k is "good enough" (no further result pages) when every entry reaches this
+GOOD_RELEVANCE = float(os.getenv("RANK_GOOD_RELEVANCE", "0.6"))
+
+# Products sold *for* a part rather than the part itself
+ACCESSORY_WORDS = {
+    "adapter", "bracket", "breakout", "cable", "case", "cover", "enclosure",
+    "expansion", "extension", "holder", "mount", "shield", "socket", "sleeve",
+}
+_ACCESSORY_PENALTY = 0.35
+_FOR_PENALTY = 0.3
+_ATTRIBUTE_BONUS = 0.1
+_ATTRIBUTE_CONFLICT = 0.5
+
+PACKAGES = {
+    "dip", "sip", "smd", "smt", "tht", "sop", "soic", "ssop", "tssop", "msop",
+    "qfn", "qfp", "lqfp", "tqfp", "bga", "sot23", "sot223", "to92", "to220",
+    "to247", "to263", "0201", "0402", "0603", "0805", "1206", "1210", "2512",
+}
+_PACKAGE_ALIASES = {"through": "tht", "smt": "smd"}
+
+# value+unit tokens as produced by normalize_query ("220ohm", "0.25w", "38pin")
+_ATTRIBUTE = re.compile(r"(\d+(?:\.\d+)?)(kohm|ohm|k|uf|nf|pf|mah|ma|mm|nm|mhz|khz|hz|pins?|w|v|a)")
+_UNIT_SCALE = {"kohm": ("ohm", 1000.0), "k": ("ohm", 1000.0), "pins": ("pin", 1.0),
+               "nf": ("uf", 0.001), "pf": ("uf", 0.000001)}
+
+
+def normalize_price(value):
+    """Prices arrive as numbers or strings like '₹1,299.00'; returns a positive float or None."""
+    price = parse_price(value)
+    return price if price is not None and price > 0 else None
+
+
+def extract_attributes(tokens):
+    """
+    Package and {unit: value} attributes from normalized tokens, e.g.
+    ["220ohm", "0.25w", "0603"] -> ({"0603"}, {"ohm": 220.0, "w": 0.25}).
+    """
+    packages = set()
+    values = {}
+    for token in tokens:
+        compact = token.replace("-", "")
+        if compact in PACKAGES:
+            packages.add(_PACKAGE_ALIASES.get(compact, compact))
+            continue
+        match = _ATTRIBUTE.fullmatch(token)
+        if match:
+            unit, scale = _UNIT_SCALE.get(match.group(2), (match.group(2), 1.0))
+            values.setdefault(unit, float(match.group(1)) * scale)
+    return packages, values
+
+
+class QueryProfile:
+    """A query's token groups and attributes, computed once and scored against many titles."""
+
+    def __init__(self, query):
+        self.groups = part_term_groups(query)
+        # Tokens carrying numbers (values, part numbers) say more than generic words
+        self.weights = [2.0 if any(ch.isdigit() for ch in group[0]) else 1.0 for group in self.groups]
+        self.total_weight = sum(self.weights) or 1.0
+        terms = {term for group in self.groups for term in group}
+        self.accessories = ACCESSORY_WORDS & terms
+        self.packages, self.values = extract_attributes(terms)
+
+    def _match(self, terms):
+        return sum(w for group, w in zip(self.groups, self.weights)
+                   if any(alias in terms for alias in group)) / self.total_weight
+
+    def relevance(self, title):
+        """Similarity of a hit title to the query in [0, 1]."""
+        title_groups = part_term_groups(title)
+        terms = {term for group in title_groups for term in group}
+        score = self._match(terms)
+
+        if (ACCESSORY_WORDS & terms) - self.accessories:
+            score -= _ACCESSORY_PENALTY
+        # "Breakout Board for ESP32 Development Board": the query only matches after "for"
+        head = title.lower().split(" for ", 1)
+        if len(head) == 2 and score > 0:
+            head_terms = {term for group in part_term_groups(head[0]) for term in group}
+            if self._match(head_terms) < 0.5:
+                score -= _FOR_PENALTY
+
+        packages, values = extract_attributes(terms)
+        if self.packages and packages:
+            score += _ATTRIBUTE_BONUS if self.packages & packages else -_ATTRIBUTE_CONFLICT
+        for unit, value in self.values.items():
+            if unit in values:
+                if abs(values[unit] - value) <= 1e-9 * max(1.0, value):
+                    score += _ATTRIBUTE_BONUS
+                else:
+                    score -= _ATTRIBUTE_CONFLICT
+        return max(0.0, min(1.0, score))
+
+
+def rank_options(query, hits, k=3):
+    """
+    Top k of (title, price, url) hits by relevance blended with price, best
+    first. Prices are normalized and hits without a usable price or link,
+    duplicates and hits below MIN_RELEVANCE are dropped.
+    Returns (top_k, good_enough) where good_enough means k hits were found
+    and all reach GOOD_RELEVANCE.
+    """
+    profile = query if isinstance(query, QueryProfile) else QueryProfile(query)
+    scored = []
+    seen = set()
+    for title, price, link in hits:
+        price = normalize_price(price)
+        if not title or price is None or not link or link in seen:
+            continue
+        seen.add(link)
+        relevance = profile.relevance(title)
+        if relevance >= MIN_RELEVANCE:
+            scored.append((relevance, price, title, link))
+    if not scored:
+        return [], False
+
+    cheapest = min(price for _, price, _, _ in scored)
+    top = heapq.nlargest(
+        k, scored,
+        key=lambda s: RELEVANCE_WEIGHT * s[0] + (1 - RELEVANCE_WEIGHT) * cheapest / s[1])
+    good_enough = len(top) == k and all(s[0] >= GOOD_RELEVANCE for s in top)
+    return [(title, price, link) for _, price, title, link in top], good_enough
@@ -0,0 +1,349 @@
+# agents/bill_of_material/plan_bom.py
+#
+# Combined plan + BOM generation. The separate pipeline makes two Gemini
+# round-trips: ProtoForgeAgent writes a free-form Markdown brief, then cli_bom
+# asks again for a 'BOM: [...]' reply and string-matches the prefix, which
+# breaks whenever the model wraps the JSON in prose or code fences. Here one
+# call with a response schema (structured output) returns the brief sections
+# and a typed BOM together. The reply is parsed and validated in one pass; a
+# reply that is not clean JSON is repair-parsed (code fences, surrounding
+# prose, trailing commas) before giving up. The reply is streamed: since the
+# schema orders the brief before the BOM, the brief's sections can be shown
+# while the rest of the reply is still being generated.
+#
+#   result = await generate_plan_and_bom("Objective: ... Budget: ...",
+#                                        on_partial=lambda brief: print(brief))
+#   result["brief"]  # Markdown with the usual brief sections
+#   result["bom"]    # [{"part", "quantity", "description"}, ...]
+#
+#   python -m agents.bill_of_material.plan_bom "Objective: a plant watering robot"
+
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+from database.sqlite_demo.llm_cache import get_llm_cache
+from middleware.llm_scheduler import estimate_tokens, scheduled_async_stream
+from middleware.resources import get_genai_client
+from middleware.retry import retry_async
+from middleware.tracing import span
+from agents.bill_of_material.cli_bom import GEMINI_MODEL, GEMINI_TIMEOUT
+
+# Use the combined call for the app's plan generation instead of brief-then-BOM
+COMBINED_PLAN_BOM = os.getenv("COMBINED_PLAN_BOM", "1") == "1"
+# Output budget for one brief plus BOM, used for scheduler admission
+PLAN_BOM_OUTPUT_TOKENS = int(os.getenv("PLAN_BOM_OUTPUT_TOKENS", "2000"))
+
+# (key in the response, heading in the brief); list sections render as bullets
+BRIEF_SECTIONS = (
+    ("title", "Project Title"),
+    ("objective", "Objective"),
+    ("key_features", "Key Features"),
+    ("core_components", "Core Components"),
+    ("constraints", "Constraints"),
+)
+_LIST_SECTIONS = {"key_features", "core_components", "constraints"}
+
+_STRING_LIST = {"type": "ARRAY", "items": {"type": "STRING"}}
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": {"type": "STRING"},
+        "objective": {"type": "STRING"},
+        "key_features": _STRING_LIST,
+        "core_components": _STRING_LIST,
+        "constraints": _STRING_LIST,
+        "bom": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "part": {"type": "STRING"},
+                    "quantity": {"type": "INTEGER", "minimum": 1},
+                    "description": {"type": "STRING"},
+                },
+                "required": ["part", "quantity", "description"],
+                "propertyOrdering": ["part", "quantity", "description"],
+            },
+        },
+    },
+    "required": [key for key, _ in BRIEF_SECTIONS] + ["bom"],
+    # Brief first, so the BOM is chosen with the brief already written
+    "propertyOrdering": [key for key, _ in BRIEF_SECTIONS] + ["bom"],
+}
+
+PLAN_BOM_INSTRUCTION = (
+    "You are an expert hardware project planner and hardware engineering assistant. "
+    "Based on the user's input, write a structured project brief and the Bill of Materials (BOM) "
+    "of electronic components and hardware parts needed to build it. "
+    "Infer the parts from the objective, budget, microcontroller, skill level and any additional information. "
+    "Use specific, searchable part names (e.g. 'ESP32 Development Board', '220 Ohm Resistor (1/4W)'). "
+    "Answer with a JSON object with these fields: title, objective (one paragraph), key_features, "
+    "core_components and constraints (lists of short strings) and bom (a list of objects with "
+    "part, quantity and description).\n\n"
+    "User Input: "
+)
+
+# Generation parameters that shape the reply; part of the response cache key
+# so replies made for an older schema are never served for the current one
+GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+
+_FENCE = re.compile(r"```[a-zA-Z]*")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def build_plan_bom_prompt(user_prompt):
+    return PLAN_BOM_INSTRUCTION + user_prompt.strip()
+
+
+def repair_json(text):
+    """
+    Best-effort reply object from a model reply that is not clean JSON:
+    strips code fences, skips prose around the object and drops trailing
+    commas. Nested objects (a lone BOM item) are not taken for the reply.
+    Raises ValueError if no object can be recovered.
+    """
+    text = _FENCE.sub("", text)
+    decoder = json.JSONDecoder()
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        start = candidate.find("{")
+        while start >= 0:
+            try:
+                data, _ = decoder.raw_decode(candidate, start)
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, dict) and ("bom" in data or "title" in data):
+                return data
+            start = candidate.find("{", start + 1)
+    raise ValueError("No plan/BOM JSON object found in the response")
+
+
+def partial_json(text):
+    """
+    Best-effort object from the start of a JSON reply that is still
+    streaming in: an unfinished string value is closed where it stops, an
+    unfinished key or number is dropped, and open arrays and objects are
+    closed. Returns {} if nothing usable has arrived yet.
+    """
+    stack = []          # open containers: "{" or "["
+    cut = None          # (end index, stack) of the last point where closing is valid
+    in_string = escape = is_key = False
+    expect_key = False  # the next string in the current object is a key
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if not is_key:
+                    cut = (i + 1, list(stack))
+            continue
+        if ch == '"':
+            in_string = True
+            is_key = expect_key
+            expect_key = False
+        elif ch in "{[":
+            stack.append(ch)
+            expect_key = ch == "{"
+            cut = (i + 1, list(stack))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            cut = (i + 1, list(stack))
+        elif ch == ",":
+            # Everything before the comma is complete; a number or literal ends here
+            expect_key = bool(stack) and stack[-1] == "{"
+            cut = (i, list(stack))
+
+    closers = {"{": "}", "[": "]"}
+    candidates = []
+    if in_string and not is_key:
+        candidates.append(text + '"' + "".join(closers[c] for c in reversed(stack)))
+    if cut is not None:
+        end, open_stack = cut
+        candidates.append(text[:end] + "".join(closers[c] for c in reversed(open_stack)))
+    for candidate in candidates:
+        try:
+            data = json.loads(_TRAILING_COMMA.sub(r"\1", candidate))
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return {}
+
+
+def partial_brief(text):
+    """Markdown for the brief sections present so far in a streaming reply."""
+    data = partial_json(text)
+    sections = {key: data[key] for key, _ in BRIEF_SECTIONS if key in data}
+    return render_brief(sections, only_present=True) if sections else ""
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _quantity(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        quantity = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity >= 1 else None
+
+
+def validate_plan_bom(data):
+    """
+    Normalize a decoded reply into {"sections": {...}, "bom": [...]} in one
+    pass, collecting every problem. List sections given as a single string are
+    split into lines and quantities given as strings are converted.
+    Raises ValueError listing all problems if the reply is unusable.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    errors = []
+    sections = {}
+    for key, _ in BRIEF_SECTIONS:
+        value = data.get(key)
+        if key in _LIST_SECTIONS:
+            if isinstance(value, str):
+                value = value.splitlines()
+            items = [_text(v).lstrip("-* ") for v in value] if isinstance(value, list) else []
+            sections[key] = [item for item in items if item]
+            if not sections[key] and key != "constraints":
+                errors.append(f"{key}: expected a non-empty list of strings")
+        else:
+            sections[key] = _text(value)
+            if not sections[key]:
+                errors.append(f"{key}: expected a non-empty string")
+
+    bom = []
+    items = data.get("bom")
+    if not isinstance(items, list) or not items:
+        errors.append("bom: expected a non-empty list")
+        items = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(f"bom[{i}]: expected an object")
+            continue
+        part = _text(item.get("part"))
+        quantity = _quantity(item.get("quantity", 1))
+        if not part:
+            errors.append(f"bom[{i}].part: expected a non-empty string")
+        if quantity is None:
+            errors.append(f"bom[{i}].quantity: expected a positive integer")
+        if part and quantity is not None:
+            bom.append({"part": part, "quantity": quantity, "description": _text(item.get("description"))})
+
+    if errors:
+        raise ValueError("Invalid plan/BOM response: " + "; ".join(errors))
+    return {"sections": sections, "bom": bom}
+
+
+def parse_plan_bom(text):
+    """
+    Parse and validate a combined reply. Clean JSON takes the fast path;
+    anything else is repair-parsed first. Returns (result, repaired).
+    """
+    try:
+        data = json.loads(text)
+        repaired = False
+    except json.JSONDecodeError:
+        data = repair_json(text)
+        repaired = True
+    return validate_plan_bom(data), repaired
+
+
+def render_brief(sections, only_present=False):
+    """
+    The brief as Markdown, with the same sections the Markdown planner
+    writes. With only_present, sections missing from `sections` are skipped.
+    """
+    lines = []
+    for key, heading in BRIEF_SECTIONS:
+        if only_present and key not in sections:
+            continue
+        value = sections.get(key)
+        if key in _LIST_SECTIONS and not isinstance(value, list):
+            value = [value] if isinstance(value, str) and value else []
+        if key in _LIST_SECTIONS:
+            lines.append(f"- **{heading}:**")
+            lines.extend(f"  - {item}" for item in value or ["None specified"])
+        else:
+            lines.append(f"- **{heading}:** {value}")
+    return "\n".join(lines) + "\n"
+
+
+async def generate_plan_and_bom(user_prompt, retries=4, delay=1.0, use_cache=True, on_partial=None):
+    """
+    Brief and BOM from one streamed structured-output Gemini call.
+    on_partial(brief_markdown) is called whenever more of the brief has
+    arrived, so it can be shown before the BOM is complete.
+    Returns {"brief": markdown, "sections": {...}, "bom": [...]}.
+    Raises ValueError if the reply cannot be parsed or validated.
+    """
+    with span("plan_bom.generate", model=GEMINI_MODEL) as s:
+        started = time.perf_counter()
+        prompt = build_plan_bom_prompt(user_prompt)
+        text = get_llm_cache().get(GEMINI_MODEL, prompt, GENERATION_CONFIG) if use_cache else None
+        cache_hit = text is not None
+        s.set("cache_hit", cache_hit)
+        if not cache_hit:
+            # Only opening the stream is retried; once chunks flow they are consumed as-is
+            stream = await retry_async(
+                lambda: scheduled_async_stream(
+                    lambda: get_genai_client().aio.models.generate_content_stream(
+                        model=GEMINI_MODEL,
+                        contents=prompt,
+                        config=GENERATION_CONFIG,
+                    ),
+                    estimate_tokens(prompt, expected_output=PLAN_BOM_OUTPUT_TOKENS),
+                    timeout=GEMINI_TIMEOUT,
+                ),
+                retries=retries,
+                base_delay=delay,
+            )
+            chunks = []
+            shown = shown_upto = ""
+            async for chunk in stream:
+                if not chunk.text:
+                    continue
+                chunks.append(chunk.text)
+                # The brief is complete once the BOM starts; stop re-parsing from there
+                if on_partial is not None and '"bom"' not in shown_upto:
+                    shown_upto = "".join(chunks)
+                    brief = partial_brief(shown_upto)
+                    if brief != shown:
+                        if not shown:
+                            s.set("time_to_first_section_s", round(time.perf_counter() - started, 4))
+                        shown = brief
+                        on_partial(brief)
+            text = "".join(chunks).strip()
+
+        with span("plan_bom.parse") as p:
+            result, repaired = parse_plan_bom(text)
+            p.set("repaired", repaired)
+        # Only replies that validated are cached
+        if use_cache and not cache_hit:
+            get_llm_cache().put(GEMINI_MODEL, prompt, text, GENERATION_CONFIG)
+        s.set("parts", len(result["bom"]))
+        return {"brief": render_brief(result["sections"]), **result}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python -m agents.bill_of_material.plan_bom \"<project description>\"")
+        sys.exit(1)
+    result = asyncio.run(generate_plan_and_bom(" ".join(sys.argv[1:])))
+    print(result["brief"])
+    print(json.dumps(result["bom"], indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
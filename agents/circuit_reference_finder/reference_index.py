@@ -0,0 +1,459 @@
+# agents/circuit_reference_finder/reference_index.py
+#
+# Local retrieval over reference circuits (schematics, wiring notes,
+# application notes), so "how do I wire X to Y" is answered from disk instead
+# of an LLM or a web search. Texts are embedded as sparse hashed TF vectors:
+# electronics-aware tokens from part_term_groups ("220 Ohm" -> 220ohm) and
+# adjacent-token bigrams are hashed into 2**REFERENCE_HASH_BITS buckets with
+# sublinear, L2-normalized weights. Queries are weighted by IDF squared at
+# search time, so stored vectors never change when the corpus grows.
+#
+# The index is an inverted file in NumPy arrays: postings sorted by bucket
+# (indptr / docs / weights, memory-mapped from .npy files) plus an append-only
+# tail of recent additions. add() only appends to the tail; once the tail
+# outgrows REFERENCE_MERGE_RATIO of the main postings it is merged in, as
+# search engines merge segments. A query gathers the postings of its buckets
+# and accumulates scores with one bincount per batch, so its cost follows the
+# postings it touches rather than the corpus size. Reference metadata lives
+# in SQLite next to the arrays.
+#
+#   python -m agents.circuit_reference_finder.reference_index ingest notes/ refs.jsonl
+#   python -m agents.circuit_reference_finder.reference_index search "wire DHT22 to ESP32"
+#   python -m agents.circuit_reference_finder.reference_index bom [project_id]
+
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from database.sqlite_demo.connection import connect
+from database.sqlite_demo.parts_catalog import part_term_groups
+
+DEFAULT_INDEX_DIR = os.getenv("REFERENCE_INDEX_DIR", "reference_index")
+HASH_BITS = int(os.getenv("REFERENCE_HASH_BITS", "20"))
+# Merge the tail into the main postings once it holds this share of them
+MERGE_RATIO = float(os.getenv("REFERENCE_MERGE_RATIO", "0.25"))
+# ... but never bother for fewer postings than this
+MERGE_MIN_POSTINGS = int(os.getenv("REFERENCE_MERGE_MIN_POSTINGS", "200000"))
+# Queries scored together in one bincount
+QUERY_BATCH = int(os.getenv("REFERENCE_QUERY_BATCH", "16"))
+
+# Words that say nothing about which circuit is meant
+STOPWORDS = {
+    "a", "an", "and", "are", "can", "connect", "do", "does", "for", "from", "how", "i", "in",
+    "is", "it", "my", "of", "on", "or", "the", "to", "use", "using", "what", "when", "wire",
+    "wiring", "with",
+}
+_BIGRAM_WEIGHT = 0.5
+_PARTS_WEIGHT = 2  # tokens of the listed parts count twice
+_MAX_MEMO = 1_000_000
+
+_POSTING = np.dtype([("doc", "<i4"), ("bucket", "<i4"), ("weight", "<f4")])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reference_docs (
+    id    INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    url   TEXT,
+    parts TEXT,
+    text  TEXT
+);
+"""
+
+_bucket_memo = {}
+
+# Immutable view of the index; searches read one while adds build the next
+_State = namedtuple("_State", "indptr docs weights tail df count merged")
+
+
+def _bucket(token, buckets):
+    key = (token, buckets)
+    bucket = _bucket_memo.get(key)
+    if bucket is None:
+        if len(_bucket_memo) >= _MAX_MEMO:
+            _bucket_memo.clear()
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = _bucket_memo[key] = int.from_bytes(digest, "little") % buckets
+    return bucket
+
+
+@lru_cache(maxsize=65536)
+def tokens(text):
+    """Index terms of a text: electronics-aware tokens with aliases, then bigrams of the tokens."""
+    groups = [group for group in part_term_groups(text) if group[0] not in STOPWORDS]
+    terms = tuple(term for group in groups for term in group)
+    bigrams = tuple(f"{a[0]} {b[0]}" for a, b in zip(groups, groups[1:]))
+    return terms, bigrams
+
+
+def vectorize(text, parts=(), buckets=1 << HASH_BITS):
+    """
+    Sparse hashed vector of a text (plus part names, weighted up) as
+    (sorted unique bucket ids, L2-normalized float32 weights).
+    """
+    counts = Counter()
+    for source, weight in [(text, 1)] + [(part, _PARTS_WEIGHT) for part in parts]:
+        terms, bigrams = tokens(source)
+        for term in terms:
+            counts[_bucket(term, buckets)] += weight
+        for bigram in bigrams:
+            counts[_bucket(bigram, buckets)] += weight * _BIGRAM_WEIGHT
+    if not counts:
+        return np.empty(0, np.int32), np.empty(0, np.float32)
+    ids = np.fromiter(counts.keys(), np.int32, len(counts))
+    weights = np.fromiter((1.0 + math.log(c) if c >= 1 else c for c in counts.values()),
+                          np.float32, len(counts))
+    order = np.argsort(ids)
+    weights = weights[order]
+    return ids[order], weights / np.linalg.norm(weights)
+
+
+def _gather(indptr, buckets):
+    """Positions of all postings of the given buckets in the main segment."""
+    starts = indptr[buckets]
+    lengths = indptr[buckets + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, np.int64), lengths
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(total), lengths
+
+
+class ReferenceIndex:
+    """
+    Reference circuits indexed for top-k similarity search. With path=None
+    the index lives in memory only; otherwise arrays and metadata are kept in
+    the directory `path`.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_DIR, hash_bits=HASH_BITS):
+        self.path = path
+        self.buckets = 1 << hash_bits
+        self._lock = threading.Lock()
+        self._meta = [] if path is None else None
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            connect(self._db_path).executescript(_SCHEMA)
+        self._state = self._load()
+
+    # --- storage -------------------------------------------------------------
+
+    @property
+    def _db_path(self):
+        return os.path.join(self.path, "references.sqlite3")
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _empty_state(self):
+        return _State(np.zeros(self.buckets + 1, np.int64), np.empty(0, np.int32),
+                      np.empty(0, np.float32), np.empty(0, _POSTING),
+                      np.zeros(self.buckets, np.int32), 0, 0)
+
+    def _load(self):
+        if self.path is None:
+            return self._empty_state()
+        row = connect(self._db_path).execute("SELECT MAX(id) FROM reference_docs").fetchone()
+        count = 0 if row[0] is None else row[0] + 1
+        state = self._empty_state()._replace(count=count)
+
+        manifest_path = self._file("manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["buckets"] != self.buckets:
+                raise ValueError(f"Index at {self.path} was built with {manifest['buckets']} buckets, "
+                                 f"not {self.buckets}; rebuild it or set REFERENCE_HASH_BITS")
+            generation = manifest["generation"]
+            state = state._replace(
+                indptr=np.load(self._file(f"indptr-{generation}.npy"), mmap_mode="r"),
+                docs=np.load(self._file(f"docs-{generation}.npy"), mmap_mode="r"),
+                weights=np.load(self._file(f"weights-{generation}.npy"), mmap_mode="r"),
+                merged=manifest["merged_docs"],
+            )
+
+        tail_path = self._file("tail.bin")
+        if os.path.exists(tail_path):
+            # A torn final record, postings already merged and postings whose
+            # metadata never committed are dropped, and the file rewritten
+            # without them so later ids can't pick them up
+            raw = np.fromfile(tail_path, dtype=np.uint8)
+            records = raw[:len(raw) - len(raw) % _POSTING.itemsize].view(_POSTING)
+            tail = records[(records["doc"] >= state.merged) & (records["doc"] < count)].copy()
+            if len(tail) != len(records) or len(raw) % _POSTING.itemsize:
+                tail.tofile(tail_path)
+            state = state._replace(tail=tail)
+        df = np.diff(state.indptr).astype(np.int32)
+        np.add.at(df, state.tail["bucket"], 1)
+        return state._replace(df=df)
+
+    # --- writing -------------------------------------------------------------
+
+    def add(self, references):
+        """
+        Append references ({"title", "text", "url", "parts"}) without
+        rebuilding the index. Returns their ids.
+        """
+        references = list(references)
+        if not references:
+            return []
+        vectors = [vectorize(f"{ref.get('title', '')}\n{ref.get('text', '')}", ref.get("parts") or (),
+                             self.buckets) for ref in references]
+        with self._lock:
+            state = self._state
+            first = state.count
+            ids = list(range(first, first + len(references)))
+            tail = np.empty(sum(len(b) for b, _ in vectors), _POSTING)
+            tail["doc"] = np.repeat(np.array(ids, np.int32), [len(b) for b, _ in vectors])
+            tail["bucket"] = np.concatenate([b for b, _ in vectors])
+            tail["weight"] = np.concatenate([w for _, w in vectors])
+
+            rows = [(i, ref.get("title") or "Untitled reference", ref.get("url"),
+                     json.dumps(list(ref.get("parts") or ()), ensure_ascii=False), ref.get("text", ""))
+                    for i, ref in zip(ids, references)]
+            if self.path is None:
+                self._meta.extend(rows)
+            else:
+                # Postings first: ones whose metadata never commits are dropped on load
+                with open(self._file("tail.bin"), "ab") as f:
+                    tail.tofile(f)
+                conn = connect(self._db_path)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        "INSERT INTO reference_docs (id, title, url, parts, text) VALUES (?, ?, ?, ?, ?)", rows)
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+
+            df = state.df.copy()
+            np.add.at(df, tail["bucket"], 1)
+            self._state = state._replace(tail=np.concatenate([state.tail, tail]), df=df,
+                                         count=first + len(references))
+            if len(self._state.tail) > max(MERGE_MIN_POSTINGS, MERGE_RATIO * len(self._state.docs)):
+                self._merge()
+        return ids
+
+    def merge(self):
+        """Fold the tail into the main postings now."""
+        with self._lock:
+            self._merge()
+
+    def _merge(self):
+        state = self._state
+        if not len(state.tail):
+            return
+        main_buckets = np.repeat(np.arange(self.buckets, dtype=np.int32), np.diff(state.indptr))
+        buckets = np.concatenate([main_buckets, state.tail["bucket"]])
+        order = np.argsort(buckets, kind="stable")
+        docs = np.concatenate([state.docs, state.tail["doc"]])[order]
+        weights = np.concatenate([state.weights, state.tail["weight"]])[order]
+        indptr = np.zeros(self.buckets + 1, np.int64)
+        np.cumsum(np.bincount(buckets, minlength=self.buckets), out=indptr[1:])
+
+        if self.path is not None:
+            generation = 0
+            manifest_path = self._file("manifest.json")
+            if os.path.exists(manifest_path):
+                with open(manifest_path, encoding="utf-8") as f:
+                    generation = json.load(f)["generation"] + 1
+            for name, array in (("indptr", indptr), ("docs", docs), ("weights", weights)):
+                np.save(self._file(f"{name}-{generation}.npy"), array)
+            # The manifest switch is the commit point; the old generation and tail go after it
+            with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"generation": generation, "buckets": self.buckets,
+                           "merged_docs": state.count}, f)
+            os.replace(manifest_path + ".tmp", manifest_path)
+            open(self._file("tail.bin"), "wb").close()
+            for name in ("indptr", "docs", "weights"):
+                old = self._file(f"{name}-{generation - 1}.npy")
+                if os.path.exists(old):
+                    os.remove(old)
+        self._state = state._replace(indptr=indptr, docs=docs, weights=weights,
+                                     tail=np.empty(0, _POSTING), merged=state.count)
+
+    # --- searching -----------------------------------------------------------
+
+    def _score_batch(self, state, queries, k):
+        count = state.count
+        flat, values = [], []
+        for row, query in enumerate(queries):
+            buckets, weights = vectorize(query, buckets=self.buckets)
+            if not len(buckets):
+                continue
+            idf = np.log((count + 1) / (state.df[buckets] + 1.0)) + 1.0
+            weights = weights * (idf * idf).astype(np.float32)
+
+            positions, lengths = _gather(state.indptr, buckets)
+            flat.append(row * count + state.docs[positions])
+            values.append(state.weights[positions] * np.repeat(weights, lengths))
+            if len(state.tail):
+                tail = state.tail[np.isin(state.tail["bucket"], buckets)]
+                flat.append(row * count + tail["doc"])
+                values.append(tail["weight"] * weights[np.searchsorted(buckets, tail["bucket"])])
+
+        results = [[] for _ in queries]
+        if not flat:
+            return results
+        scores = np.bincount(np.concatenate(flat), weights=np.concatenate(values),
+                             minlength=len(queries) * count).reshape(len(queries), count)
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for row, docs in enumerate(top):
+            row_scores = scores[row, docs]
+            for i in np.argsort(-row_scores):
+                if row_scores[i] > 0:
+                    results[row].append((int(docs[i]), float(row_scores[i])))
+        return results
+
+    def search(self, queries, k=5):
+        """
+        Top-k references per query, best first, as dicts with id, score,
+        title, url, parts and text. A single query string returns one list;
+        a list of queries is scored in batches and returns one list each.
+        """
+        single = isinstance(queries, str)
+        queries = [queries] if single else list(queries)
+        state = self._state
+        if not state.count or not queries:
+            return [] if single else [[] for _ in queries]
+        scored = []
+        for start in range(0, len(queries), QUERY_BATCH):
+            scored.extend(self._score_batch(state, queries[start:start + QUERY_BATCH], k))
+
+        metadata = self._metadata({doc for hits in scored for doc, _ in hits})
+        results = [[dict(metadata[doc], score=round(score, 4)) for doc, score in hits] for hits in scored]
+        return results[0] if single else results
+
+    def _metadata(self, ids):
+        if not ids:
+            return {}
+        if self.path is None:
+            rows = [self._meta[i] for i in ids]
+        else:
+            ids = sorted(ids)
+            rows = connect(self._db_path).execute(
+                f"SELECT id, title, url, parts, text FROM reference_docs WHERE id IN ({','.join('?' * len(ids))})",
+                ids).fetchall()
+        return {row[0]: {"id": row[0], "title": row[1], "url": row[2],
+                         "parts": json.loads(row[3] or "[]"), "text": row[4]} for row in rows}
+
+    def references_for_bom(self, sourced_parts, k=5):
+        """
+        References for a sourced BOM in one batch: per part, and for the
+        parts together (circuits that wire several of them to each other).
+        Returns {"bom": [...], "parts": {part: [...]}}.
+        """
+        parts = list(dict.fromkeys(entry["part"] for entry in sourced_parts if entry.get("part")))
+        if not parts:
+            return {"bom": [], "parts": {}}
+        hits = self.search(parts + ["\n".join(parts)], k)
+        return {"bom": hits[-1], "parts": dict(zip(parts, hits[:-1]))}
+
+    def stats(self):
+        state = self._state
+        return {
+            "references": state.count,
+            "postings": len(state.docs) + len(state.tail),
+            "tail_postings": len(state.tail),
+        }
+
+
+def load_corpus(path):
+    """
+    References from a .json/.jsonl file (objects with title, text or notes,
+    url, parts) or a directory of .md/.txt notes (title from the first line).
+    """
+    if os.path.isdir(path):
+        for directory, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith((".md", ".txt")):
+                    file_path = os.path.join(directory, name)
+                    with open(file_path, encoding="utf-8") as f:
+                        text = f.read()
+                    title = text.strip().splitlines()[0].lstrip("# ").strip() if text.strip() else name
+                    yield {"title": title, "text": text, "url": file_path}
+        return
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = json.load(f)
+        for record in records:
+            yield {
+                "title": record.get("title") or record.get("name"),
+                "text": record.get("text") or record.get("notes") or record.get("description") or "",
+                "url": record.get("url") or record.get("link"),
+                "parts": record.get("parts") or [],
+            }
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_reference_index():
+    """Process-wide index at REFERENCE_INDEX_DIR."""
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = ReferenceIndex()
+    return _default_index
+
+
+def _print_hits(hits):
+    for hit in hits:
+        parts = f" [{', '.join(hit['parts'])}]" if hit["parts"] else ""
+        print(f"  {hit['score']:.3f}  {hit['title']}{parts}  {hit['url'] or ''}")
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("ingest", "search", "bom", "merge", "stats"):
+        print("Usage: python -m agents.circuit_reference_finder.reference_index "
+              "ingest <file or dir>... | search <query> | bom [project_id] | merge | stats")
+        sys.exit(1)
+    index = get_reference_index()
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == "ingest":
+        batch = []
+        for path in args:
+            for reference in load_corpus(path):
+                batch.append(reference)
+                if len(batch) >= 5000:
+                    index.add(batch)
+                    batch = []
+        index.add(batch)
+        print(index.stats())
+    elif command == "search":
+        _print_hits(index.search(" ".join(args)))
+    elif command == "bom":
+        from database.sqlite_demo.project_store import get_project_store
+
+        store = get_project_store()
+        project_id = int(args[0]) if args else store.latest_project_id()
+        if project_id is None:
+            print("No projects in the project store.")
+            sys.exit(1)
+        found = index.references_for_bom(store.load_project(project_id)["parts"])
+        print("Whole BOM:")
+        _print_hits(found["bom"])
+        for part, hits in found["parts"].items():
+            print(f"{part}:")
+            _print_hits(hits)
+    elif command == "merge":
+        index.merge()
+        print(index.stats())
+    else:
+        print(index.stats())
+
+
+if __name__ == "__main__":
+    main()
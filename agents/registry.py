@@ -0,0 +1,103 @@
+# agents/registry.py
+#
+# Lazy registry of the agent packages under agents/ (bill_of_material,
+# circuit_reference_finder, roadmap_generator, ...). Discovery lists the
+# package directories without importing them; an agent module is imported the
+# first time it is asked for, so a page only pays the import cost (Gemini
+# SDKs, httpx, numpy) of the agents it actually calls, and only when it calls
+# them. Agent modules must not build clients or do network I/O at import
+# time; they create those on first use (see middleware.resources).
+#
+#   registry = get_agent_registry()
+#   registry.names()                                   # ["bill_of_material", ...]
+#   cli_bom = registry.load("bill_of_material", "cli_bom")
+#   cli_bom = load_agent("bill_of_material", "cli_bom")  # same, via the shared registry
+#
+# Import cost per module is reported by `python -m benchmarks.startup_profile`.
+
+import importlib
+import os
+import threading
+import time
+
+from middleware.tracing import register_gauges, span
+
+AGENTS_PACKAGE = "agents"
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class AgentRegistry:
+    """Agent packages found under a directory, imported on first load()."""
+
+    def __init__(self, root=AGENTS_DIR, package=AGENTS_PACKAGE):
+        self.root = root
+        self.package = package
+        self._lock = threading.Lock()
+        self._names = None
+        self._modules = {}
+        self.load_times = {}
+
+    def names(self):
+        """Agent package names, found by listing directories (nothing is imported)."""
+        if self._names is None:
+            with os.scandir(self.root) as entries:
+                self._names = sorted(
+                    entry.name for entry in entries
+                    if entry.is_dir() and entry.name.isidentifier() and not entry.name.startswith("_"))
+        return self._names
+
+    def __contains__(self, name):
+        return name in self.names()
+
+    def load(self, name, module=None):
+        """
+        The agent package `name`, or its submodule `module`, imported on first
+        use and memoized. Raises KeyError for an unknown agent.
+        """
+        if name not in self.names():
+            raise KeyError(f"Unknown agent: {name}")
+        path = f"{self.package}.{name}" + (f".{module}" if module else "")
+        loaded = self._modules.get(path)
+        if loaded is not None:
+            return loaded
+        # The import lock serializes imports anyway; this lock keeps load_times exact
+        with self._lock:
+            loaded = self._modules.get(path)
+            if loaded is None:
+                with span("agent.load", module=path):
+                    started = time.perf_counter()
+                    loaded = importlib.import_module(path)
+                    self.load_times[path] = round(time.perf_counter() - started, 4)
+                self._modules[path] = loaded
+        return loaded
+
+    def loaded(self):
+        """Modules imported through the registry, with their import time in seconds."""
+        return dict(self.load_times)
+
+    def stats(self):
+        return {
+            "discovered": len(self.names()),
+            "loaded": len(self._modules),
+            "load_seconds": sum(self.load_times.values()),
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_agent_registry():
+    """Process-wide registry of the packages under agents/."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AgentRegistry()
+                register_gauges("agents", _registry.stats)
+    return _registry
+
+
+def load_agent(name, module=None):
+    """Shortcut for get_agent_registry().load(name, module)."""
+    return get_agent_registry().load(name, module)
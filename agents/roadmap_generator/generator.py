@@ -0,0 +1,195 @@
+# agents/roadmap_generator/generator.py
+#
+# Builds the parts_data and steps_data that roadmap.roadmap_page renders from
+# a sourced BOM. Parts are classified by keyword rules (rules.CATEGORIES) and
+# the assembly steps are filled in from each category's templates, in
+# assembly order, so a BOM made of familiar parts gets its roadmap with no
+# LLM call in well under a millisecond. Only parts no rule recognizes are
+# sent to Gemini, all in one concurrent batch, asking for a category or a
+# couple of steps; the replies are kept in the LLM response cache (and in
+# memory), so each unknown part costs one call ever.
+#
+#   roadmap = generate_roadmap(project["parts"])
+#   roadmap_page(roadmap["parts_data"], roadmap["steps_data"])
+#
+#   python -m agents.roadmap_generator.generator [project_id]
+
+import html
+import json
+import re
+import sys
+import threading
+from functools import lru_cache
+from urllib.parse import quote_plus, urlparse
+
+from agents.roadmap_generator.rules import (
+    CATEGORIES, CATEGORY_NAMES, DEFAULT_MCU, FINAL_STEPS, OTHER_CATEGORY, OTHER_ICON, OVERRIDES)
+
+_ICONS = {name: icon for name, _, icon, _ in CATEGORIES}
+_TEMPLATES = {name: templates for name, _, _, templates in CATEGORIES}
+_RULES = tuple(
+    (name, re.compile(r"(?<![a-z0-9])(?:" + "|".join(re.escape(k) for k in keywords) + r")s?(?![a-z0-9])"))
+    for name, keywords in OVERRIDES + tuple((name, keywords) for name, keywords, _, _ in CATEGORIES)
+)
+DATASHEET_SEARCH_URL = "https://www.alldatasheet.com/view.jsp?Searchword="
+
+FALLBACK_INSTRUCTION = (
+    "You are a hardware assembly assistant. Classify the electronic part below for an assembly guide. "
+    "Answer with JSON only, no prose: {\"category\": one of " + json.dumps(list(CATEGORY_NAMES))
+    + " or \"other\", \"steps\": [one or two short steps for wiring this part into a "
+    "microcontroller project; only needed for \"other\"]}.\n\nPart: "
+)
+
+# Fallback answers for this process; the LLM response cache keeps them across runs
+_fallbacks = {}
+_fallbacks_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4096)
+def classify(part_name):
+    """The rule category of a part name, or None if no rule recognizes it."""
+    name = part_name.lower()
+    for category, pattern in _RULES:
+        if pattern.search(name):
+            return category
+    return None
+
+
+def _parse_fallback(text):
+    """(category, steps) from a fallback reply; unusable replies become ("other", [])."""
+    text = re.sub(r"```[a-zA-Z]*", "", text or "").strip()
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        data = json.loads(text[start:end + 1]) if start >= 0 else {}
+    except json.JSONDecodeError:
+        data = {}
+    category = data.get("category") if isinstance(data, dict) else None
+    if category in CATEGORY_NAMES:
+        return category, []
+    steps = data.get("steps") if isinstance(data, dict) else None
+    steps = [s.strip() for s in steps if isinstance(s, str) and s.strip()][:2] if isinstance(steps, list) else []
+    return OTHER_CATEGORY, steps
+
+
+async def classify_unknown(part_names):
+    """
+    {part: (category, steps)} for parts no rule recognizes, from one
+    concurrent batch of cached Gemini calls.
+    """
+    from agents.registry import load_agent
+
+    missing = [name for name in dict.fromkeys(part_names) if name not in _fallbacks]
+    if missing:
+        cli_bom = load_agent("bill_of_material", "cli_bom")
+        conversations = [[{"role": "user", "content": FALLBACK_INSTRUCTION + name}] for name in missing]
+        try:
+            replies = await cli_bom.call_gemini_many(conversations)
+        except Exception as e:
+            # The roadmap still renders; these parts get a generic step and are retried next time
+            print(f"[DEBUG] Roadmap fallback failed for {len(missing)} parts: {e}")
+            replies = []
+        with _fallbacks_lock:
+            for name, reply in zip(missing, replies):
+                _fallbacks[name] = _parse_fallback(reply)
+    return {name: _fallbacks.get(name, (OTHER_CATEGORY, [])) for name in part_names}
+
+
+def _doc_link(entry):
+    """Cheapest sourced option's page, else a datasheet search for the part."""
+    options = [o for o in entry.get("options") or []
+               if urlparse(o.get("link") or "").scheme in ("http", "https")]
+    if options:
+        return min(options, key=lambda o: o.get("price") or float("inf"))["link"]
+    return DATASHEET_SEARCH_URL + quote_plus(entry.get("part", ""))
+
+
+def _join(names):
+    names = [f"<b>{html.escape(name)}</b>" for name in names]
+    return names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+
+
+def build_roadmap(sourced_parts, fallbacks=None):
+    """
+    parts_data and steps_data for a sourced BOM, from the rules plus
+    `fallbacks` ({part: (category, steps)}) for parts the rules don't know.
+    Unknown parts without a fallback are listed under "unrecognized".
+    """
+    fallbacks = fallbacks or {}
+    grouped = {}
+    extra_steps = []
+    parts_data = []
+    unrecognized = []
+    for entry in sourced_parts:
+        name = entry.get("part")
+        if not name:
+            continue
+        category = classify(name)
+        if category is None:
+            category, steps = fallbacks.get(name, (OTHER_CATEGORY, []))
+            if name not in fallbacks:
+                unrecognized.append(name)
+            extra_steps.extend(html.escape(step) for step in steps)
+        grouped.setdefault(category, []).append(name)
+        # Rendered as HTML: names come from the LLM's BOM and links from search results
+        parts_data.append({
+            "name": html.escape(name),
+            "quantity": entry.get("quantity", 1),
+            "category": category,
+            "icon": _ICONS.get(category, OTHER_ICON),
+            "doc": html.escape(_doc_link(entry)),
+        })
+
+    mcu = _join(grouped["mcu"][:1]) if grouped.get("mcu") else DEFAULT_MCU
+    steps_data = []
+    for category in CATEGORY_NAMES:
+        if category in grouped:
+            parts = _join(grouped[category])
+            steps_data.extend(t.format(parts=parts, mcu=mcu) for t in _TEMPLATES[category])
+    if grouped.get(OTHER_CATEGORY):
+        steps_data.extend(extra_steps or [
+            f"Connect the {_join(grouped[OTHER_CATEGORY])} following the datasheet pinout and test it on its own."])
+    steps_data.extend(t.format(mcu=mcu) for t in FINAL_STEPS)
+
+    # Parts in assembly order, as the steps walk through them
+    order = {category: i for i, category in enumerate(CATEGORY_NAMES + (OTHER_CATEGORY,))}
+    parts_data.sort(key=lambda part: order[part["category"]])
+    return {"parts_data": parts_data, "steps_data": steps_data, "unrecognized": unrecognized}
+
+
+async def generate_roadmap_async(sourced_parts, use_llm=True):
+    """build_roadmap, asking the LLM (cached) about parts the rules don't recognize."""
+    unknown = [entry["part"] for entry in sourced_parts if entry.get("part") and classify(entry["part"]) is None]
+    fallbacks = await classify_unknown(unknown) if unknown and use_llm else None
+    return build_roadmap(sourced_parts, fallbacks)
+
+
+def generate_roadmap(sourced_parts, use_llm=True):
+    """
+    Synchronous generate_roadmap_async for Streamlit pages. A BOM the rules
+    fully cover never touches the event loop.
+    """
+    unknown = [entry["part"] for entry in sourced_parts if entry.get("part") and classify(entry["part"]) is None]
+    if not unknown or not use_llm:
+        return build_roadmap(sourced_parts)
+    from middleware.resources import run_async
+
+    return build_roadmap(sourced_parts, run_async(classify_unknown(unknown)))
+
+
+def main():
+    from database.sqlite_demo.project_store import get_project_store
+
+    store = get_project_store()
+    project_id = int(sys.argv[1]) if len(sys.argv) > 1 else store.latest_project_id()
+    if project_id is None:
+        print("No projects in the project store.")
+        sys.exit(1)
+    roadmap = generate_roadmap(store.load_project(project_id)["parts"])
+    for part in roadmap["parts_data"]:
+        print(f"{part['icon']} {html.unescape(part['name'])} x{part['quantity']} ({part['category']})")
+    for number, step in enumerate(roadmap["steps_data"], 1):
+        print(f"{number}. {re.sub(r'<[^>]+>', '', step)}")
+
+
+if __name__ == "__main__":
+    main()
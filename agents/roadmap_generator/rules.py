@@ -0,0 +1,107 @@
+# agents/roadmap_generator/rules.py
+#
+# Rule and template library for deterministic roadmaps. Each part category
+# has the keywords that recognize it in a part name, an icon, and the
+# assembly step templates it contributes. Categories are listed in assembly
+# order: the bench is prepared first, then power and the microcontroller,
+# then everything that hangs off them, and firmware and testing come last.
+# Templates take {parts} (the category's parts, joined) and {mcu} (the
+# project's microcontroller board).
+
+# (category, keywords, icon, step templates); the first matching category wins,
+# so more specific ones (LED strip, motor driver) come before generic ones
+CATEGORIES = (
+    ("prep", ("breadboard", "jumper", "wires", "dupont", "perfboard", "pcb", "solder", "header pins"),
+     "🧰", (
+        "Lay out the {parts} and set up the power rails: red rail for supply, blue rail for ground.",
+    )),
+    ("power", ("power supply", "battery", "18650", "lipo", "li-ion", "charging", "charger", "tp4056",
+               "buck", "boost", "regulator", "lm7805", "7805", "ams1117", "adapter", "power bank",
+               "solar panel", "dc jack"),
+     "🔋", (
+        "Connect the {parts} to the power rails and measure the rail voltage with a multimeter "
+        "before connecting the {mcu}.",
+    )),
+    ("led_strip", ("ws2812", "ws2812b", "neopixel", "sk6812", "led strip", "led ring", "led matrix"),
+     "🌈", (
+        "Power the {parts} from the external 5V supply, not the {mcu}'s regulator, and add a "
+        "1000 µF capacitor across its supply terminals.",
+        "Connect the {parts} data input to a {mcu} GPIO through a 330 Ω resistor and share ground.",
+    )),
+    ("mcu", ("esp32", "esp8266", "nodemcu", "arduino", "raspberry pi", "pico", "stm32", "attiny",
+             "atmega", "microcontroller", "development board", "dev board", "wemos", "teensy"),
+     "🧠", (
+        "Seat the {parts} on the breadboard (straddling the center channel) and connect its GND pin "
+        "to the ground rail.",
+        "Install the board package for the {mcu} in the Arduino IDE or PlatformIO and upload a blink "
+        "sketch to confirm the board and USB cable work.",
+    )),
+    ("display", ("oled", "lcd", "display", "tft", "e-paper", "epaper", "7 segment", "seven segment"),
+     "🖥️", (
+        "Connect the {parts} to the {mcu} (I2C displays to SDA/SCL, parallel or SPI ones per the "
+        "datasheet pinout) and power it at its rated voltage.",
+        "Install the display library and show a test message on the {parts}.",
+    )),
+    ("driver", ("motor driver", "l298n", "l293d", "drv8825", "a4988", "tb6612", "relay", "mosfet",
+                "transistor", "uln2003"),
+     "🎛️", (
+        "Wire the {parts}: control inputs to {mcu} GPIO pins, load supply from the external supply, "
+        "and a common ground with the {mcu}.",
+    )),
+    ("actuator", ("motor", "servo", "stepper", "pump", "solenoid", "buzzer", "speaker", "fan"),
+     "⚙️", (
+        "Connect the {parts} to their driver or a PWM-capable {mcu} pin; power anything that draws more "
+        "than a few milliamps from the external supply.",
+        "Run each of the {parts} alone in a test sketch before combining them.",
+    )),
+    ("sensor", ("sensor", "dht11", "dht22", "hc-sr04", "hcsr04", "ultrasonic", "pir", "mpu6050",
+                "accelerometer", "gyroscope", "bme280", "bmp280", "ldr", "photoresistor", "thermistor",
+                "ds18b20", "moisture", "gps", "camera", "microphone", "load cell", "hx711"),
+     "📡", (
+        "Connect the {parts}: VCC to 3.3V or 5V as rated, GND to ground, and signal pins to {mcu} "
+        "GPIO (I2C sensors to SDA/SCL). Use a level shifter for 5V signals into a 3.3V board.",
+        "Read the {parts} in a test sketch and check the values on the serial monitor.",
+    )),
+    ("led", ("led",),
+     "💡", (
+        "Wire the {parts} to {mcu} GPIO pins: anode through a current-limiting resistor "
+        "(220–330 Ω), cathode to ground.",
+    )),
+    ("passive", ("resistor", "capacitor", "inductor", "diode", "potentiometer", "crystal"),
+     "⚡", (
+        "Place the {parts} where the circuit needs them: series resistors for LEDs, pull-ups on "
+        "open inputs, decoupling capacitors close to supply pins.",
+    )),
+    ("input", ("button", "switch", "keypad", "joystick", "rotary encoder", "encoder", "touch"),
+     "🔘", (
+        "Wire the {parts} between {mcu} GPIO pins and ground, enable the internal pull-ups "
+        "(INPUT_PULLUP) and debounce in software.",
+    )),
+    ("communication", ("bluetooth", "hc-05", "hc05", "hc-06", "nrf24", "nrf24l01", "lora", "gsm",
+                       "sim800", "rfid", "rc522", "wifi module", "can bus", "rs485", "ir receiver"),
+     "📶", (
+        "Connect the {parts} to the {mcu} (UART TX to RX and RX to TX, or SPI/I2C per the datasheet) "
+        "and confirm it responds using its example sketch.",
+    )),
+)
+
+# (category, keywords) checked before CATEGORIES, for part names that contain
+# an earlier category's keyword but belong to a later one: a breadboard power
+# supply module is power (it needs the rail voltage check), not bench prep
+OVERRIDES = (
+    ("power", ("breadboard power", "breadboard psu", "mb102")),
+)
+
+# Steps after all parts are wired
+FINAL_STEPS = (
+    "Upload the full firmware to the {mcu} and bring up one subsystem at a time, checking each "
+    "before enabling the next.",
+    "Tidy and secure the wiring, then mount everything in its enclosure and run a final test.",
+)
+
+# Parts the LLM fallback couldn't place join here, after the known categories
+OTHER_CATEGORY = "other"
+OTHER_ICON = "🔹"
+DEFAULT_MCU = "microcontroller"
+
+CATEGORY_NAMES = tuple(name for name, _, _, _ in CATEGORIES)
@@ -1,12 +1,8 @@
 # app.py
 
 import streamlit as st
-from main_agent import ProtoForgeAgent
-
-# --- Helper Function to Load CSS ---
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+from middleware.resources import get_planner
+from frontend.rendering import load_css
 
 # --- Page Configuration (must be the first Streamlit command) ---
 st.set_page_config(
@@ -81,22 +77,22 @@ elif st.session_state.step == 5:
 
 # --- Backend Trigger and Result Display ---
 if st.session_state.generating:
-    with st.spinner("The Master Planner is structuring your idea..."):
-        # Combine all user inputs into a single, clean prompt
-        full_concept = " ".join(f"{k}: {v}." for k, v in st.session_state.user_inputs.items())
-        
-        try:
-            # Instantiate and call the backend
-            planner = ProtoForgeAgent()
-            initial_plan = planner.generate_initial_plan(full_concept)
-            st.session_state.plan = initial_plan
-        except Exception as e:
-            # Catch potential errors (like a missing API key) and display them
-            st.session_state.plan = f"### An Error Occurred\n**Please check your terminal for details.**\n\n**Error details:**\n```\n{e}\n```"
-        
-        st.session_state.generating = False
-        st.session_state.step = 6
-        st.rerun()
+    # Combine all user inputs into a single, clean prompt
+    full_concept = " ".join(f"{k}: {v}." for k, v in st.session_state.user_inputs.items())
+
+    try:
+        # Reuse the process-wide planner and stream the brief as it is generated
+        planner = get_planner()
+        st.subheader("Generated Project Brief")
+        initial_plan = st.write_stream(planner.stream_initial_plan(full_concept))
+        st.session_state.plan = initial_plan
+    except Exception as e:
+        # Catch potential errors (like a missing API key) and display them
+        st.session_state.plan = f"### An Error Occurred\n**Please check your terminal for details.**\n\n**Error details:**\n```\n{e}\n```"
+
+    st.session_state.generating = False
+    st.session_state.step = 6
+    st.rerun()
 
 if st.session_state.step == 6:
     st.success("The initial project brief is ready!")
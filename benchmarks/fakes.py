@@ -0,0 +1,238 @@
+# benchmarks/fakes.py
+#
+# Local stand-ins for the two external services the pipeline depends on, so
+# benchmarks measure our code rather than findparts.in or Gemini.
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PART_POOL = [
+    "ESP32 Development Board", "Arduino Uno R3", "Breadboard", "Jumper Wires",
+    "220 Ohm Resistor (1/4W)", "10k Ohm Resistor", "5mm Red LED", "5mm Green LED",
+    "LED Strip (WS2812B)", "5V Power Supply", "DHT22 Temperature Sensor",
+    "HC-SR04 Ultrasonic Sensor", "SG90 Servo Motor", "L298N Motor Driver",
+    "0.96 inch OLED Display", "16x2 LCD Display", "Relay Module 5V",
+    "18650 Battery Holder", "TP4056 Charging Module", "Push Button Switch",
+    "Buzzer Module", "PIR Motion Sensor", "Soil Moisture Sensor",
+    "MPU6050 Accelerometer", "100uF Capacitor",
+]
+
+PLAN_TEXT = (
+    "- **Project Title:** Benchmark Build\n"
+    "- **Objective:** Exercise the planning pipeline with a realistic brief.\n"
+    "- **Key Features:** Wi-Fi control, status LEDs, low power sleep.\n"
+    "- **Core Components:** ESP32, LEDs, resistors, power supply.\n"
+    "- **Constraints:** Under $50, beginner friendly, battery powered.\n"
+)
+
+
+class FakeFindpartsServer:
+    """
+    Threaded HTTP server answering /search?q=... with findparts-style
+    {"hits": [{"_source": {...}}]} payloads after a configurable delay.
+    A fraction of requests (error_rate) answer 503 instead, and a fraction
+    (slow_rate) take slow_latency, to exercise tail-latency handling.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, hits=8, seed=0,
+                 slow_rate=0.0, slow_latency=2.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.hits = hits
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/search"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                    delay = max(0.0, fake._random.gauss(fake.latency, fake.jitter))
+                    fail = fake._random.random() < fake.error_rate
+                    if fake._random.random() < fake.slow_rate:
+                        delay = fake.slow_latency
+                time.sleep(delay)
+                if fail:
+                    body = b'{"error": "unavailable"}'
+                    self.send_response(503)
+                else:
+                    query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+                    body = json.dumps(fake.payload(query)).encode("utf-8")
+                    self.send_response(200)
+                try:
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (deadline or a hedged duplicate won)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def payload(self, query):
+        rng = random.Random(query)
+        return {"hits": [
+            {"_source": {
+                "title": f"{query} variant {i}",
+                "price": round(rng.uniform(5, 500), 2),
+                "url": f"https://vendor.example/{i}/{query.replace(' ', '-').lower()}",
+            }}
+            for i in range(self.hits)
+        ]}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+def bom_response(prompt):
+    """Canned 'BOM: [...]' reply; the BOM size is read from 'parts=N' in the prompt."""
+    match = re.search(r"parts=(\d+)", prompt)
+    size = int(match.group(1)) if match else 5
+    items = [
+        {"part": PART_POOL[i % len(PART_POOL)] + ("" if i < len(PART_POOL) else f" #{i}"),
+         "quantity": 1 + i % 3, "description": "Benchmark part"}
+        for i in range(size)
+    ]
+    return "BOM: " + json.dumps(items, indent=2)
+
+
+def plan_bom_response(prompt):
+    """Canned structured-output reply for plan_bom: the brief sections plus the BOM of bom_response."""
+    return json.dumps({
+        "title": "Benchmark Build",
+        "objective": "Exercise the planning pipeline with a realistic brief.",
+        "key_features": ["Wi-Fi control", "Status LEDs", "Low power sleep"],
+        "core_components": ["ESP32", "LEDs", "Resistors", "Power supply"],
+        "constraints": ["Under $50", "Beginner friendly", "Battery powered"],
+        "bom": json.loads(bom_response(prompt)[len("BOM: "):]),
+    })
+
+
+def reference_corpus(size, seed=0):
+    """Synthetic reference circuits wiring pairs of PART_POOL parts, for the reference index."""
+    rng = random.Random(seed)
+    verbs = ["Wiring", "Interfacing", "Driving", "Powering", "Reading", "Controlling"]
+    details = ["with a pull-up resistor", "over I2C", "via PWM", "using a level shifter",
+               "with decoupling capacitors", "on a breadboard", "from a LiPo battery"]
+    for i in range(size):
+        a, b = rng.sample(PART_POOL, 2)
+        yield {
+            "title": f"{rng.choice(verbs)} {a} to {b} #{i}",
+            "text": f"Connect the {a} to the {b} {rng.choice(details)}.",
+            "parts": [a, b],
+            "url": f"https://refs.example/{i}",
+        }
+
+
+def _split(text, chunk_chars):
+    return [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+
+
+class _FakeAsyncModels:
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def generate_content(self, model, contents, config=None):
+        backend = self._backend
+        backend.calls += 1
+        # A response schema means a plan_bom structured-output call
+        structured = config and config.get("response_schema")
+        text = plan_bom_response(contents) if structured else bom_response(contents)
+        await asyncio.sleep(backend.first_token_latency
+                            + backend.token_interval * len(_split(text, backend.chunk_chars)))
+        return _Chunk(text)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        backend = self._backend
+        backend.calls += 1
+        structured = config and config.get("response_schema")
+        text = plan_bom_response(contents) if structured else bom_response(contents)
+        chunks = _split(text, backend.chunk_chars)
+
+        async def stream():
+            await asyncio.sleep(backend.first_token_latency)
+            for chunk in chunks:
+                await asyncio.sleep(backend.token_interval)
+                yield _Chunk(chunk)
+
+        return stream()
+
+
+class FakeGenaiClient:
+    """
+    Mimics the google-genai client surface cli_bom uses (client.aio.models.*).
+    Responses take first_token_latency plus token_interval per streamed chunk.
+    """
+
+    def __init__(self, first_token_latency=0.3, token_interval=0.01, chunk_chars=40):
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+        self.aio = type("Aio", (), {})()
+        self.aio.models = _FakeAsyncModels(self)
+
+
+class FakePlanModel:
+    """Mimics google.generativeai.GenerativeModel for ProtoForgeAgent, with simulated token streaming."""
+
+    def __init__(self, first_token_latency=0.3, token_interval=0.01, chunk_chars=40):
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+
+    def _stream(self):
+        time.sleep(self.first_token_latency)
+        for chunk in _split(PLAN_TEXT, self.chunk_chars):
+            time.sleep(self.token_interval)
+            yield _Chunk(chunk)
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        if stream:
+            return self._stream()
+        return _Chunk("".join(chunk.text for chunk in self._stream()))
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.first_token_latency
+                            + self.token_interval * len(_split(PLAN_TEXT, self.chunk_chars)))
+        return _Chunk(PLAN_TEXT)
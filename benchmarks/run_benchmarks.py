@@ -0,0 +1,348 @@
+"""
+End-to-end benchmarks against local stand-ins for findparts and Gemini.
+
+    python -m benchmarks.run_benchmarks --output bench_results.json
+    python -m benchmarks.run_benchmarks --quick --search-latency 0.2 --error-rate 0.05
+
+Drives generate_bom_and_source_parts, ProtoForgeAgent.generate_initial_plan
+(plus time-to-first-token of stream_initial_plan), brief-then-BOM against
+the combined plan_bom call, reference index lookups, part sourcing with a
+slow tail and during a search outage, and the batch path at several BOM
+sizes and concurrency levels. Writes p50/p95/p99 latency,
+throughput and peak traced memory per scenario as JSON, so results can be
+diffed between releases.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Caches and output files go to a scratch directory, never the working tree
+_WORKDIR = tempfile.mkdtemp(prefix="protoforge-bench-")
+os.environ["PART_CACHE_PATH"] = os.path.join(_WORKDIR, "part_cache.sqlite3")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_WORKDIR, "llm_cache.sqlite3")
+os.environ["PROJECT_STORE_PATH"] = os.path.join(_WORKDIR, "projects.sqlite3")
+# The fakes have no quota; keep the Gemini scheduler from throttling them
+os.environ.setdefault("GEMINI_RPM", "1000000")
+os.environ.setdefault("GEMINI_TPM", "1000000000")
+
+from agents.bill_of_material import batch_bom, cli_bom, plan_bom  # noqa: E402
+from agents.circuit_reference_finder.reference_index import ReferenceIndex  # noqa: E402
+from benchmarks.fakes import (  # noqa: E402
+    PART_POOL, FakeFindpartsServer, FakeGenaiClient, FakePlanModel, reference_corpus)
+from database.sqlite_demo.llm_cache import get_llm_cache  # noqa: E402
+from database.sqlite_demo.part_cache import get_part_cache  # noqa: E402
+from main_agent import ProtoForgeAgent  # noqa: E402
+from middleware.resources import close_http_client, set_genai_client  # noqa: E402
+
+percentile = batch_bom.percentile
+
+
+def summarize(latencies, elapsed, operations, **extra):
+    latencies = sorted(latencies)
+    result = {
+        "operations": operations,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_ops_per_s": round(operations / elapsed, 3) if elapsed else 0.0,
+        "latency_s": {
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+        },
+        "peak_memory_bytes": tracemalloc.get_traced_memory()[1],
+    }
+    result.update(extra)
+    return result
+
+
+def reset_caches():
+    """Benchmarks measure the uncached path; cache hits would hide the work."""
+    get_part_cache().clear()
+    get_llm_cache().clear()
+
+
+async def bench_bom(bom_size, concurrency, iterations, pipelines):
+    """generate_bom_and_source_parts, `pipelines` at a time, with `concurrency` lookups in flight."""
+    cli_bom.SOURCING_CONCURRENCY = concurrency
+    cli_bom.SOURCING_PER_HOST_LIMIT = concurrency
+    latencies = []
+    failed_lookups = 0
+
+    async def one(description):
+        nonlocal failed_lookups
+        started = time.perf_counter()
+        sourced_parts, error = await cli_bom.generate_bom_and_source_parts(description)
+        latencies.append(time.perf_counter() - started)
+        if error:
+            raise RuntimeError(error)
+        failed_lookups += sum(1 for entry in sourced_parts if "error" in entry)
+
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    for run in range(iterations):
+        reset_caches()
+        await asyncio.gather(*(
+            one(f"Benchmark project parts={bom_size} run={run}-{p}") for p in range(pipelines)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, len(latencies), failed_lookups=failed_lookups)
+
+
+def bench_plan(iterations):
+    """Blocking generate_initial_plan latency and stream_initial_plan time-to-first-token."""
+    planner = ProtoForgeAgent(model=FakePlanModel())
+    latencies = []
+    first_tokens = []
+
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    for run in range(iterations):
+        t0 = time.perf_counter()
+        planner.generate_initial_plan(f"Benchmark brief {run}", use_cache=False)
+        latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        stream = planner.stream_initial_plan(f"Benchmark brief {run}", use_cache=False)
+        next(stream)
+        first_tokens.append(time.perf_counter() - t0)
+        for _ in stream:
+            pass
+    elapsed = time.perf_counter() - started
+
+    first_tokens.sort()
+    return summarize(latencies, elapsed, iterations, time_to_first_token_s={
+        "p50": round(percentile(first_tokens, 50), 4),
+        "p95": round(percentile(first_tokens, 95), 4),
+        "p99": round(percentile(first_tokens, 99), 4),
+    })
+
+
+async def bench_plan_bom(bom_size, iterations):
+    """Brief then BOM extraction (two LLM calls) against one combined structured-output call, both sourced."""
+    planner = ProtoForgeAgent(model=FakePlanModel())
+    results = {}
+    for mode in ("separate", "combined"):
+        latencies = []
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        for run in range(iterations):
+            reset_caches()
+            concept = f"Benchmark brief parts={bom_size} run={run}"
+            t0 = time.perf_counter()
+            if mode == "separate":
+                brief = await asyncio.to_thread(planner.generate_initial_plan, concept)
+                _, error = await cli_bom.generate_bom_and_source_parts(f"{brief}\n{concept}")
+            else:
+                result = await plan_bom.generate_plan_and_bom(concept)
+                _, error = await cli_bom.generate_bom_and_source_parts(
+                    result["brief"], bom=result["bom"])
+            if error:
+                raise RuntimeError(error)
+            latencies.append(time.perf_counter() - t0)
+        results[mode] = summarize(latencies, time.perf_counter() - started, iterations)
+    return results
+
+
+def bench_references(corpus_size, iterations):
+    """Reference index lookups over a synthetic corpus: single queries and one BOM batch."""
+    index = ReferenceIndex(path=None)
+    corpus = list(reference_corpus(corpus_size))
+    started = time.perf_counter()
+    for start in range(0, corpus_size, 10000):
+        index.add(corpus[start:start + 10000])
+    ingest_s = time.perf_counter() - started
+
+    queries = ["how do I wire a DHT22 Temperature Sensor to an ESP32 Development Board",
+               "SG90 Servo Motor via PWM", "L298N Motor Driver with Arduino Uno R3"]
+    bom = [{"part": part} for part in PART_POOL[:10]]
+    latencies = []
+    bom_latencies = []
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    for run in range(iterations * 10):
+        t0 = time.perf_counter()
+        index.search(queries[run % len(queries)], k=5)
+        latencies.append(time.perf_counter() - t0)
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        index.references_for_bom(bom, k=5)
+        bom_latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    bom_latencies.sort()
+    return summarize(latencies, elapsed, len(latencies), ingest_s=round(ingest_s, 2),
+                     corpus_size=corpus_size, bom_batch_latency_s={
+                         "p50": round(percentile(bom_latencies, 50), 4),
+                         "p95": round(percentile(bom_latencies, 95), 4),
+                     })
+
+
+async def bench_tail(server, bom_size, iterations):
+    """
+    source_parts against a search backend with a slow tail, with and without
+    hedged requests, then during an outage (every search answers 503) with
+    expired cache entries that can only be served as last known results.
+    """
+    http_client = cli_bom.get_http_client()
+    bom = [{"part": PART_POOL[i % len(PART_POOL)] + f" tail {i}", "quantity": 1} for i in range(bom_size)]
+    results = {}
+
+    async def run(mode, runs):
+        latencies = []
+        failed = 0
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        for _ in range(runs):
+            get_part_cache().clear()
+            t0 = time.perf_counter()
+            sourced = await cli_bom.source_parts(bom, http_client)
+            latencies.append(time.perf_counter() - t0)
+            failed += sum(1 for entry in sourced if "error" in entry)
+        results[mode] = summarize(latencies, time.perf_counter() - started, runs, failed_lookups=failed,
+                                  hedging=cli_bom.search_hedger.stats())
+
+    max_ratio = cli_bom.search_hedger.max_ratio
+    server.slow_rate, server.slow_latency = 0.02, 1.0
+    try:
+        cli_bom.search_hedger.max_ratio = 0.0
+        await run("unhedged", iterations)
+        cli_bom.search_hedger.max_ratio = max_ratio
+        await run("hedged", iterations)
+    finally:
+        cli_bom.search_hedger.max_ratio = max_ratio
+        server.slow_rate = 0.0
+
+    # Outage: entries are present but expired, the breaker fails the rest fast
+    cache = get_part_cache()
+    ttl, stale_ttl, error_rate = cache.ttl, cache.stale_ttl, server.error_rate
+    await cli_bom.source_parts(bom, http_client)
+    cache.ttl = cache.stale_ttl = -1.0
+    server.error_rate = 1.0
+    try:
+        latencies = []
+        served = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            sourced = await cli_bom.source_parts(bom, http_client)
+            latencies.append(time.perf_counter() - t0)
+            served += sum(1 for entry in sourced if entry["options"])
+        results["outage"] = summarize(latencies, time.perf_counter() - started, iterations,
+                                      served_lookups=served, breaker=cli_bom.search_breaker.stats())
+    finally:
+        cache.ttl, cache.stale_ttl, server.error_rate = ttl, stale_ttl, error_rate
+        cli_bom.search_breaker.reset()
+    return results
+
+
+async def bench_batch(projects, bom_size, concurrency):
+    reset_caches()
+    batch = [{"id": i, "description": f"Batch project parts={bom_size} id={i}"}
+             for i in range(projects)]
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    summary = await batch_bom.run_batch(
+        batch, os.path.join(_WORKDIR, "batch_results.jsonl"), concurrency)
+    elapsed = time.perf_counter() - started
+    return {
+        "operations": projects,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_ops_per_s": summary["throughput_projects_per_s"],
+        "latency_s": summary["latency_s"],
+        "peak_memory_bytes": tracemalloc.get_traced_memory()[1],
+        "part_lookups": summary["part_lookups"],
+    }
+
+
+async def run_all(args, server):
+    bom_sizes = [5, 25] if args.quick else [5, 25, 100]
+    concurrency_levels = [1, 8] if args.quick else [1, 8, 32]
+    results = {}
+
+    for size in bom_sizes:
+        for concurrency in concurrency_levels:
+            name = f"bom/size={size}/concurrency={concurrency}"
+            print(f"[bench] {name}")
+            results[name] = await bench_bom(size, concurrency, args.iterations, args.pipelines)
+
+    print("[bench] plan")
+    results["plan"] = await asyncio.to_thread(bench_plan, args.iterations)
+
+    print("[bench] plan+bom")
+    for mode, result in (await bench_plan_bom(10, args.iterations)).items():
+        results[f"plan+bom/{mode}"] = result
+
+    corpus_size = args.reference_corpus
+    if corpus_size is None:
+        corpus_size = 20000 if args.quick else 100000
+    print(f"[bench] references/corpus={corpus_size}")
+    results[f"references/corpus={corpus_size}"] = await asyncio.to_thread(
+        bench_references, corpus_size, args.iterations)
+
+    print("[bench] sourcing tail")
+    for mode, result in (await bench_tail(server, 25, args.iterations * 4)).items():
+        results[f"sourcing/{mode}"] = result
+
+    for concurrency in concurrency_levels:
+        name = f"batch/projects={args.batch_projects}/concurrency={concurrency}"
+        print(f"[bench] {name}")
+        results[name] = await bench_batch(args.batch_projects, 10, concurrency)
+
+    await close_http_client()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ProtoForge pipeline offline.")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--quick", action="store_true", help="fewer sizes and levels")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--pipelines", type=int, default=4,
+                        help="concurrent generate_bom_and_source_parts calls per iteration")
+    parser.add_argument("--batch-projects", type=int, default=40)
+    parser.add_argument("--reference-corpus", type=int,
+                        help="references in the reference index scenario (default 100000, 20000 with --quick)")
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--search-jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.3,
+                        help="fake Gemini time to first token")
+    parser.add_argument("--token-interval", type=float, default=0.01)
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    server = FakeFindpartsServer(latency=args.search_latency, jitter=args.search_jitter,
+                                 error_rate=args.error_rate).start()
+    cli_bom.FINDPARTS_SEARCH_URL = server.url
+    set_genai_client(FakeGenaiClient(first_token_latency=args.llm_latency,
+                                     token_interval=args.token_interval))
+
+    tracemalloc.start()
+    try:
+        results = asyncio.run(run_all(args, server))
+    finally:
+        tracemalloc.stop()
+        server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "config": vars(args),
+            "search_requests": server.requests,
+        },
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Benchmark results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
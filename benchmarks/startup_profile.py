@@ -0,0 +1,131 @@
+"""
+Cold-start import profile for the app entry points.
+
+    python -m benchmarks.startup_profile
+    python -m benchmarks.startup_profile frontend.streamlit_app.app --budget-ms 1500 --top 25
+    python -m benchmarks.startup_profile roadmap.py --output startup.json
+
+Imports each target (a module name, or a .py script run with runpy) in a
+fresh interpreter under `python -X importtime`, so every run is a cold start,
+and reports the wall time of the import plus self and cumulative import time
+per module and self time per top-level package, largest first. The median of
+--repeat runs is reported. With --budget-ms the exit status is 1 when a
+target's median import time exceeds the budget, so CI can hold container
+cold start and first-page render to a fixed budget.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TARGETS = ["frontend.streamlit_app.app", "roadmap", "agents.registry"]
+
+_MARKER = "startup-profile: begin"
+# "import time:       123 |       4567 |     package.module"
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _probe(target):
+    if target.endswith(".py"):
+        load = f"runpy.run_path({os.path.join(ROOT, target)!r}, run_name='__startup_profile__')"
+    else:
+        load = f"importlib.import_module({target!r})"
+    return (
+        "import importlib, runpy, sys, time\n"
+        f"print({_MARKER!r}, file=sys.stderr, flush=True)\n"
+        "started = time.perf_counter()\n"
+        f"{load}\n"
+        "print(time.perf_counter() - started)\n"
+    )
+
+
+def profile_once(target, python=sys.executable, timeout=120):
+    """One cold import of target: {"wall_ms", "modules": [{"module", "self_ms", "cumulative_ms", "depth"}]}."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")])))
+    proc = subprocess.run([python, "-X", "importtime", "-c", _probe(target)],
+                          cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout)
+    if proc.returncode != 0:
+        last = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+        raise RuntimeError(f"Importing {target} failed: {last}")
+
+    modules = []
+    seen_marker = False
+    for line in proc.stderr.splitlines():
+        if not seen_marker:
+            seen_marker = line.strip() == _MARKER
+            continue
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append({
+                "module": module,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": (len(indent) - 1) // 2,
+            })
+    return {"wall_ms": float(proc.stdout.strip().splitlines()[-1]) * 1000, "modules": modules}
+
+
+def profile(target, repeat=3, top=15):
+    """Median of `repeat` cold imports, with the slowest modules and packages of the median run."""
+    runs = sorted((profile_once(target) for _ in range(repeat)), key=lambda run: run["wall_ms"])
+    median = runs[len(runs) // 2]
+    packages = {}
+    for row in median["modules"]:
+        package = row["module"].split(".", 1)[0]
+        packages[package] = packages.get(package, 0.0) + row["self_ms"]
+    return {
+        "target": target,
+        "wall_ms": round(median["wall_ms"], 1),
+        "wall_ms_runs": [round(run["wall_ms"], 1) for run in runs],
+        "imported_modules": len(median["modules"]),
+        "import_ms": round(sum(row["cumulative_ms"] for row in median["modules"] if row["depth"] == 0), 1),
+        "slowest_modules": sorted(median["modules"], key=lambda row: row["self_ms"], reverse=True)[:top],
+        "slowest_packages": [
+            {"package": package, "self_ms": round(ms, 1)}
+            for package, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+    }
+
+
+def print_report(report, budget_ms=None):
+    verdict = ""
+    if budget_ms is not None:
+        verdict = "  OVER BUDGET" if report["wall_ms"] > budget_ms else "  within budget"
+    print(f"\n{report['target']}: {report['wall_ms']:.1f} ms cold import "
+          f"({report['imported_modules']} modules){verdict}")
+    print(f"  {'self ms':>9} {'cumul ms':>9}  module")
+    for row in report["slowest_modules"]:
+        print(f"  {row['self_ms']:9.1f} {row['cumulative_ms']:9.1f}  {row['module']}")
+    print(f"  {'self ms':>9}  package")
+    for row in report["slowest_packages"]:
+        print(f"  {row['self_ms']:9.1f}  {row['package']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report cold-start import time per module.")
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS,
+                        help="module names or .py scripts relative to the repo root")
+    parser.add_argument("--repeat", type=int, default=3, help="cold runs per target; the median is reported")
+    parser.add_argument("--top", type=int, default=15, help="modules and packages listed per target")
+    parser.add_argument("--budget-ms", type=float, help="exit with status 1 if a target's import exceeds this")
+    parser.add_argument("--output", help="also write the reports as JSON")
+    args = parser.parse_args()
+
+    reports = [profile(target, args.repeat, args.top) for target in args.targets]
+    for report in reports:
+        print_report(report, args.budget_ms)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "budget_ms": args.budget_ms,
+                       "reports": reports}, f, indent=2)
+    if args.budget_ms is not None and any(r["wall_ms"] > args.budget_ms for r in reports):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
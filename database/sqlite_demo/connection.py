@@ -0,0 +1,33 @@
+# database/sqlite_demo/connection.py
+
+import os
+import sqlite3
+import threading
+
+# One connection per (thread, database file). SQLite connections must not be
+# shared across threads, and Streamlit runs every session in its own thread.
+_local = threading.local()
+
+
+def connect(db_path):
+    """
+    Return this thread's connection to db_path, opening it in WAL mode on first use.
+    WAL lets several Streamlit workers and CLI runs read while one of them writes.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = os.path.abspath(db_path)
+    conn = connections.get(key)
+    if conn is None:
+        directory = os.path.dirname(key)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; multi-statement writes open their own transaction
+        conn = sqlite3.connect(key, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        connections[key] = conn
+    return conn
@@ -0,0 +1,153 @@
+# database/sqlite_demo/job_store.py
+#
+# Persistent record of background jobs (middleware/jobs.py): status, result
+# and error per job id, so finished work survives Streamlit reruns, page
+# navigation and new sessions that only know the job id.
+
+import json
+import os
+import socket
+import threading
+import time
+
+from database.sqlite_demo.connection import connect
+
+DEFAULT_DB_PATH = os.getenv("JOB_STORE_PATH", "jobs.sqlite3")
+# Finished jobs older than this are deleted by purge()
+DEFAULT_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    owner       TEXT,
+    status      TEXT NOT NULL,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    host        TEXT,
+    pid         INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at);
+"""
+
+_COLUMNS = ("id", "kind", "owner", "status", "result", "error",
+            "created_at", "started_at", "finished_at")
+# Added after the first release of the table; older files get them on open
+_ADDED_COLUMNS = (("host", "TEXT"), ("pid", "INTEGER"))
+
+_HOST = socket.gethostname()
+
+
+def _process_alive(pid):
+    """Whether process pid on this host still exists."""
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # os.kill has no harmless probe on Windows; leave other processes' jobs alone
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Job rows in SQLite (WAL); results are stored as JSON."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        conn = connect(self.db_path)
+        conn.executescript(_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in _ADDED_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def create(self, job_id, kind, owner=None, status="queued"):
+        # The host and pid of the process running the job tell abandon_unfinished whose job it is
+        connect(self.db_path).execute(
+            "INSERT INTO jobs (id, kind, owner, status, created_at, host, pid) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, owner, status, time.time(), _HOST, os.getpid())
+        )
+
+    def mark_running(self, job_id):
+        connect(self.db_path).execute(
+            "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+            (time.time(), job_id))
+
+    def finish(self, job_id, status, result=None, error=None):
+        connect(self.db_path).execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, None if result is None else json.dumps(result, ensure_ascii=False, default=str),
+             error, time.time(), job_id)
+        )
+
+    def get(self, job_id):
+        row = connect(self.db_path).execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        job["result"] = None if job["result"] is None else json.loads(job["result"])
+        return job
+
+    def list(self, owner=None, limit=50):
+        if owner is None:
+            rows = connect(self.db_path).execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs ORDER BY created_at DESC LIMIT ?",
+                (limit,)).fetchall()
+        else:
+            rows = connect(self.db_path).execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE owner = ? "
+                "ORDER BY created_at DESC LIMIT ?", (owner, limit)).fetchall()
+        return [dict(zip(_COLUMNS, row), result=None) for row in rows]
+
+    def abandon_unfinished(self):
+        """
+        Mark failed the jobs left queued or running by processes on this host
+        that have exited; they will never finish. Jobs of live processes
+        sharing the file, and of other hosts, are left alone.
+        """
+        conn = connect(self.db_path)
+        # Rows from before host and pid were recorded have neither and count as abandoned
+        owners = conn.execute(
+            "SELECT DISTINCT host, pid FROM jobs WHERE status IN ('queued', 'running') "
+            "AND (host = ? OR host IS NULL)", (_HOST,)).fetchall()
+        abandoned = 0
+        for host, pid in owners:
+            if host is not None and pid is not None and _process_alive(pid):
+                continue
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted by restart', finished_at = ? "
+                "WHERE status IN ('queued', 'running') AND host IS ? AND pid IS ?",
+                (time.time(), host, pid))
+            abandoned += cursor.rowcount
+        return abandoned
+
+    def purge(self, retention=DEFAULT_RETENTION):
+        """Delete jobs that finished more than `retention` seconds ago."""
+        cursor = connect(self.db_path).execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (time.time() - retention,))
+        return cursor.rowcount
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Process-wide store at JOB_STORE_PATH."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = JobStore()
+    return _default_store
@@ -0,0 +1,145 @@
+# database/sqlite_demo/llm_cache.py
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from database.sqlite_demo.connection import connect
+
+DEFAULT_DB_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+DEFAULT_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Evict after this many writes instead of summing sizes on every put
+_EVICT_EVERY = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key   TEXT PRIMARY KEY,
+    model       TEXT NOT NULL,
+    response    TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_model
+    ON llm_response_cache (model);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_access
+    ON llm_response_cache (last_access);
+"""
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so re-indented or re-wrapped prompts hash the same."""
+    return " ".join(prompt.split())
+
+
+def cache_key(model, prompt, params=None):
+    """Content address of a generation: model name, normalized prompt and generation parameters."""
+    payload = json.dumps(
+        {"model": model, "prompt": normalize_prompt(prompt), "params": params or {}},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Disk-backed, size-bounded cache of LLM responses keyed by content hash."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        connect(self.db_path).executescript(_SCHEMA)
+
+    def get(self, model, prompt, params=None):
+        key = cache_key(model, prompt, params)
+        conn = connect(self.db_path)
+        row = conn.execute(
+            "SELECT response FROM llm_response_cache WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute(
+            "UPDATE llm_response_cache SET last_access = ? WHERE cache_key = ?",
+            (time.time(), key)
+        )
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def put(self, model, prompt, response, params=None):
+        key = cache_key(model, prompt, params)
+        now = time.time()
+        connect(self.db_path).execute(
+            "INSERT OR REPLACE INTO llm_response_cache "
+            "(cache_key, model, response, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, len(response.encode("utf-8")), now, now)
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % _EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop least-recently-used responses until the cache fits in max_bytes."""
+        connect(self.db_path).execute(
+            "DELETE FROM llm_response_cache WHERE cache_key IN ("
+            "  SELECT cache_key FROM ("
+            "    SELECT cache_key, SUM(size) OVER (ORDER BY last_access DESC) AS running"
+            "    FROM llm_response_cache)"
+            "  WHERE running > ?)",
+            (self.max_bytes,)
+        )
+
+    def invalidate_model(self, model):
+        """Forget every response produced by `model`, e.g. after a model version bump."""
+        cursor = connect(self.db_path).execute(
+            "DELETE FROM llm_response_cache WHERE model = ?", (model,))
+        return cursor.rowcount
+
+    def clear(self):
+        connect(self.db_path).execute("DELETE FROM llm_response_cache")
+
+    def stats(self):
+        entries, total = connect(self.db_path).execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_response_cache").fetchone()
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": entries, "bytes": total}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Process-wide cache instance configured from the LLM_CACHE_* environment variables."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = LLMResponseCache()
+    return _default_cache
+
+
+if __name__ == "__main__":
+    # python -m database.sqlite_demo.llm_cache invalidate <model> | clear | stats
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = get_llm_cache()
+    if command == "invalidate" and len(sys.argv) > 2:
+        print(f"Removed {cache.invalidate_model(sys.argv[2])} cached responses for {sys.argv[2]}")
+    elif command == "clear":
+        cache.clear()
+        print("LLM response cache cleared")
+    else:
+        print(json.dumps(cache.stats(), indent=2))
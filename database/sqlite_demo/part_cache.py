@@ -0,0 +1,169 @@
+# database/sqlite_demo/part_cache.py
+
+import json
+import os
+import re
+import threading
+import time
+
+from database.sqlite_demo.connection import connect
+
+DEFAULT_DB_PATH = os.getenv("PART_CACHE_PATH", "part_cache.sqlite3")
+# Entries younger than TTL are fresh; up to STALE_TTL they are served while a refresh runs
+DEFAULT_TTL = float(os.getenv("PART_CACHE_TTL", str(24 * 3600)))
+DEFAULT_STALE_TTL = float(os.getenv("PART_CACHE_STALE_TTL", str(7 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv("PART_CACHE_MAX_ENTRIES", "50000"))
+
+# Evict after this many writes instead of counting rows on every put
+_EVICT_EVERY = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS part_search_cache (
+    query_key   TEXT PRIMARY KEY,
+    results     TEXT NOT NULL,
+    fetched_at  REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hit_count   INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_part_search_cache_access
+    ON part_search_cache (last_access);
+"""
+
+_UNIT_SUFFIXES = r"ohm|k|m|v|w|a|ma|mah|mm|cm|uf|nf|pf|mhz|khz|hz|nm|pin|pins"
+
+
+def normalize_query(query):
+    """
+    Canonical form of a part search, so "220 Ohm Resistor (1/4W)" and
+    "220ohm  resistor 1/4w" share one cache entry.
+    """
+    # Replace Ω before lower(), which would turn it into ω
+    q = query.replace("Ω", " ohm ").lower().replace("µ", "u")
+    # Drop punctuation except characters that carry meaning in part specs
+    q = re.sub(r"[^\w./+-]+", " ", q)
+    # Glue values to their units: "220 ohm" -> "220ohm", "5 mm" -> "5mm"
+    q = re.sub(rf"(\d)\s+({_UNIT_SUFFIXES})\b", r"\1\2", q)
+    return " ".join(q.split())
+
+
+class PartSearchCache:
+    """Persistent, size-capped LRU cache of fetch_part_options results."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttl=DEFAULT_TTL,
+                 stale_ttl=DEFAULT_STALE_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fallback_hits = 0
+        connect(self.db_path).executescript(_SCHEMA)
+
+    def get(self, query):
+        """
+        Returns (results, is_stale). results is None on a miss or when the
+        entry is older than stale_ttl.
+        """
+        key = normalize_query(query)
+        conn = connect(self.db_path)
+        row = conn.execute(
+            "SELECT results, fetched_at FROM part_search_cache WHERE query_key = ?",
+            (key,)
+        ).fetchone()
+        now = time.time()
+        age = now - row[1] if row else None
+        if row is None or age > self.stale_ttl:
+            with self._lock:
+                self.misses += 1
+            return None, False
+
+        conn.execute(
+            "UPDATE part_search_cache SET last_access = ?, hit_count = hit_count + 1 "
+            "WHERE query_key = ?",
+            (now, key)
+        )
+        is_stale = age > self.ttl
+        with self._lock:
+            if is_stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+        return [tuple(r) for r in json.loads(row[0])], is_stale
+
+    def get_last_known(self, query):
+        """
+        Results for query regardless of age, for serving something while the
+        search backend is down or too slow. None if it was never cached.
+        """
+        row = connect(self.db_path).execute(
+            "SELECT results FROM part_search_cache WHERE query_key = ?",
+            (normalize_query(query),)
+        ).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            self.fallback_hits += 1
+        return [tuple(r) for r in json.loads(row[0])]
+
+    def put(self, query, results):
+        key = normalize_query(query)
+        now = time.time()
+        conn = connect(self.db_path)
+        conn.execute(
+            "INSERT INTO part_search_cache (query_key, results, fetched_at, last_access) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(query_key) DO UPDATE SET "
+            "results = excluded.results, fetched_at = excluded.fetched_at, "
+            "last_access = excluded.last_access",
+            (key, json.dumps(results, ensure_ascii=False), now, now)
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % _EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop least-recently-used entries beyond max_entries."""
+        conn = connect(self.db_path)
+        conn.execute(
+            "DELETE FROM part_search_cache WHERE query_key IN ("
+            "  SELECT query_key FROM part_search_cache "
+            "  ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        connect(self.db_path).execute("DELETE FROM part_search_cache")
+
+    def stats(self):
+        entries = connect(self.db_path).execute(
+            "SELECT COUNT(*) FROM part_search_cache").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "fallback_hits": self.fallback_hits,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_part_cache():
+    """Process-wide cache instance configured from the PART_CACHE_* environment variables."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = PartSearchCache()
+    return _default_cache
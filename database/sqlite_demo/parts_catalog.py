@@ -0,0 +1,257 @@
+# database/sqlite_demo/parts_catalog.py
+#
+# Offline parts catalog: vendor CSV/JSON dumps loaded into an SQLite FTS5
+# index so fetch_part_options can answer without touching the network.
+#
+#   python -m database.sqlite_demo.parts_catalog ingest robu.csv sharvi.json
+#   python -m database.sqlite_demo.parts_catalog search "220 Ohm Resistor (1/4W)"
+
+import csv
+import difflib
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+from database.sqlite_demo.connection import connect
+from database.sqlite_demo.part_cache import normalize_query
+
+DEFAULT_DB_PATH = os.getenv("PARTS_CATALOG_PATH", "parts_catalog.sqlite3")
+
+# Ingest writes in batches so a million-row dump doesn't hold one huge transaction
+_INGEST_BATCH = 5000
+_MEMO_SIZE = 4096
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_parts (
+    id     INTEGER PRIMARY KEY,
+    title  TEXT NOT NULL,
+    price  REAL NOT NULL,
+    url    TEXT NOT NULL UNIQUE,
+    vendor TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+    terms, content='', tokenize="unicode61 tokenchars './'"
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS catalog_vocab USING fts5vocab(catalog_fts, 'row');
+"""
+
+_FRACTIONS = {"1/8": "0.125", "1/4": "0.25", "1/2": "0.5", "3/4": "0.75"}
+_TOKEN_SPLIT = re.compile(r"[\s+-]+")
+_FRACTION = re.compile(r"(\d/\d)(w)")
+_KILO = re.compile(r"(\d+(?:\.\d+)?)k")
+
+
+def part_term_groups(text):
+    """
+    Tokens for an electronics string, one group per token with its aliases.
+    Values are glued to their units ("220 Ohm" -> 220ohm), fractional
+    wattages get a decimal alias ("1/4W" -> 1/4w, 0.25w) and kilo-ohm
+    shorthand is expanded ("1k" -> 1k, 1kohm).
+    """
+    groups = []
+    # The FTS tokenizer splits on '-' and '+', so the query side must as well
+    for token in _TOKEN_SPLIT.split(normalize_query(text)):
+        token = token.strip("./")
+        if not token:
+            continue
+        group = [token]
+        fraction = _FRACTION.fullmatch(token)
+        if fraction and fraction.group(1) in _FRACTIONS:
+            group.append(_FRACTIONS[fraction.group(1)] + fraction.group(2))
+        kilo = _KILO.fullmatch(token)
+        if kilo:
+            group.append(kilo.group(1) + "kohm")
+        groups.append(group)
+    return groups
+
+
+def part_terms(text):
+    """Flat list of index terms for a catalog title."""
+    return [term for group in part_term_groups(text) for term in group]
+
+
+def parse_price(value):
+    """Vendor prices arrive as numbers or strings like '₹1,299.00'; returns None if unusable."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.search(r"\d+(?:\.\d+)?", value.replace(",", ""))
+        if match:
+            return float(match.group())
+    return None
+
+
+def _read_dump(path):
+    """Yield dict rows from a CSV, JSON array, JSON Lines or findparts-style {"hits": [...]} dump."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+        return
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [hit.get("_source", hit) for hit in data.get("hits", [])]
+    yield from data
+
+
+class PartsCatalog:
+    """Full-text index over vendor catalog dumps with fuzzy, price-ordered top-k search."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._vocab = None
+        # In-process LRU of recent answers; repeat lookups skip SQLite entirely
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        connect(self.db_path).executescript(_SCHEMA)
+
+    def ingest(self, path, vendor=None):
+        """Load one dump file; rows missing title, price or url are skipped. Returns rows added."""
+        conn = connect(self.db_path)
+        added = 0
+        batch = []
+
+        def flush():
+            nonlocal added
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for title, price, url in batch:
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO catalog_parts (title, price, url, vendor) "
+                        "VALUES (?, ?, ?, ?)",
+                        (title, price, url, vendor)
+                    )
+                    if cursor.rowcount:
+                        conn.execute(
+                            "INSERT INTO catalog_fts (rowid, terms) VALUES (?, ?)",
+                            (cursor.lastrowid, " ".join(part_terms(title)))
+                        )
+                        added += 1
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            batch.clear()
+
+        for row in _read_dump(path):
+            title, url = row.get("title"), row.get("url")
+            price = parse_price(row.get("price"))
+            if title and url and price is not None:
+                batch.append((title, price, url))
+                if len(batch) >= _INGEST_BATCH:
+                    flush()
+        if batch:
+            flush()
+        self._vocab = None
+        with self._memo_lock:
+            self._memo.clear()
+        return added
+
+    def _vocabulary(self):
+        # term -> number of catalog entries containing it; loaded once per process
+        if self._vocab is None:
+            self._vocab = dict(connect(self.db_path).execute(
+                "SELECT term, doc FROM catalog_vocab"))
+        return self._vocab
+
+    def _resolve(self, term):
+        """The term itself if indexed, else its closest indexed spelling, else None."""
+        vocab = self._vocabulary()
+        if term in vocab:
+            return term
+        close = difflib.get_close_matches(term, vocab.keys(), n=1, cutoff=0.75)
+        return close[0] if close else None
+
+    def _query_groups(self, query):
+        """
+        FTS5 clauses, one per query token (aliases OR-ed together), ordered
+        from the most selective token to the least.
+        """
+        vocab = self._vocabulary()
+        groups = []
+        for group in part_term_groups(query):
+            resolved = [t for t in dict.fromkeys(self._resolve(t) for t in group) if t]
+            if resolved:
+                clause = "(" + " OR ".join(f'"{t}"' for t in resolved) + ")"
+                groups.append((sum(vocab[t] for t in resolved), clause))
+        return [clause for _, clause in sorted(groups)]
+
+    def search(self, query, k=3):
+        """
+        Top-k catalog entries for a part query, cheapest first. Entries matching
+        every query token come first; while fewer than k are found the most
+        common token is dropped and the search repeated, so rare, specific
+        tokens ("esp32", "220ohm") decide relevance. Typos are corrected
+        against the indexed vocabulary.
+        Returns a list of tuples: (title, price, url)
+        """
+        key = (normalize_query(query), k)
+        with self._memo_lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+
+        groups = self._query_groups(query)
+        conn = connect(self.db_path)
+        results = []
+        seen = set()
+        for n in range(len(groups), 0, -1):
+            rows = conn.execute(
+                "SELECT p.title, p.price, p.url FROM catalog_fts "
+                "JOIN catalog_parts p ON p.id = catalog_fts.rowid "
+                "WHERE catalog_fts MATCH ? ORDER BY p.price LIMIT ?",
+                (" AND ".join(groups[:n]), k)
+            ).fetchall()
+            for row in rows:
+                if row[2] not in seen and len(results) < k:
+                    seen.add(row[2])
+                    results.append(tuple(row))
+            if len(results) >= k:
+                break
+
+        with self._memo_lock:
+            self._memo[key] = results
+            if len(self._memo) > _MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return results
+
+    def count(self):
+        return connect(self.db_path).execute("SELECT COUNT(*) FROM catalog_parts").fetchone()[0]
+
+
+_default_catalog = None
+_default_catalog_lock = threading.Lock()
+
+
+def get_parts_catalog():
+    """Process-wide catalog instance at PARTS_CATALOG_PATH."""
+    global _default_catalog
+    if _default_catalog is None:
+        with _default_catalog_lock:
+            if _default_catalog is None:
+                _default_catalog = PartsCatalog()
+    return _default_catalog
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("ingest", "search"):
+        print("usage: python -m database.sqlite_demo.parts_catalog ingest <dump.csv|.json|.jsonl>...")
+        print("       python -m database.sqlite_demo.parts_catalog search <query>")
+        sys.exit(1)
+    catalog = get_parts_catalog()
+    if sys.argv[1] == "ingest":
+        for dump in sys.argv[2:]:
+            vendor = os.path.splitext(os.path.basename(dump))[0]
+            print(f"{dump}: {catalog.ingest(dump, vendor=vendor)} parts added")
+        print(f"Catalog now holds {catalog.count()} parts")
+    else:
+        for title, price, url in catalog.search(" ".join(sys.argv[2:])):
+            print(f"{title} — ₹{price}  →  {url}")
@@ -0,0 +1,374 @@
+# database/sqlite_demo/project_store.py
+#
+# Transactional store for sourced BOMs and purchase selections. Replaces the
+# shared sourced_parts.json / selected_parts.json files: every project has its
+# own rows, single parts and selections are upserted in place, and concurrent
+# users no longer overwrite each other.
+#
+#   python -m database.sqlite_demo.project_store import sourced_parts.json --selected selected_parts.json
+#   python -m database.sqlite_demo.project_store export <project_id>
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from database.sqlite_demo.connection import connect
+
+DEFAULT_DB_PATH = os.getenv("PROJECT_STORE_PATH", "projects.sqlite3")
+
+# BOM lines are keyed by their position: a BOM may list the same part name
+# twice (two sizes of "Red LED"), and each line keeps its own selection
+_PARTS_TABLE = """
+CREATE TABLE IF NOT EXISTS project_parts (
+    project_id  INTEGER NOT NULL REFERENCES projects(id),
+    position    INTEGER NOT NULL,
+    part        TEXT NOT NULL,
+    quantity    INTEGER NOT NULL DEFAULT 1,
+    options     TEXT NOT NULL DEFAULT '[]',
+    error       TEXT,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (project_id, position)
+)"""
+_SELECTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS part_selections (
+    project_id   INTEGER NOT NULL REFERENCES projects(id),
+    position     INTEGER NOT NULL,
+    option_index INTEGER,
+    option       TEXT NOT NULL,
+    updated_at   REAL NOT NULL,
+    PRIMARY KEY (project_id, position)
+)"""
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS projects (
+    id          INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    owner       TEXT
+);
+{_PARTS_TABLE};
+{_SELECTIONS_TABLE};
+CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects (updated_at);
+"""
+# Added after the first release of the table; older files get them on open
+_ADDED_COLUMNS = (("projects", "owner", "TEXT"),)
+
+
+def _to_int(value, default=1):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _canonical_option(option):
+    """Options use {"name", "price", "link"}; older UI files used "title" for the name."""
+    return {
+        "name": option.get("name") or option.get("title", ""),
+        "price": option.get("price"),
+        "link": option.get("link") or option.get("url", ""),
+    }
+
+
+class ProjectStore:
+    """Per-project BOM rows and selections in SQLite (WAL)."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        conn = connect(self.db_path)
+        conn.executescript(_SCHEMA)
+        for table, column, column_type in _ADDED_COLUMNS:
+            if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self._migrate_part_keys(conn)
+
+    def _migrate_part_keys(self, conn):
+        """Rebuild part tables from files that keyed parts and selections by part name."""
+        keys = {row[1] for row in conn.execute("PRAGMA table_info(project_parts)") if row[5]}
+        if "part" not in keys:
+            return
+        with _Transaction(conn):
+            conn.execute("ALTER TABLE project_parts RENAME TO project_parts_by_name")
+            conn.execute("ALTER TABLE part_selections RENAME TO part_selections_by_name")
+            conn.execute(_PARTS_TABLE)
+            conn.execute(_SELECTIONS_TABLE)
+            # Renumbered in BOM order: old rows could share a position
+            conn.execute(
+                "INSERT INTO project_parts "
+                "(project_id, position, part, quantity, options, error, updated_at) "
+                "SELECT project_id, ROW_NUMBER() OVER "
+                "(PARTITION BY project_id ORDER BY position, rowid) - 1, "
+                "part, quantity, options, error, updated_at FROM project_parts_by_name")
+            conn.execute(
+                "INSERT INTO part_selections (project_id, position, option_index, option, updated_at) "
+                "SELECT s.project_id, p.position, s.option_index, s.option, s.updated_at "
+                "FROM part_selections_by_name s JOIN project_parts p "
+                "ON p.project_id = s.project_id AND p.part = s.part")
+            conn.execute("DROP TABLE project_parts_by_name")
+            conn.execute("DROP TABLE part_selections_by_name")
+
+    def _transaction(self):
+        return _Transaction(connect(self.db_path))
+
+    # --- Projects ----------------------------------------------------------- #
+
+    def create_project(self, name, description="", owner=None):
+        """New empty project; `owner` (a UI session's token) limits which sessions may open it."""
+        now = time.time()
+        cursor = connect(self.db_path).execute(
+            "INSERT INTO projects (name, description, created_at, updated_at, owner) VALUES (?, ?, ?, ?, ?)",
+            (name, description, now, now, owner)
+        )
+        return cursor.lastrowid
+
+    def latest_project_id(self):
+        row = connect(self.db_path).execute(
+            "SELECT id FROM projects ORDER BY updated_at DESC, id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def list_projects(self, limit=50, owner=None):
+        """Most recently updated projects; only `owner`'s when given."""
+        if owner is None:
+            rows = connect(self.db_path).execute(
+                "SELECT id, name, updated_at FROM projects ORDER BY updated_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        else:
+            rows = connect(self.db_path).execute(
+                "SELECT id, name, updated_at FROM projects WHERE owner = ? "
+                "ORDER BY updated_at DESC LIMIT ?", (owner, limit)
+            ).fetchall()
+        return [{"id": r[0], "name": r[1], "updated_at": r[2]} for r in rows]
+
+    def project_owner(self, project_id):
+        """Owner token the project was created under; None for CLI and imported projects."""
+        row = connect(self.db_path).execute(
+            "SELECT owner FROM projects WHERE id = ?", (project_id,)).fetchone()
+        return row[0] if row else None
+
+    def project_version(self, project_id):
+        """updated_at of the project; changes whenever one of its parts or selections does."""
+        row = connect(self.db_path).execute(
+            "SELECT updated_at FROM projects WHERE id = ?", (project_id,)).fetchone()
+        return row[0] if row else None
+
+    def load_project(self, project_id):
+        """
+        One project with its parts in BOM order:
+        {"id", "projectName", "lastUpdated", "parts": [{"position", "part", "quantity", "options"}],
+        "selections": {position: option_index}}
+        Returns None if the project does not exist.
+        """
+        conn = connect(self.db_path)
+        project = conn.execute(
+            "SELECT id, name, updated_at FROM projects WHERE id = ?", (project_id,)).fetchone()
+        if project is None:
+            return None
+        parts = []
+        for position, part, quantity, options, error in conn.execute(
+                "SELECT position, part, quantity, options, error FROM project_parts "
+                "WHERE project_id = ? ORDER BY position", (project_id,)):
+            entry = {"position": position, "part": part, "quantity": quantity,
+                     "options": json.loads(options)}
+            if error:
+                entry["error"] = error
+            parts.append(entry)
+        selections = dict(conn.execute(
+            "SELECT position, option_index FROM part_selections WHERE project_id = ?",
+            (project_id,)).fetchall())
+        return {
+            "id": project[0],
+            "projectName": project[1],
+            "lastUpdated": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(project[2])),
+            "parts": parts,
+            "selections": selections,
+        }
+
+    # --- Parts and selections ----------------------------------------------- #
+
+    def upsert_part(self, project_id, entry, position=None):
+        """
+        Insert or update the BOM line at `position` ({"part", "quantity",
+        "options", ["error"]}); without a position the line is appended.
+        """
+        self.upsert_parts(project_id, [entry], positions=[position])
+
+    def upsert_parts(self, project_id, entries, positions=None):
+        """Insert or update several BOM lines in one transaction; lines without a position are appended."""
+        now = time.time()
+        with self._transaction() as conn:
+            next_position = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM project_parts WHERE project_id = ?",
+                (project_id,)).fetchone()[0]
+            for i, entry in enumerate(entries):
+                position = positions[i] if positions and positions[i] is not None else None
+                if position is None:
+                    position = next_position
+                    next_position += 1
+                conn.execute(
+                    "INSERT INTO project_parts "
+                    "(project_id, position, part, quantity, options, error, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(project_id, position) DO UPDATE SET "
+                    "part = excluded.part, quantity = excluded.quantity, options = excluded.options, "
+                    "error = excluded.error, updated_at = excluded.updated_at",
+                    (project_id, position, entry["part"], _to_int(entry.get("quantity")),
+                     json.dumps([_canonical_option(o) for o in entry.get("options", [])],
+                                ensure_ascii=False),
+                     entry.get("error"), now)
+                )
+            conn.execute("UPDATE projects SET updated_at = ? WHERE id = ?", (now, project_id))
+
+    def select_option(self, project_id, position, option_index, option=None):
+        """Record the chosen option for one BOM line; `option` defaults to the stored option at that index."""
+        self.save_selections(project_id, [(position, option_index, option)])
+
+    def save_selections(self, project_id, selections):
+        """Upsert (position, option_index[, option]) selections of BOM lines in one transaction."""
+        now = time.time()
+        with self._transaction() as conn:
+            for selection in selections:
+                position, option_index = selection[0], selection[1]
+                option = selection[2] if len(selection) > 2 else None
+                row = conn.execute(
+                    "SELECT part, options FROM project_parts WHERE project_id = ? AND position = ?",
+                    (project_id, position)).fetchone()
+                if row is None:
+                    raise ValueError(f"No BOM line {position} in project {project_id}")
+                if option is None:
+                    options = json.loads(row[1])
+                    if option_index is None or not 0 <= option_index < len(options):
+                        raise ValueError(f"No option {option_index} for part {row[0]!r}")
+                    option = options[option_index]
+                conn.execute(
+                    "INSERT INTO part_selections (project_id, position, option_index, option, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(project_id, position) DO UPDATE SET "
+                    "option_index = excluded.option_index, option = excluded.option, "
+                    "updated_at = excluded.updated_at",
+                    (project_id, position, option_index,
+                     json.dumps(_canonical_option(option), ensure_ascii=False), now)
+                )
+            conn.execute("UPDATE projects SET updated_at = ? WHERE id = ?", (now, project_id))
+
+    def load_selections(self, project_id):
+        """Selected options in BOM order, in the selected_parts.json shape."""
+        rows = connect(self.db_path).execute(
+            "SELECT p.part, p.quantity, s.option FROM part_selections s "
+            "JOIN project_parts p ON p.project_id = s.project_id AND p.position = s.position "
+            "WHERE s.project_id = ? ORDER BY s.position", (project_id,)).fetchall()
+        return [{"part": part, "quantity": quantity, "selected_option": json.loads(option)}
+                for part, quantity, option in rows]
+
+    # --- JSON import / export ----------------------------------------------- #
+
+    def import_json(self, sourced_path, selected_path=None, project_name=None):
+        """
+        Import a legacy sourced_parts.json (the CLI's list of {"part", ...} or
+        the UI's {"parts": [{"name", ...}], "projectName"}) and optionally a
+        selected_parts.json into a new project. Returns the project id.
+        """
+        with open(sourced_path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            project_name = project_name or data.get("projectName")
+            parts = data.get("parts", [])
+        else:
+            parts = data
+        entries = [{
+            "part": p.get("part") or p.get("name", ""),
+            "quantity": p.get("quantity", 1),
+            "options": p.get("options", []),
+        } for p in parts]
+
+        project_id = self.create_project(
+            project_name or os.path.splitext(os.path.basename(sourced_path))[0])
+        self.upsert_parts(project_id, entries, positions=list(range(len(entries))))
+
+        if selected_path:
+            with open(selected_path, encoding="utf-8") as f:
+                selected = json.load(f)
+            # Selections name their part; repeated names take that part's lines in BOM order
+            lines = {}
+            for position, entry in enumerate(entries):
+                lines.setdefault(entry["part"], []).append(position)
+            selections = []
+            for item in selected:
+                option = _canonical_option(item["selected_option"])
+                if lines.get(item["part"]):
+                    position = lines[item["part"]].pop(0)
+                    options = [_canonical_option(o) for o in entries[position]["options"]]
+                    index = options.index(option) if option in options else None
+                else:
+                    # Selected but never sourced: keep the choice as a new line's only option
+                    position = len(entries)
+                    entries.append({"part": item["part"], "quantity": item.get("quantity", 1),
+                                    "options": [option]})
+                    self.upsert_part(project_id, entries[position], position=position)
+                    index = 0
+                selections.append((position, index, option))
+            self.save_selections(project_id, selections)
+        return project_id
+
+    def export_json(self, project_id):
+        """The project's parts in the CLI's sourced_parts.json list format."""
+        project = self.load_project(project_id)
+        if project is None:
+            return []
+        return [{key: value for key, value in part.items() if key != "position"}
+                for part in project["parts"]]
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_project_store():
+    """Process-wide store at PROJECT_STORE_PATH."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = ProjectStore()
+    return _default_store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the ProtoForge project store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="import a legacy sourced_parts.json")
+    importer.add_argument("sourced")
+    importer.add_argument("--selected", help="matching selected_parts.json")
+    importer.add_argument("--name", help="project name")
+    exporter = commands.add_parser("export", help="print a project as sourced_parts.json")
+    exporter.add_argument("project_id", type=int)
+    commands.add_parser("list", help="list recent projects")
+    args = parser.parse_args()
+
+    store = get_project_store()
+    if args.command == "import":
+        project_id = store.import_json(args.sourced, args.selected, args.name)
+        print(f"Imported {args.sourced} as project {project_id}")
+    elif args.command == "export":
+        print(json.dumps(store.export_json(args.project_id), indent=2, ensure_ascii=False))
+    else:
+        for project in store.list_projects():
+            print(f"{project['id']:>5}  {project['name']}")
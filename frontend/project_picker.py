@@ -0,0 +1,57 @@
+# frontend/project_picker.py
+#
+# Which stored project a standalone page works on. The project is tied to the
+# session: it comes from ?project=<id> in the URL or is picked explicitly in
+# the sidebar, and is never inferred from whichever project was touched last
+# (that may belong to another user). Only projects created under the
+# session's owner token (?session=<token>) are listed or opened.
+
+import uuid
+
+import streamlit as st
+from database.sqlite_demo.project_store import get_project_store
+
+
+def session_owner():
+    """
+    This session's owner token. Projects sourced in the session are created
+    under it; it is kept in ?session=<token> so reloads, and the other pages
+    opened with the same token, reach the same projects.
+    """
+    if "owner" not in st.session_state:
+        st.session_state.owner = st.query_params.get("session") or uuid.uuid4().hex
+    st.query_params["session"] = st.session_state.owner
+    return st.session_state.owner
+
+
+def _query_project_id():
+    try:
+        return int(st.query_params.get("project", ""))
+    except ValueError:
+        return None
+
+
+def session_project_id(label="Project"):
+    """The project id chosen for this session, or None until one is picked."""
+    store = get_project_store()
+    owner = session_owner()
+    projects = {p["id"]: p["name"] for p in store.list_projects(owner=owner)}
+    requested = _query_project_id()
+    if requested is not None and requested not in projects and store.project_owner(requested) == owner:
+        # Linked projects older than the listed ones are still reachable
+        projects[requested] = f"Project {requested}"
+    if not projects:
+        return None
+
+    ids = list(projects)
+    project_id = st.sidebar.selectbox(
+        label,
+        ids,
+        index=ids.index(requested) if requested in projects else None,
+        format_func=lambda i: f"#{i} {projects[i]}",
+        placeholder="Choose a project",
+    )
+    if project_id is not None:
+        # Keep the choice in the URL so reloads and shared links open the same project
+        st.query_params["project"] = str(project_id)
+    return project_id
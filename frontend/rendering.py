@@ -0,0 +1,113 @@
+# frontend/rendering.py
+#
+# Shared rendering helpers for the Streamlit pages. Streamlit re-executes the
+# whole script on every interaction, so anything rebuilt per rerun scales with
+# the size of the BOM. Here:
+#   - CSS files are read once and re-read only when their mtime changes
+#   - lists are assembled with str.join rather than repeated concatenation
+# The HTML/markdown builders are plain f-strings: building them is cheaper
+# than hashing their arguments to look them up in a cache.
+
+import os
+
+import streamlit as st
+
+_css_cache = {}
+
+
+def read_css(file_name):
+    """Contents of a CSS file, cached until the file's mtime changes."""
+    path = os.path.abspath(file_name)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _css_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding="utf-8") as f:
+        css = f.read()
+    _css_cache[path] = (mtime, css)
+    return css
+
+
+def load_css(file_name):
+    """Loads a CSS file (cached by mtime) and injects it into the Streamlit app."""
+    try:
+        st.markdown(f'<style>{read_css(file_name)}</style>', unsafe_allow_html=True)
+    except FileNotFoundError:
+        st.error(f"CSS file not found: {file_name}. Please check the file path.")
+
+
+# --- Roadmap cards --------------------------------------------------------- #
+
+PART_ICONS = {
+    "Arduino Uno": "🔧",
+    "LED": "💡",
+    "Resistor (220Ω)": "⚡"
+}
+
+
+def card_html(title, description, content_html, badge_text=None, footer_note=None):
+    badge = f'<span class="badge">{badge_text}</span>' if badge_text else ''
+    note = f'<span style="color: #64748b; font-size: 12px;">{footer_note}</span>' if footer_note else ''
+    return f"""
+    <div class="shadcn-card">
+        <div class="card-header">
+            <h3 class="card-title">{title}</h3>
+            <p class="card-description">{description}</p>
+        </div>
+        <div class="card-content">
+            {content_html}
+        </div>
+        <div class="card-footer">
+            {badge}
+            {note}
+        </div>
+    </div>
+    """
+
+
+def part_item_html(part):
+    name = part.get("name", "Unknown Part")
+    icon = part.get("icon") or PART_ICONS.get(part.get("name", ""), "🔹")
+    doc_link = part.get("doc", "#")
+    return (f'<li><div style="display: flex; align-items: center;"><span class="part-icon">{icon}</span>'
+            f'<span class="part-name">{name}</span></div>'
+            f'<a href="{doc_link}" class="doc-link" target="_blank">📚 Docs</a></li>')
+
+
+def step_item_html(number, step):
+    return f'<li><div class="step-number">{number}</div><div class="step-content">{step}</div></li>'
+
+
+def parts_list_html(parts_data):
+    if not parts_data:
+        return "<em>No parts data loaded.</em>"
+    return '<ul class="parts-list">' + "".join(part_item_html(p) for p in parts_data) + '</ul>'
+
+
+def steps_list_html(steps_data):
+    if not steps_data:
+        return "<em>No steps data loaded.</em>"
+    return ('<ul class="steps-list">'
+            + "".join(step_item_html(i, step) for i, step in enumerate(steps_data, 1))
+            + '</ul>')
+
+
+# --- BOM views ------------------------------------------------------------- #
+
+def bom_part_markdown(part):
+    """One sourced part with its purchase options, as markdown."""
+    lines = [f"### {part['part']} (Qty: {part['quantity']})"]
+    for option in part.get("options", []):
+        lines.append(f"- {option['name']} - ₹{option['price']}  \n  [Buy Now]({option['link']})")
+    lines.append("\n---")
+    return "\n".join(lines)
+
+
+def bom_markdown(parts):
+    """The whole BOM as one markdown string."""
+    return "\n\n".join(bom_part_markdown(part) for part in parts)
+
+
+def option_labels(options):
+    """Radio labels for a part's options; the radio itself selects by index."""
+    return tuple(f"{opt['name']} | ₹{opt['price']} | [Link]({opt['link']})" for opt in options)
@@ -0,0 +1,209 @@
+# frontend/speculation.py
+#
+# Speculative work for the chat flow. The planner used to wait for the
+# "Generate Initial Plan" click, although most of what it needs is known
+# several answers earlier. A Speculator follows the answers as they arrive:
+#   - once the objective is known, a BOM is extracted for the inputs so far
+#     and its parts are searched, warming the part cache for the obvious
+#     parts (the microcontroller answer re-targets it)
+#   - when the last answer arrives, the brief for the final inputs starts at
+#     once, before the "Generate Initial Plan" click
+#   - once a brief is done, the BOM extraction that "Source parts" will run
+#     on it starts too, filling the LLM and part caches (in the combined
+#     plan + BOM mode the BOM is already known and only its parts are searched)
+# A click claims the matching job instead of starting a new one, so the
+# result is usually ready or already streaming. Speculation whose inputs no
+# longer match the answers is cancelled. Speculative Gemini calls queue
+# behind interactive ones in the LLM scheduler.
+
+import asyncio
+import os
+
+from middleware import jobs
+from middleware.llm_scheduler import BATCH, NORMAL, llm_priority
+from middleware.resources import get_planner
+from agents.bill_of_material.bom_stream import ClarificationNeeded
+from agents.registry import load_agent
+
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "1") == "1"
+
+# Chat answers in the order they are asked, with their label in the concept
+CONCEPT_FIELDS = (
+    ("objective", "Objective"),
+    ("budget", "Budget"),
+    ("microcontroller", "Microcontroller"),
+    ("user_level", "Skill Level"),
+    ("additional_info", "Additional Info"),
+)
+# Answers that add nothing to the concept
+_EMPTY_ANSWERS = {"", "-", "n/a", "na", "no", "none", "nope", "nothing", "no preference", "not sure", "any"}
+
+
+def _answered(value):
+    return value is not None and value.strip().lower().rstrip(".!") not in _EMPTY_ANSWERS
+
+
+def plan_concept(inputs):
+    """
+    The planner input for the answers so far. Unanswered and empty answers
+    ("none", "no") are left out.
+    """
+    return " ".join(f"{label}: {inputs[key].strip()}." for key, label in CONCEPT_FIELDS
+                    if _answered(inputs.get(key)))
+
+
+def bom_description(inputs):
+    """Description for the early BOM extraction: objective plus microcontroller if known."""
+    return plan_concept({key: inputs.get(key) for key in ("objective", "microcontroller")})
+
+
+def stream_plan(full_concept):
+    """Job body: streams the brief, publishing the text so far for the polling panel."""
+    chunks = []
+    for chunk in get_planner().stream_initial_plan(full_concept):
+        chunks.append(chunk)
+        jobs.report_progress("".join(chunks))
+        jobs.check_cancelled()
+    return "".join(chunks)
+
+
+async def plan_and_bom(full_concept):
+    """
+    Job body for plan generation, speculative or not. In the combined mode
+    {"brief", "sections", "bom"} come from one structured call whose brief
+    sections are published as they stream in; otherwise, or if that reply is
+    unusable, the brief is streamed the usual way.
+    """
+    # The agent modules (and their SDK imports) load with the first job, not the first page render
+    plan_bom = load_agent("bill_of_material", "plan_bom")
+    if plan_bom.COMBINED_PLAN_BOM:
+        try:
+            return await plan_bom.generate_plan_and_bom(full_concept, on_partial=jobs.report_progress)
+        except ValueError as e:
+            print(f"[DEBUG] Combined plan/BOM reply unusable, streaming the brief instead: {e}")
+    return {"brief": await asyncio.to_thread(stream_plan, full_concept)}
+
+
+def plan_result(result):
+    """(brief, bom or None) from a finished plan job."""
+    return result["brief"], result.get("bom")
+
+
+async def prewarm_parts(project_description, bom=None):
+    """
+    Job body: extract the BOM for a description (unless it is given) and
+    search every part, discarding the results. Only the caches are kept, so
+    the real extraction and sourcing runs for the same description (or parts)
+    are cache hits. Returns the part names seen.
+    """
+    cli_bom = load_agent("bill_of_material", "cli_bom")
+    parts = []
+    if bom is None:
+        entries = cli_bom.stream_bom_and_source_parts(project_description)
+    else:
+        entries = cli_bom.source_bom_as_completed(bom)
+    try:
+        async for _, entry in entries:
+            parts.append(entry["part"])
+    except ClarificationNeeded:
+        pass
+    return parts
+
+
+async def source_after(prewarm_job, project_description, project_id, bom=None):
+    """Job body: let a speculative extraction for this description finish, then source from the warm caches."""
+    if prewarm_job:
+        await jobs.get_job_runner().wait_async(prewarm_job)
+    cli_bom = load_agent("bill_of_material", "cli_bom")
+    return await cli_bom.generate_bom_and_source_parts(project_description, project_id, bom=bom)
+
+
+class Speculator:
+    """Per-session speculative jobs, keyed by the inputs each one was started from."""
+
+    def __init__(self, owner=None, runner=None):
+        self.owner = owner
+        self.runner = runner or jobs.get_job_runner()
+        self.enabled = SPECULATION_ENABLED
+        self.parts_key = self.parts_job = None
+        self.plan_key = self.plan_job = None
+        self.bom_key = self.bom_job = None
+        self.started = 0
+        self.cancelled = 0
+        self.reused = 0
+
+    def _submit(self, kind, priority, fn, *args):
+        with llm_priority(priority):
+            job_id = self.runner.submit(kind, fn, *args, owner=self.owner)
+        self.started += 1
+        return job_id
+
+    def _drop(self, job_id):
+        if job_id and self.runner.cancel(job_id):
+            self.cancelled += 1
+
+    def _usable(self, job_id):
+        job = self.runner.get(job_id) if job_id else None
+        return job is not None and job["status"] in (jobs.QUEUED, jobs.RUNNING, jobs.DONE)
+
+    def update(self, inputs, complete=False):
+        """
+        Called after each chat answer. Starts speculation the answers now
+        allow and cancels jobs started from answers that no longer match.
+        complete means no further answers will come.
+        """
+        if not self.enabled or not _answered(inputs.get("objective")):
+            return
+
+        description = bom_description(inputs)
+        if description != self.parts_key:
+            self._drop(self.parts_job)
+            self.parts_key = description
+            self.parts_job = self._submit("speculate.parts", BATCH, prewarm_parts, description)
+
+        # The brief is only speculated on the final answers: a brief for part
+        # of them is claimable only if the rest happened to add nothing
+        concept = plan_concept(inputs) if complete else None
+        if concept == self.plan_key:
+            return
+        self._drop(self.plan_job)
+        self.plan_key = self.plan_job = None
+        if concept:
+            self.plan_key = concept
+            self.plan_job = self._submit("speculate.plan", NORMAL, plan_and_bom, concept)
+
+    def claim_plan(self, concept):
+        """Job id of the speculative brief for this concept, handed over to the caller; None if there is none."""
+        if not self.enabled or concept != self.plan_key or not self._usable(self.plan_job):
+            return None
+        job_id, self.plan_key, self.plan_job = self.plan_job, None, None
+        self.reused += 1
+        return job_id
+
+    def prewarm_bom(self, description, bom=None):
+        """Start the extraction (or, given the BOM, the searches) "Source parts" will run on a finished brief."""
+        if not self.enabled or not description or description == self.bom_key:
+            return
+        self._drop(self.bom_job)
+        self.bom_key = description
+        self.bom_job = self._submit("speculate.bom", BATCH, prewarm_parts, description, bom)
+
+    def submit_sourcing(self, description, project_id, bom=None):
+        """Submit the sourcing job, reusing a speculative extraction of the same description."""
+        prewarm_job = None
+        if self.enabled and description == self.bom_key and self._usable(self.bom_job):
+            prewarm_job = self.bom_job
+            self.reused += 1
+        self.bom_key = self.bom_job = None
+        return self.runner.submit("bom", source_after, prewarm_job, description, project_id, bom,
+                                  owner=self.owner)
+
+    def cancel_all(self):
+        for job_id in (self.parts_job, self.plan_job, self.bom_job):
+            self._drop(job_id)
+        self.parts_key = self.parts_job = None
+        self.plan_key = self.plan_job = None
+        self.bom_key = self.bom_job = None
+
+    def stats(self):
+        return {"started": self.started, "cancelled": self.cancelled, "reused": self.reused}
@@ -1,23 +1,15 @@
 # app.py
 
 import streamlit as st
-from main_agent import ProtoForgeAgent
-from agents.bill_of_material.cli_bom import generate_bom_and_source_parts
-import json
-import os
-from datetime import datetime
-from agents.bill_of_material.cli_bom import fetch_part_options
+from middleware import jobs, tracing
+from middleware.llm_scheduler import INTERACTIVE, llm_priority
+from database.sqlite_demo.project_store import get_project_store
+from frontend.rendering import load_css, bom_markdown
+from frontend.project_picker import session_owner
+from frontend.speculation import Speculator, plan_and_bom, plan_concept, plan_result
 
 # --- Helper Functions (for better organization) ---
 
-def load_css(file_name):
-    """Loads a CSS file and injects it into the Streamlit app."""
-    try:
-        with open(file_name) as f:
-            st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
-    except FileNotFoundError:
-        st.error(f"CSS file not found: {file_name}. Please check the file path.")
-
 def initialize_session_state():
     """Initializes all necessary session state variables if they don't exist."""
     if 'step' not in st.session_state:
@@ -46,6 +38,8 @@ def handle_chat_flow():
             st.session_state.user_inputs[key] = prompt
             st.session_state.chat_history.append({"role": "user", "content": prompt, "avatar": "👤"})
             st.session_state.step += 1
+            # Start (or re-target) background work the answers so far allow
+            _speculator().update(st.session_state.user_inputs, complete=st.session_state.step == 5)
             st.rerun()
 
     elif current_step == 5:
@@ -54,46 +48,109 @@ def handle_chat_flow():
             st.session_state.generating = True
             st.rerun()
 
+def _session_id():
+    # Jobs and projects share the session's owner token, so the selector and
+    # roadmap pages opened with ?session=<token> can reach this session's projects
+    return session_owner()
+
+def _speculator():
+    if "speculator" not in st.session_state:
+        st.session_state.speculator = Speculator(owner=_session_id())
+    return st.session_state.speculator
+
 def trigger_agent_generation():
-    """Consolidates user inputs and calls the backend agent to generate the plan."""
-    try:
-        planner = ProtoForgeAgent()
-        full_concept = (
-            f"Objective: {st.session_state.user_inputs.get('objective')}. "
-            f"Budget: {st.session_state.user_inputs.get('budget')}. "
-            f"Microcontroller: {st.session_state.user_inputs.get('microcontroller')}. "
-            f"Skill Level: {st.session_state.user_inputs.get('user_level')}. "
-            f"Additional Info: {st.session_state.user_inputs.get('additional_info')}."
-        )
-        
-        with st.spinner("The Master Planner is structuring your idea..."):
-            initial_plan = planner.generate_initial_plan(full_concept)
-            st.session_state.plan = initial_plan
-            st.session_state.generating = False  # Set this before rerun
-            st.session_state.step = 6  # Set this before rerun
-            
-    except Exception as e:
-        st.error(f"Error generating plan: {str(e)}")
-        st.session_state.generating = False
-        st.session_state.plan = f"### An Error Occurred\n*Error details:*\n\n{e}\n"
-    
-    st.rerun()  # Only rerun once at the end
+    """Consolidates user inputs and submits plan generation as a background job."""
+    full_concept = plan_concept(st.session_state.user_inputs)
+
+    # The job's spans join this trace, so the timing panel still shows the whole generation
+    with tracing.span("ui.generate_plan") as root, llm_priority(INTERACTIVE):
+        # Usually the brief was already started speculatively when the last answer arrived
+        job_id = _speculator().claim_plan(full_concept)
+        root.set("speculative", job_id is not None)
+        st.session_state.plan_job = job_id or jobs.get_job_runner().submit(
+            "plan", plan_and_bom, full_concept, owner=_session_id())
+    st.session_state.trace_id = root.trace_id
+    st.session_state.generating = False
+
+@st.fragment(run_every=1.0)
+def plan_job_panel():
+    """Polls the plan job, rendering the brief as it streams; reruns the app once it finishes."""
+    runner = jobs.get_job_runner()
+    job_id = st.session_state.get("plan_job")
+    job = runner.get(job_id) if job_id else None
+    if job is None:
+        return
+
+    if job["status"] in (jobs.QUEUED, jobs.RUNNING):
+        st.subheader("Generated Project Brief")
+        st.markdown(job["partial"] or "_Waiting for the planner..._", unsafe_allow_html=True)
+        if st.button("Cancel generation"):
+            runner.cancel(job_id)
+        return
+
+    st.session_state.plan_job = None
+    if job["status"] == jobs.DONE:
+        # In the combined mode the BOM comes with the brief and is sourced without another LLM call
+        st.session_state.plan, st.session_state.plan_bom = plan_result(job["result"])
+        st.session_state.step = 6
+        # Extract (or search) the brief's BOM while the user reads it
+        _speculator().prewarm_bom(st.session_state.plan, st.session_state.plan_bom)
+    elif job["status"] == jobs.FAILED:
+        # Shown once above the chat; step 5 keeps the generate button for a retry
+        st.session_state.job_error = f"Error generating plan: {job['error']}"
+    st.rerun(scope="app")
+
+def trigger_bom_sourcing():
+    """Creates a project for the brief and sources its BOM in a background job."""
+    objective = st.session_state.user_inputs.get("objective") or "ProtoForge project"
+    description = st.session_state.plan
+    project_id = get_project_store().create_project(
+        objective[:80], description=description, owner=_session_id())
+    st.session_state.project_id = project_id
+    # Someone is watching this job: its Gemini calls go ahead of batch work
+    with llm_priority(INTERACTIVE):
+        st.session_state.bom_job = _speculator().submit_sourcing(
+            description, project_id, st.session_state.get("plan_bom"))
+
+@st.fragment(run_every=2.0)
+def bom_job_panel():
+    """Shows parts as the sourcing job stores them; reruns the app once it finishes."""
+    runner = jobs.get_job_runner()
+    job_id = st.session_state.get("bom_job")
+    job = runner.get(job_id) if job_id else None
+    if job is None:
+        return
+
+    if job["status"] in (jobs.QUEUED, jobs.RUNNING):
+        parts = load_sourced_parts()["parts"]
+        st.info(f"Sourcing parts... {len(parts)} found so far.")
+        if parts:
+            st.markdown(bom_markdown(parts))
+        if st.button("Cancel sourcing"):
+            runner.cancel(job_id)
+        return
+
+    st.session_state.bom_job = None
+    if job["status"] == jobs.FAILED:
+        st.session_state.job_error = f"Error sourcing parts: {job['error']}"
+    elif job["status"] == jobs.DONE and job["result"][1]:
+        st.session_state.job_error = job["result"][1]
+    st.rerun(scope="app")
+
+@st.cache_data(max_entries=32)
+def _load_project(project_id, version):
+    # `version` is only part of the cache key: a changed project is re-read,
+    # an unchanged one is served from memory across reruns
+    return get_project_store().load_project(project_id)
 
 def load_sourced_parts():
-    try:
-        file_path = os.path.join('agents', 'bill_of_material', 'sourced_parts.json')
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        return {"parts": [], "lastUpdated": "", "projectName": ""}
-    except json.JSONDecodeError:
+    """Loads only the current session's project from the project store; nothing before it has one."""
+    store = get_project_store()
+    project_id = st.session_state.get("project_id")
+    version = store.project_version(project_id) if project_id else None
+    if version is None:
         return {"parts": [], "lastUpdated": "", "projectName": ""}
-
-def save_sourced_parts(parts_data):
-    file_path = os.path.join('agents', 'bill_of_material', 'sourced_parts.json')
-    parts_data["lastUpdated"] = datetime.now().isoformat()
-    with open(file_path, 'w') as f:
-        json.dump(parts_data, f, indent=4)
+    return _load_project(project_id, version)
 
 def bom_selector():
     st.header("🧾 Bill of Materials (BOM) Selector")
@@ -106,13 +163,39 @@ def bom_selector():
         
     st.write(f"Last Updated: {sourced_parts['lastUpdated']}")
     st.write(f"Project: {sourced_parts['projectName']}")
+    st.caption(f"Open the BOM selector or roadmap page with "
+               f"`?session={_session_id()}&project={st.session_state.project_id}` to continue with this project.")
     
-    for part in sourced_parts["parts"]:
-        st.subheader(f"{part['name']} (Qty: {part['quantity']})")
-        for option in part.get("options", []):
-            st.write(f"- {option['title']} - ₹{option['price']}")
-            st.markdown(f"  [Buy Now]({option['link']})")
-        st.write("---")
+    # One markdown element for the whole BOM instead of several elements per part and option
+    st.markdown(bom_markdown(sourced_parts["parts"]))
+
+def render_timing_panel():
+    """Sidebar waterfall of the spans recorded for the last generation."""
+    st.sidebar.subheader("⏱️ Timing")
+    trace_id = st.session_state.get("trace_id")
+    spans = tracing.get_trace(trace_id) if trace_id else []
+    if not spans:
+        st.sidebar.caption("Generate a plan with the panel enabled to see its timings.")
+        return
+
+    trace_start = spans[0]["start"]
+    total = max(s["start"] + (s["duration_s"] or 0) for s in spans) - trace_start or 1e-9
+    depth = {}
+    rows = []
+    for s in spans:
+        depth[s["span_id"]] = depth.get(s["parent_id"], -1) + 1
+        offset = (s["start"] - trace_start) / total * 100
+        width = max((s["duration_s"] or 0) / total * 100, 0.5)
+        attrs = ", ".join(f"{k}={v}" for k, v in s["attributes"].items())
+        rows.append(
+            f'<div style="font-size: 12px; margin-left: {depth[s["span_id"]] * 10}px;">'
+            f'{s["name"]} · {(s["duration_s"] or 0) * 1000:.1f} ms'
+            f'<span style="color: #64748b;"> {attrs}</span></div>'
+            f'<div style="background: #1c222e; height: 6px; margin-bottom: 6px;">'
+            f'<div style="margin-left: {offset:.2f}%; width: {width:.2f}%; height: 6px; '
+            f'background: {"#ef4444" if s["error"] else "#00f9d3"};"></div></div>'
+        )
+    st.sidebar.markdown("".join(rows), unsafe_allow_html=True)
 
 # --- Main Application Logic ---
 
@@ -121,7 +204,18 @@ def main():
     st.set_page_config(page_title="ProtoForge AI", page_icon="🛠️", layout="centered")
     load_css("style.css")
     initialize_session_state()
+    tracing.start_metrics_server()  # no-op unless METRICS_PORT is set
+
+    show_timings = st.sidebar.toggle("Show timing debug panel", value=tracing.enabled())
+    # Only this session's run (and the jobs it starts) records spans; other sessions are unaffected
+    with tracing.session_tracing(show_timings):
+        render_app()
 
+    if show_timings:
+        render_timing_panel()
+
+def render_app():
+    """Chat, generation panels and BOM views for the current step."""
     st.title("🛠️ ProtoForge AI")
     st.markdown("Your personal AI hardware architect. Let's start by defining your concept.")
     st.markdown("---")
@@ -137,13 +231,25 @@ def main():
     
     if st.session_state.generating:
         trigger_agent_generation()
+
+    # Generation runs in background jobs; these panels poll them without blocking the page
+    if st.session_state.get("plan_job"):
+        plan_job_panel()
+
+    if st.session_state.get("job_error"):
+        st.error(st.session_state.pop("job_error"))
     
     if st.session_state.step == 6:
         st.success("The initial project brief is ready!")
         st.subheader("Generated Project Brief")
         st.markdown(st.session_state.plan, unsafe_allow_html=True)
+        if not st.session_state.get("bom_job") and st.button("🔎 Source parts for this brief"):
+            trigger_bom_sourcing()
 
-    bom_selector()
+    if st.session_state.get("bom_job"):
+        bom_job_panel()
+    else:
+        bom_selector()
 
 if __name__ == "__main__":
     main()
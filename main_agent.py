@@ -1,14 +1,26 @@
 # main_agent.py
 
 import os
+import time
 from dotenv import load_dotenv
 import google.generativeai as genai
+from middleware.retry import retry_async
+from database.sqlite_demo.llm_cache import get_llm_cache
+from middleware.tracing import span
+from middleware.llm_scheduler import scheduled, scheduled_async, scheduled_stream, estimate_tokens
 
 # Load environment variables from your .env file
 load_dotenv()
 
+PLAN_MODEL = "gemini-1.5-flash-latest"
+
 class ProtoForgeAgent:
-    def __init__(self):
+    def __init__(self, model=None):
+        # An injected model (e.g. the benchmark's fake Gemini) skips SDK setup
+        if model is not None:
+            self.model = model
+            return
+
         # This successfully reads the key from your .env file
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
@@ -20,16 +32,11 @@ class ProtoForgeAgent:
 
         # Initialize the specific model you want to use
         # 'gemini-1.5-flash-latest' is a great, fast choice.
-        self.model = genai.GenerativeModel("gemini-1.5-flash-latest")
-
-    def generate_initial_plan(self, user_prompt: str) -> str:
-        """
-        Generates a structured project plan using the direct Gemini SDK.
-        """
-        print("[DEBUG] Running Master Planner (Direct SDK)...")
+        self.model = genai.GenerativeModel(PLAN_MODEL)
 
+    def _build_plan_prompt(self, user_prompt: str) -> str:
         # This is the prompt that instructs the AI on how to format the output
-        prompt = f"""
+        return f"""
         You are an expert hardware project planner. Based on the following user input, create a structured project brief.
         The brief must have these exact Markdown sections:
         - **Project Title:**
@@ -41,11 +48,88 @@ class ProtoForgeAgent:
         User Input: {user_prompt}
         """
 
-        try:
-            # Make the API call to Google
-            response = self.model.generate_content(prompt)
-            # Return the text part of the response
-            return response.text
-        except Exception as e:
-            # If anything goes wrong, return a clear error message
-            return f"[ERROR] The call to the Gemini API failed: {e}"
\ No newline at end of file
+    def generate_initial_plan(self, user_prompt: str, use_cache: bool = True) -> str:
+        """
+        Generates a structured project plan using the direct Gemini SDK.
+        Repeated briefs are served from the LLM response cache unless use_cache is False.
+        """
+        print("[DEBUG] Running Master Planner (Direct SDK)...")
+
+        with span("plan.generate", model=PLAN_MODEL) as s:
+            prompt = self._build_plan_prompt(user_prompt)
+            if use_cache:
+                cached = get_llm_cache().get(PLAN_MODEL, prompt)
+                s.set("cache_hit", cached is not None)
+                if cached is not None:
+                    return cached
+
+            try:
+                # Make the API call to Google once the shared scheduler admits it
+                response = scheduled(lambda: self.model.generate_content(prompt),
+                                     estimate_tokens(prompt))
+                if use_cache:
+                    get_llm_cache().put(PLAN_MODEL, prompt, response.text)
+                # Return the text part of the response
+                return response.text
+            except Exception as e:
+                # If anything goes wrong, return a clear error message
+                return f"[ERROR] The call to the Gemini API failed: {e}"
+
+    def stream_initial_plan(self, user_prompt: str, use_cache: bool = True):
+        """
+        Streaming variant of generate_initial_plan: yields Markdown text chunks as
+        the model produces them. The complete brief is cached once the stream ends.
+        """
+        print("[DEBUG] Running Master Planner (Streaming SDK)...")
+
+        with span("plan.stream", model=PLAN_MODEL) as s:
+            prompt = self._build_plan_prompt(user_prompt)
+            if use_cache:
+                cached = get_llm_cache().get(PLAN_MODEL, prompt)
+                s.set("cache_hit", cached is not None)
+                if cached is not None:
+                    yield cached
+                    return
+
+            chunks = []
+            started = time.perf_counter()
+            try:
+                for chunk in scheduled_stream(lambda: self.model.generate_content(prompt, stream=True),
+                                              estimate_tokens(prompt)):
+                    # The final chunk of a stream may carry only finish metadata
+                    if not chunk.parts:
+                        continue
+                    if not chunks:
+                        s.set("time_to_first_token_s", round(time.perf_counter() - started, 4))
+                    chunks.append(chunk.text)
+                    yield chunk.text
+            except Exception as e:
+                yield f"\n\n[ERROR] The call to the Gemini API failed: {e}"
+                return
+
+            if use_cache and chunks:
+                get_llm_cache().put(PLAN_MODEL, prompt, "".join(chunks))
+
+    async def generate_initial_plan_async(self, user_prompt: str, use_cache: bool = True) -> str:
+        """
+        Async variant of generate_initial_plan. Does not block the event loop and
+        retries 429/5xx/timeouts with the same backoff as cli_bom.call_gemini.
+        """
+        print("[DEBUG] Running Master Planner (Async SDK)...")
+
+        with span("plan.generate", model=PLAN_MODEL, mode="async") as s:
+            prompt = self._build_plan_prompt(user_prompt)
+            if use_cache:
+                cached = get_llm_cache().get(PLAN_MODEL, prompt)
+                s.set("cache_hit", cached is not None)
+                if cached is not None:
+                    return cached
+
+            try:
+                response = await retry_async(lambda: scheduled_async(
+                    lambda: self.model.generate_content_async(prompt), estimate_tokens(prompt)))
+                if use_cache:
+                    get_llm_cache().put(PLAN_MODEL, prompt, response.text)
+                return response.text
+            except Exception as e:
+                return f"[ERROR] The call to the Gemini API failed: {e}"
@@ -0,0 +1,108 @@
+# middleware/circuit_breaker.py
+
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric state for the metrics endpoint, which only exports numbers
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend the breaker considers unhealthy."""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} circuit is open; next probe in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a backend is unhealthy. After `failure_threshold`
+    consecutive failures the circuit opens and check() raises
+    CircuitOpenError for `reset_timeout` seconds; then one probe call is let
+    through (half-open). Its success closes the circuit, its failure opens it
+    again.
+
+    Callers report every outcome with record_success() / record_failure().
+    The state is shared by all threads and event loops in the process.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go to the backend now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic()
+            if self._state == OPEN and retry_in <= 0:
+                self._state = HALF_OPEN
+                self._probing = False
+            # A probe that never reported back (cancelled) is replaced after reset_timeout
+            now = time.monotonic()
+            if self._state == HALF_OPEN and (
+                    not self._probing or now - self._probe_started > self.reset_timeout):
+                self._probing = True
+                self._probe_started = now
+                return
+            self.rejected += 1
+        raise CircuitOpenError(self.name, max(retry_in, 0.0))
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self._consecutive_failures = 0
+            self._state = CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or (
+                    self._state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.opened += 1
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._state,
+                "state_value": _STATE_VALUES[self._state],
+                "consecutive_failures": self._consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "opened": self.opened,
+            }
@@ -0,0 +1,109 @@
+# middleware/hedging.py
+
+import asyncio
+import collections
+import threading
+import time
+
+
+def quantile(sorted_values, q):
+    """Nearest-rank quantile (0 < q <= 1) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(q * len(sorted_values) + 0.5) - 1))]
+
+
+class Hedger:
+    """
+    Hedged requests for tail latency: when a call is still outstanding after
+    the observed `hedge_quantile` (p95) of recent call latencies, a duplicate
+    is sent and whichever answers first wins; the other is cancelled. So only
+    the slowest ~5% of calls are duplicated, and a single slow or hung
+    response no longer sets the latency of everything waiting on it.
+
+    Until `min_samples` latencies have been seen the hedge fires after
+    `initial_delay`. Hedges are capped at `max_ratio` of calls so a backend
+    that is slow across the board isn't sent twice the load.
+    """
+
+    def __init__(self, hedge_quantile=0.95, initial_delay=1.0, min_delay=0.05,
+                 min_samples=20, max_ratio=0.1, window=512):
+        self.hedge_quantile = hedge_quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self):
+        """Seconds to wait before sending the duplicate."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            latencies = sorted(self._latencies)
+        return max(self.min_delay, quantile(latencies, self.hedge_quantile))
+
+    def _may_hedge(self):
+        with self._lock:
+            if self.hedges >= self.max_ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    async def run(self, make_call):
+        """
+        Await make_call(), hedged. make_call must return a fresh awaitable on
+        every invocation. The first successful result is returned; if every
+        attempt fails, the primary's error is raised.
+        """
+        with self._lock:
+            self.calls += 1
+
+        async def attempt():
+            started = time.perf_counter()
+            result = await make_call()
+            self.observe(time.perf_counter() - started)
+            return result
+
+        primary = asyncio.ensure_future(attempt())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if not done and self._may_hedge():
+                tasks.append(asyncio.ensure_future(attempt()))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return task.result()
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        delay = self.hedge_delay()
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_delay_ms": round(delay * 1000, 1),
+                "p50_ms": round(quantile(latencies, 0.5) * 1000, 1),
+                "p95_ms": round(quantile(latencies, 0.95) * 1000, 1),
+                "p99_ms": round(quantile(latencies, 0.99) * 1000, 1),
+            }
@@ -0,0 +1,285 @@
+# middleware/jobs.py
+#
+# In-process background jobs, so slow work (plan generation, BOM sourcing)
+# runs outside the Streamlit script thread. A page submits a job, keeps its
+# id in session state and polls; reruns and navigation no longer throw
+# finished work away, and one slow Gemini call doesn't stall a session.
+#
+#   job_id = get_job_runner().submit("plan", generate, brief, owner=session_id)
+#   job = get_job_runner().get(job_id)   # {"status": "running", "partial": ...}
+#
+# Plain functions run on a thread pool (JOB_WORKERS); coroutine functions run
+# on the shared I/O loop from middleware.resources, at most
+# JOB_ASYNC_CONCURRENCY at a time. Jobs can publish partial output with
+# report_progress() and check cancel_requested() to stop early. Status and
+# results are persisted in the job store.
+
+import asyncio
+import concurrent.futures
+import contextvars
+import inspect
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from database.sqlite_demo.job_store import get_job_store
+from middleware.resources import _background_loop
+from middleware.tracing import register_gauges
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_ASYNC_CONCURRENCY = int(os.getenv("JOB_ASYNC_CONCURRENCY", "32"))
+# Finished jobs kept in memory; older ones are still readable from the store
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "1000"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_current_job = contextvars.ContextVar("protoforge_job", default=None)
+
+
+class JobCancelled(Exception):
+    """Raised by check_cancelled() inside a job whose cancellation was requested."""
+
+
+class Job:
+    __slots__ = ("id", "kind", "owner", "status", "result", "error", "partial",
+                 "created_at", "started_at", "finished_at", "_cancel", "_future", "_task")
+
+    def __init__(self, kind, owner):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.partial = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._future = None
+        self._task = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "owner": self.owner,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "partial": self.partial,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def report_progress(partial):
+    """Publish partial output (e.g. the text streamed so far) for the running job."""
+    job = _current_job.get()
+    if job is not None:
+        job.partial = partial
+
+
+def cancel_requested():
+    job = _current_job.get()
+    return job is not None and job._cancel.is_set()
+
+
+def check_cancelled():
+    """Raise JobCancelled if the running job was asked to stop."""
+    if cancel_requested():
+        raise JobCancelled()
+
+
+class JobRunner:
+    """Runs submitted jobs in the background and tracks their status."""
+
+    def __init__(self, workers=JOB_WORKERS, async_concurrency=JOB_ASYNC_CONCURRENCY, store=None):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="protoforge-job")
+        self._async_concurrency = async_concurrency
+        self._async_slots = None
+        self._store = store or get_job_store()
+        self._lock = threading.Lock()
+        self._active = {}
+        self._finished = OrderedDict()
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        abandoned = self._store.abandon_unfinished()
+        if abandoned:
+            print(f"[DEBUG] Marked {abandoned} jobs from a previous run as failed")
+        purged = self._store.purge()
+        if purged:
+            print(f"[DEBUG] Purged {purged} finished jobs past retention")
+
+    def submit(self, kind, fn, *args, owner=None, **kwargs):
+        """Queue fn(*args, **kwargs) and return the job id. fn may be a coroutine function."""
+        job = Job(kind, owner)
+        self._store.create(job.id, kind, owner)
+        with self._lock:
+            self._active[job.id] = job
+        # Jobs inherit the caller's context, so their spans join the caller's trace
+        context = contextvars.copy_context()
+        if inspect.iscoroutinefunction(fn):
+            loop = _background_loop()
+            job._future = asyncio.run_coroutine_threadsafe(
+                self._run_async(job, context, fn, args, kwargs), loop)
+        else:
+            job._future = self._executor.submit(context.run, self._run_sync, job, fn, args, kwargs)
+        return job.id
+
+    def _start(self, job):
+        _current_job.set(job)
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._store.mark_running(job.id)
+
+    def _run_sync(self, job, fn, args, kwargs):
+        if job._cancel.is_set():
+            self._finish(job, CANCELLED)
+            return
+        self._start(job)
+        try:
+            result = fn(*args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            self._finish(job, FAILED, error=f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job, CANCELLED if job._cancel.is_set() else DONE, result)
+
+    async def _run_async(self, job, context, fn, args, kwargs):
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self._async_concurrency)
+        async with self._async_slots:
+            if job._cancel.is_set():
+                self._finish(job, CANCELLED)
+                return
+            # Run the job as its own task in the caller's context
+            task = context.run(asyncio.ensure_future, self._call_async(job, fn, args, kwargs))
+            job._task = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                self._finish(job, CANCELLED)
+
+    async def _call_async(self, job, fn, args, kwargs):
+        self._start(job)
+        try:
+            result = await fn(*args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            self._finish(job, FAILED, error=f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job, CANCELLED if job._cancel.is_set() else DONE, result)
+
+    def _finish(self, job, status, result=None, error=None):
+        with self._lock:
+            # A cancel and the job's own completion may race; the first one wins
+            if job.status in FINISHED:
+                return
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+        try:
+            self._store.finish(job.id, status, result, error)
+        except Exception as e:
+            print(f"[DEBUG] Could not persist job {job.id}: {e}")
+        with self._lock:
+            self._active.pop(job.id, None)
+            self._finished[job.id] = job
+            while len(self._finished) > MAX_FINISHED_JOBS:
+                self._finished.popitem(last=False)
+            if status == DONE:
+                self.completed += 1
+            elif status == FAILED:
+                self.failed += 1
+            else:
+                self.cancelled += 1
+
+    def get(self, job_id):
+        """The job as a dict, from memory or the job store; None if unknown."""
+        with self._lock:
+            job = self._active.get(job_id) or self._finished.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        stored = self._store.get(job_id)
+        if stored is not None:
+            stored["partial"] = None
+        return stored
+
+    def cancel(self, job_id):
+        """
+        Ask a job to stop. Queued jobs never start; running coroutine jobs are
+        cancelled at their next await; running thread jobs stop at their next
+        check_cancelled() or have their result discarded.
+        Returns False if the job is unknown or already finished.
+        """
+        with self._lock:
+            job = self._active.get(job_id)
+        if job is None or job.status in FINISHED:
+            return False
+        job._cancel.set()
+        if job._task is not None:
+            job._task.get_loop().call_soon_threadsafe(job._task.cancel)
+        elif job._future is not None and job._future.cancel():
+            # Still waiting for a worker thread
+            self._finish(job, CANCELLED)
+        return True
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes (for CLIs and tests) and return it."""
+        with self._lock:
+            job = self._active.get(job_id)
+        if job is not None and job._future is not None:
+            try:
+                job._future.result(timeout)
+            except concurrent.futures.CancelledError:
+                pass
+        return self.get(job_id)
+
+    async def wait_async(self, job_id):
+        """Await a job from another coroutine (e.g. a job that builds on its result) and return it."""
+        with self._lock:
+            job = self._active.get(job_id)
+        if job is not None and job._future is not None:
+            # shield: cancelling the waiter must not cancel the job it waits for
+            try:
+                await asyncio.shield(asyncio.wrap_future(job._future))
+            except (asyncio.CancelledError, concurrent.futures.CancelledError):
+                if not job._cancel.is_set():
+                    raise
+        return self.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            active = list(self._active.values())
+        return {
+            "queued": sum(1 for job in active if job.status == QUEUED),
+            "running": sum(1 for job in active if job.status == RUNNING),
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+        }
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Process-wide job runner, shared by every Streamlit session."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner()
+                register_gauges("jobs", _runner.stats)
+    return _runner
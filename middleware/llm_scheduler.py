@@ -0,0 +1,395 @@
+# middleware/llm_scheduler.py
+#
+# Shared admission control for every Gemini call in the process. Each API key
+# gets token buckets for requests per minute and (estimated) tokens per
+# minute; callers queue for capacity by priority instead of firing
+# independently and tripping the quota. Interactive UI work is admitted
+# before normal and batch work, every waiter has a deadline, and a 429 pauses
+# admissions for the whole key rather than letting each caller retry into it.
+#
+#   with llm_priority(BATCH):
+#       await call_gemini(conversation)      # queued behind interactive calls
+#
+#   response = await scheduled_async(lambda: client.aio.models.generate_content(...),
+#                                    estimate_tokens(prompt))
+#
+# Queue depth, admissions and wait times are exported as gauges, and each wait
+# is traced as an "llm.queue_wait" span.
+
+import asyncio
+import concurrent.futures
+import contextvars
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from middleware.retry import status_code_of
+from middleware.tracing import register_gauges, span
+
+# Quota per API key; set these to the key's actual limits
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+# Output tokens assumed per call when estimating a request's token cost
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "1024"))
+# Seconds all admissions for a key pause after a 429 without Retry-After
+RATE_LIMIT_PAUSE = float(os.getenv("GEMINI_RATE_LIMIT_PAUSE", "5"))
+
+INTERACTIVE, NORMAL, BATCH = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BATCH: "batch"}
+# How long a caller of each priority may wait for capacity before giving up
+DEFAULT_DEADLINES = {
+    INTERACTIVE: float(os.getenv("LLM_DEADLINE_INTERACTIVE", "30")),
+    NORMAL: float(os.getenv("LLM_DEADLINE_NORMAL", "120")),
+    BATCH: float(os.getenv("LLM_DEADLINE_BATCH", "900")),
+}
+
+_priority = contextvars.ContextVar("protoforge_llm_priority", default=NORMAL)
+
+
+class DeadlineExceeded(Exception):
+    """The call could not be admitted before its deadline. Not retried by retry_async."""
+
+
+@contextmanager
+def llm_priority(priority):
+    """Run the enclosed Gemini calls (including those in jobs and tasks started here) at `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(prompt, expected_output=EXPECTED_OUTPUT_TOKENS):
+    """Rough token cost of a call: ~4 characters per prompt token plus the expected output."""
+    return len(prompt) // 4 + expected_output
+
+
+def usage_tokens(response):
+    """Actual total token count from a Gemini response's usage metadata, if present."""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return total if isinstance(total, int) else None
+
+
+class TokenBucket:
+    """Capacity refilled continuously at `per_minute` / 60 per second, bursting up to `per_minute`."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` is available (amounts above capacity need a full bucket)."""
+        missing = min(amount, self.capacity) - self.level
+        return 0.0 if missing <= 0 else missing / self.rate
+
+
+class Grant:
+    """Admission for one call; settle() corrects the token estimate once usage is known."""
+
+    def __init__(self, scheduler, tokens):
+        self._scheduler = scheduler
+        self.tokens = tokens
+
+    def settle(self, actual_tokens):
+        if actual_tokens is not None:
+            self._scheduler._adjust_tokens(actual_tokens - self.tokens)
+            self.tokens = actual_tokens
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "deadline", "enqueued", "future")
+
+    def __init__(self, priority, seq, tokens, deadline):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.future = concurrent.futures.Future()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMScheduler:
+    """
+    Priority admission queue in front of one API key's request and token
+    buckets. Waiters are served strictly by (priority, arrival); a dispatcher
+    thread admits them as capacity refills and fails those whose deadline
+    passes. Safe to use from any thread and any event loop.
+    """
+
+    def __init__(self, name, rpm=GEMINI_RPM, tpm=GEMINI_TPM):
+        self.name = name
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._paused_until = 0.0
+        self.admitted = 0
+        self.expired = 0
+        self.rate_limited = 0
+        self.wait_s_total = 0.0
+        self.wait_s_max = 0.0
+        self._thread = threading.Thread(target=self._dispatch_loop, daemon=True,
+                                        name=f"protoforge-llm-scheduler-{name}")
+        self._thread.start()
+
+    # --- Admission ----------------------------------------------------------- #
+
+    def _enqueue(self, tokens, priority, deadline):
+        priority = _priority.get() if priority is None else priority
+        timeout = DEFAULT_DEADLINES.get(priority, DEFAULT_DEADLINES[NORMAL]) if deadline is None else deadline
+        with self._cond:
+            waiter = _Waiter(priority, next(self._seq), tokens, time.monotonic() + timeout)
+            heapq.heappush(self._queue, waiter)
+            self._cond.notify()
+        return waiter
+
+    def acquire(self, tokens, priority=None, deadline=None):
+        """Block until the call may go out. Raises DeadlineExceeded after `deadline` seconds."""
+        waiter = self._enqueue(tokens, priority, deadline)
+        with span("llm.queue_wait", priority=PRIORITY_NAMES.get(waiter.priority)):
+            waiter.future.result()
+        return Grant(self, tokens)
+
+    async def acquire_async(self, tokens, priority=None, deadline=None):
+        """Async acquire(); a cancelled caller gives up its place in the queue."""
+        waiter = self._enqueue(tokens, priority, deadline)
+        with span("llm.queue_wait", priority=PRIORITY_NAMES.get(waiter.priority)):
+            try:
+                await asyncio.wrap_future(waiter.future)
+            except asyncio.CancelledError:
+                self._withdraw(waiter)
+                raise
+        return Grant(self, tokens)
+
+    def _withdraw(self, waiter):
+        # wrap_future has already propagated the cancel to waiter.future if it was pending
+        with self._cond:
+            if waiter in self._queue:
+                waiter.future.cancel()
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+            elif not waiter.future.cancelled() and waiter.future.exception() is None:
+                # Admitted just before the cancel: return the unused capacity
+                self._requests.level += 1
+                self._tokens.level += waiter.tokens
+            self._cond.notify()
+
+    def pause(self, seconds):
+        """Stop admitting anything for `seconds` (after a 429 from the API)."""
+        with self._cond:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify()
+
+    def _adjust_tokens(self, delta):
+        with self._cond:
+            # May go negative: an underestimated call delays the next admissions
+            self._tokens.level -= delta
+            self._cond.notify()
+
+    # --- Dispatch ------------------------------------------------------------ #
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                self._cond.wait(self._dispatch())
+
+    def _dispatch(self):
+        """Admit and expire waiters; returns how long to sleep before the next check."""
+        now = time.monotonic()
+        self._requests.refill(now)
+        self._tokens.refill(now)
+
+        # Drop waiters cancelled by their caller and expire those past their deadline
+        if any(w.deadline <= now or w.future.cancelled() for w in self._queue):
+            for waiter in [w for w in self._queue if w.deadline <= now or w.future.cancelled()]:
+                self._queue.remove(waiter)
+                # False if the caller cancelled; otherwise the caller can no longer cancel
+                if not waiter.future.set_running_or_notify_cancel():
+                    continue
+                self.expired += 1
+                waiter.future.set_exception(DeadlineExceeded(
+                    f"Gemini call not admitted within its deadline "
+                    f"({PRIORITY_NAMES.get(waiter.priority)}, {now - waiter.enqueued:.1f}s queued)"))
+            heapq.heapify(self._queue)
+
+        wait = None
+        if now < self._paused_until:
+            wait = self._paused_until - now
+        while self._queue and wait is None:
+            head = self._queue[0]
+            wait = max(self._requests.wait_time(1), self._tokens.wait_time(head.tokens)) or None
+            if wait is None:
+                heapq.heappop(self._queue)
+                if not head.future.set_running_or_notify_cancel():
+                    continue
+                self._requests.level -= 1
+                self._tokens.level -= head.tokens
+                waited = now - head.enqueued
+                self.admitted += 1
+                self.wait_s_total += waited
+                self.wait_s_max = max(self.wait_s_max, waited)
+                head.future.set_result(None)
+
+        if not self._queue:
+            return None
+        next_deadline = min(w.deadline for w in self._queue) - now
+        return max(0.001, min(wait if wait is not None else next_deadline, next_deadline))
+
+    # --- Metrics ------------------------------------------------------------- #
+
+    def stats(self):
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for waiter in self._queue:
+                depth[PRIORITY_NAMES.get(waiter.priority, "normal")] += 1
+            return {
+                "queue_depth": len(self._queue),
+                **{f"queue_depth_{name}": count for name, count in depth.items()},
+                "admitted": self.admitted,
+                "expired": self.expired,
+                "rate_limited": self.rate_limited,
+                "wait_s_total": round(self.wait_s_total, 4),
+                "wait_s_avg": round(self.wait_s_total / self.admitted, 4) if self.admitted else 0.0,
+                "wait_s_max": round(self.wait_s_max, 4),
+                "requests_available": round(self._requests.level, 2),
+                "tokens_available": round(self._tokens.level),
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def _default_key():
+    return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY") or ""
+
+
+def get_scheduler(api_key=None):
+    """The scheduler for an API key (default: GEMINI_API_KEY), created on first use."""
+    api_key = _default_key() if api_key is None else api_key
+    scheduler = _schedulers.get(api_key)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(api_key)
+            if scheduler is None:
+                # Metrics are labelled by a key fingerprint, never the key itself
+                name = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+                scheduler = _schedulers[api_key] = LLMScheduler(name)
+                register_gauges(f"llm_scheduler_{name}", scheduler.stats)
+    return scheduler
+
+
+def _note_rate_limit(scheduler, exc):
+    if status_code_of(exc) == 429 or "RESOURCE_EXHAUSTED" in str(exc):
+        retry_after = getattr(getattr(exc, "response", None), "headers", {}) or {}
+        try:
+            pause = float(retry_after.get("retry-after", RATE_LIMIT_PAUSE))
+        except (TypeError, ValueError, AttributeError):
+            pause = RATE_LIMIT_PAUSE
+        scheduler.pause(pause)
+
+
+def scheduled(make_call, tokens, priority=None, deadline=None, api_key=None):
+    """Wait for admission, then run make_call() (blocking). 429s pause the key's queue."""
+    scheduler = get_scheduler(api_key)
+    grant = scheduler.acquire(tokens, priority, deadline)
+    try:
+        response = make_call()
+    except Exception as e:
+        _note_rate_limit(scheduler, e)
+        raise
+    grant.settle(usage_tokens(response))
+    return response
+
+
+def scheduled_stream(make_stream, tokens, priority=None, deadline=None, api_key=None):
+    """
+    Streaming scheduled(): waits for admission, then yields the chunks of
+    make_stream(). A 429 while opening or reading the stream pauses the key's
+    queue; the grant is settled with the usage metadata of the last chunk.
+    """
+    scheduler = get_scheduler(api_key)
+    grant = scheduler.acquire(tokens, priority, deadline)
+    last = None
+    try:
+        for chunk in make_stream():
+            last = chunk
+            yield chunk
+    except Exception as e:
+        _note_rate_limit(scheduler, e)
+        raise
+    finally:
+        # A stream closed early is charged for what its last chunk reports
+        grant.settle(usage_tokens(last))
+
+
+async def scheduled_async(make_call, tokens, priority=None, deadline=None, api_key=None, timeout=None):
+    """
+    Async scheduled(): make_call must return a fresh awaitable. `timeout`
+    bounds the API call only, from admission on; the queue wait is bounded
+    by the priority's deadline.
+    """
+    scheduler = get_scheduler(api_key)
+    grant = await scheduler.acquire_async(tokens, priority, deadline)
+    try:
+        if timeout is not None:
+            response = await asyncio.wait_for(make_call(), timeout)
+        else:
+            response = await make_call()
+    except Exception as e:
+        _note_rate_limit(scheduler, e)
+        raise
+    grant.settle(usage_tokens(response))
+    return response
+
+
+async def _settled_stream(scheduler, grant, stream):
+    last = None
+    try:
+        async for chunk in stream:
+            last = chunk
+            yield chunk
+    except Exception as e:
+        _note_rate_limit(scheduler, e)
+        raise
+    finally:
+        grant.settle(usage_tokens(last))
+
+
+async def scheduled_async_stream(open_stream, tokens, priority=None, deadline=None, api_key=None,
+                                 timeout=None):
+    """
+    Async scheduled_stream(): open_stream must return a fresh awaitable that
+    resolves to an async iterator of chunks. Returns that stream once it is
+    open (`timeout` bounds the opening, from admission on), so retrying this
+    call retries the opening only. The grant is settled with the usage
+    metadata of the last chunk read.
+    """
+    scheduler = get_scheduler(api_key)
+    grant = await scheduler.acquire_async(tokens, priority, deadline)
+    try:
+        if timeout is not None:
+            stream = await asyncio.wait_for(open_stream(), timeout)
+        else:
+            stream = await open_stream()
+    except Exception as e:
+        _note_rate_limit(scheduler, e)
+        raise
+    return _settled_stream(scheduler, grant, stream)
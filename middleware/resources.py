@@ -0,0 +1,145 @@
+# middleware/resources.py
+#
+# Process-wide owner of long-lived clients. Streamlit re-executes the page
+# script on every interaction, so anything built inside it (LLM clients, HTTP
+# connection pools) would otherwise be thrown away and rebuilt per request.
+
+import asyncio
+import atexit
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection-pool tuning for outbound HTTP (part search, vendor sites)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "16"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+# HTTP/2 multiplexes lookups over one connection; needs the optional `h2` package
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+
+_lock = threading.Lock()
+_planner = None
+_genai_client = None
+_http_clients = {}
+_loop = None
+
+
+def _http2_available():
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_planner():
+    """Shared ProtoForgeAgent, built on first use."""
+    global _planner
+    if _planner is None:
+        with _lock:
+            if _planner is None:
+                from main_agent import ProtoForgeAgent
+                _planner = ProtoForgeAgent()
+    return _planner
+
+
+def get_genai_client():
+    """Shared google-genai client for the BOM agent."""
+    global _genai_client
+    if _genai_client is None:
+        with _lock:
+            if _genai_client is None:
+                from google import genai
+                _genai_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return _genai_client
+
+
+def set_genai_client(client):
+    """Replace the shared google-genai client, e.g. with a local stand-in for benchmarks."""
+    global _genai_client
+    with _lock:
+        _genai_client = client
+
+
+def get_http_client():
+    """
+    Pooled httpx.AsyncClient for the running event loop. httpx connection
+    pools are bound to the loop that created them, so there is one client per
+    loop; code run through run_async always shares the same one.
+    """
+    # Imported on first use: pages that never make HTTP calls skip httpx at startup
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    with _lock:
+        for stale_loop in [l for l in _http_clients if l.is_closed()]:
+            del _http_clients[stale_loop]
+        client = _http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=_http2_available(),
+                timeout=httpx.Timeout(HTTP_TIMEOUT, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+            _http_clients[loop] = client
+    return client
+
+
+async def close_http_client():
+    """Close the running loop's HTTP client. Call before a short-lived loop (asyncio.run) ends."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _http_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+def _background_loop():
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="protoforge-io",
+                                 daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_async(coro, timeout=None):
+    """
+    Run a coroutine on the process-wide I/O loop and wait for its result.
+    Use this from synchronous code (Streamlit pages) so HTTP keep-alive
+    connections and TLS sessions survive across reruns.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result(timeout)
+
+
+def shutdown():
+    """Close pooled clients and stop the background loop. Registered with atexit."""
+    global _loop, _planner, _genai_client
+    loop = _loop
+    if loop is not None and loop.is_running():
+        try:
+            asyncio.run_coroutine_threadsafe(close_http_client(), loop).result(5)
+        except Exception as e:
+            print(f"[DEBUG] Error closing HTTP client: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+    with _lock:
+        _loop = None
+        _planner = None
+        _genai_client = None
+        _http_clients.clear()
+
+
+atexit.register(shutdown)
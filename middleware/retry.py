@@ -0,0 +1,82 @@
+# middleware/retry.py
+
+import asyncio
+import random
+
+from middleware.circuit_breaker import CircuitOpenError
+from middleware.tracing import current_span
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Fallback markers for SDK errors that only carry the status in their message
+RETRYABLE_MARKERS = ("429", "500", "502", "503", "504",
+                     "RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED")
+
+# httpx transport errors that mean the connection, not the request, failed
+TRANSIENT_ERROR_NAMES = {"ConnectError", "ReadError", "WriteError", "RemoteProtocolError"}
+
+
+def status_code_of(exc):
+    """Best-effort HTTP status of an exception from google-genai, google-api-core or httpx."""
+    for candidate in (getattr(exc, "code", None),
+                      getattr(exc, "status_code", None),
+                      getattr(getattr(exc, "response", None), "status_code", None)):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+
+def is_retryable(exc):
+    """True for 429s, 5xx responses, timeouts and dropped connections."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if "Timeout" in type(exc).__name__ or type(exc).__name__ in TRANSIENT_ERROR_NAMES:
+        return True
+    status = status_code_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    message = str(exc)
+    return any(marker in message for marker in RETRYABLE_MARKERS)
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    """Exponential backoff with full jitter: uniform(0, min(max, base * 2^attempt))."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+async def retry_async(make_call, retries=4, base_delay=1.0, max_delay=30.0, timeout=None,
+                      on_retry=None):
+    """
+    Await make_call() until it succeeds, retrying retryable errors with
+    jittered exponential backoff. make_call must return a fresh awaitable
+    on every invocation. Non-retryable errors are raised immediately.
+    on_retry(exc) is called before each retry, e.g. to count them.
+    """
+    for attempt in range(retries):
+        try:
+            if timeout is not None:
+                return await asyncio.wait_for(make_call(), timeout)
+            return await make_call()
+        except Exception as e:
+            if not is_retryable(e) or attempt == retries - 1:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            current_span().incr("retry_count")
+            if on_retry is not None:
+                on_retry(e)
+            print(f"[DEBUG] Retryable error ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def gather_limited(awaitables, concurrency=4):
+    """Run independent awaitables in parallel on one event loop, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run(a) for a in awaitables))
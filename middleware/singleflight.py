@@ -0,0 +1,65 @@
+# middleware/singleflight.py
+
+import asyncio
+import concurrent.futures
+import threading
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key runs the
+    call, everyone arriving while it is in flight awaits that same result.
+
+    The shared result is a concurrent.futures.Future, so callers on different
+    event loops (one per Streamlit session thread, the CLI, the background
+    I/O loop) can all join the same in-flight call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, make_call):
+        """Await make_call() for `key`, or the in-flight call for the same key if one exists."""
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    self._calls[key] = future
+                    self.executed += 1
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                break
+            try:
+                # shield() keeps a cancelled follower from cancelling the shared call
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except (asyncio.CancelledError, concurrent.futures.CancelledError):
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled; retry and possibly lead a new call
+
+        try:
+            result = await make_call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced,
+                    "in_flight": len(self._calls)}
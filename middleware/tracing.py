@@ -0,0 +1,251 @@
+# middleware/tracing.py
+#
+# Lightweight per-stage timing. Spans nest through a context variable, so a
+# part lookup running inside a BOM generation inside a UI request ends up in
+# the same trace, across await points and asyncio tasks.
+#
+#   with span("part.lookup", part=part_name) as s:
+#       ...
+#       s.set("cache_hit", True)
+#
+# Disabled (the default) span() returns a shared no-op object, so
+# instrumentation costs a global check and a context lookup. Enable with
+# TRACING_ENABLED=1 or enable() for the whole process, or session_tracing()
+# for one request and the jobs and tasks it starts. Finished spans are kept in memory for the Streamlit debug panel,
+# appended to TRACE_FILE as JSON lines when set, and aggregated into
+# Prometheus histograms served on METRICS_PORT.
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACE_FILE = os.getenv("TRACE_FILE")
+METRICS_PORT = os.getenv("METRICS_PORT")
+# Finished spans kept in memory for get_trace()/recent_spans()
+MAX_RECENT_SPANS = int(os.getenv("TRACE_BUFFER_SIZE", "5000"))
+
+_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = os.getenv("TRACING_ENABLED", "0") == "1"
+_current = contextvars.ContextVar("protoforge_span", default=None)
+_session_enabled = contextvars.ContextVar("protoforge_tracing", default=False)
+_lock = threading.Lock()
+_recent = deque(maxlen=MAX_RECENT_SPANS)
+_histograms = {}
+_errors = {}
+_gauges = {}
+_metrics_server = None
+
+
+class _NoopSpan:
+    trace_id = None
+    span_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key, value):
+        pass
+
+    def incr(self, key, amount=1):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes",
+                 "start", "duration", "error", "_parent", "_t0")
+
+    def __init__(self, name, attributes):
+        parent = _current.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.error = None
+        self.duration = None
+        self._parent = parent
+
+    def __enter__(self):
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        # set() rather than reset(token): spans may close in async generators
+        # that resume in a different context than the one they started in
+        _current.set(self._parent)
+        _record(self)
+        return False
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def incr(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_s": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def enabled():
+    """True if tracing is on for the whole process (not just for the current context)."""
+    return _enabled
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+@contextmanager
+def session_tracing(flag=True):
+    """Record spans for the enclosed code only, e.g. one Streamlit session's run."""
+    token = _session_enabled.set(flag)
+    try:
+        yield
+    finally:
+        _session_enabled.reset(token)
+
+
+def span(name, **attributes):
+    """Context manager timing one stage. A no-op when tracing is disabled."""
+    if not (_enabled or _session_enabled.get()):
+        return _NOOP
+    return Span(name, attributes)
+
+
+def current_span():
+    """The innermost active span, or a no-op span, for attaching attributes from deep code."""
+    return _current.get() or _NOOP
+
+
+def _record(finished):
+    with _lock:
+        _recent.append(finished)
+        histogram = _histograms.get(finished.name)
+        if histogram is None:
+            histogram = _histograms[finished.name] = {
+                "buckets": [0] * len(_BUCKETS), "count": 0, "sum": 0.0}
+        for i, bound in enumerate(_BUCKETS):
+            if finished.duration <= bound:
+                histogram["buckets"][i] += 1
+        histogram["count"] += 1
+        histogram["sum"] += finished.duration
+        if finished.error:
+            _errors[finished.name] = _errors.get(finished.name, 0) + 1
+        if TRACE_FILE:
+            line = json.dumps(finished.to_dict(), default=str, ensure_ascii=False)
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def recent_spans():
+    with _lock:
+        return [s.to_dict() for s in _recent]
+
+
+def get_trace(trace_id):
+    """All finished spans of one trace, ordered by start time."""
+    with _lock:
+        spans = [s.to_dict() for s in _recent if s.trace_id == trace_id]
+    return sorted(spans, key=lambda s: s["start"])
+
+
+def register_gauges(prefix, collect):
+    """Export the numeric values of collect() (a dict) as <prefix>_<key> gauges."""
+    with _lock:
+        _gauges[prefix] = collect
+
+
+def prometheus_text():
+    """Current metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP protoforge_span_duration_seconds Duration of traced pipeline stages.",
+        "# TYPE protoforge_span_duration_seconds histogram",
+    ]
+    with _lock:
+        histograms = {name: dict(h, buckets=list(h["buckets"])) for name, h in _histograms.items()}
+        errors = dict(_errors)
+        gauges = dict(_gauges)
+    for name, h in sorted(histograms.items()):
+        for bound, count in zip(_BUCKETS, h["buckets"]):
+            lines.append(f'protoforge_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+        lines.append(f'protoforge_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {h["count"]}')
+        lines.append(f'protoforge_span_duration_seconds_sum{{span="{name}"}} {h["sum"]}')
+        lines.append(f'protoforge_span_duration_seconds_count{{span="{name}"}} {h["count"]}')
+    lines.append("# TYPE protoforge_span_errors_total counter")
+    for name, count in sorted(errors.items()):
+        lines.append(f'protoforge_span_errors_total{{span="{name}"}} {count}')
+    for prefix, collect in sorted(gauges.items()):
+        try:
+            values = collect()
+        except Exception as e:
+            print(f"[DEBUG] Metrics collector {prefix} failed: {e}")
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE protoforge_{prefix}_{key} gauge")
+                lines.append(f"protoforge_{prefix}_{key} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """
+    Serve /metrics on `port` (default METRICS_PORT) from a daemon thread.
+    Does nothing when no port is configured or the server is already running.
+    """
+    global _metrics_server
+    port = port or METRICS_PORT
+    if not port or _metrics_server is not None:
+        return _metrics_server
+    with _lock:
+        if _metrics_server is None:
+            server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="protoforge-metrics",
+                             daemon=True).start()
+            _metrics_server = server
+            print(f"[DEBUG] Metrics served on :{port}/metrics")
+    return _metrics_server
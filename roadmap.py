@@ -1,56 +1,15 @@
 import streamlit as st
-
-def load_css(file_name):
-    """Loads a CSS file and injects it into the Streamlit app."""
-    try:
-        with open(file_name) as f:
-            st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
-    except FileNotFoundError:
-        st.error(f"CSS file not found: {file_name}. Please check the file path.")
+from frontend.rendering import load_css, card_html, parts_list_html, steps_list_html
 
 def create_card(title, description, content_html, badge_text=None, footer_note=None):
-    card_html = f"""
-    <div class="shadcn-card">
-        <div class="card-header">
-            <h3 class="card-title">{title}</h3>
-            <p class="card-description">{description}</p>
-        </div>
-        <div class="card-content">
-            {content_html}
-        </div>
-        <div class="card-footer">
-            {'<span class="badge">' + badge_text + '</span>' if badge_text else ''}
-            {'<span style="color: #64748b; font-size: 12px;">' + footer_note + '</span>' if footer_note else ''}
-        </div>
-    </div>
-    """
-    st.markdown(card_html, unsafe_allow_html=True)
+    st.markdown(card_html(title, description, content_html, badge_text, footer_note),
+                unsafe_allow_html=True)
 
 def parts_content(parts_data):
-    part_icons = {
-        "Arduino Uno": "🔧",
-        "LED": "💡",
-        "Resistor (220Ω)": "⚡"
-    }
-    if not parts_data:
-        return "<em>No parts data loaded.</em>"
-    html = '<ul class="parts-list">'
-    for part in parts_data:
-        icon = part_icons.get(part.get("name", ""), "🔹")
-        doc_link = part.get("doc", "#")
-        name = part.get("name", "Unknown Part")
-        html += f'<li><div style="display: flex; align-items: center;"><span class="part-icon">{icon}</span><span class="part-name">{name}</span></div><a href="{doc_link}" class="doc-link" target="_blank">📚 Docs</a></li>'
-    html += '</ul>'
-    return html
+    return parts_list_html(parts_data or [])
 
 def steps_content(steps_data):
-    if not steps_data:
-        return "<em>No steps data loaded.</em>"
-    html = '<ul class="steps-list">'
-    for i, step in enumerate(steps_data, 1):
-        html += f'<li><div class="step-number">{i}</div><div class="step-content">{step}</div></li>'
-    html += '</ul>'
-    return html
+    return steps_list_html(steps_data or [])
 
 def roadmap_page(parts_data=None, steps_data=None):
     st.set_page_config(page_title="Project Roadmap", page_icon="🗺️", layout="centered")
@@ -79,6 +38,28 @@ def roadmap_page(parts_data=None, steps_data=None):
                 footer_note="Complete each step in order for best results"
             )
 
-if __name__ == "__main__":
-    roadmap_page()
+@st.cache_data(show_spinner=False)
+def project_roadmap(project_id, version):
+    """Roadmap for a stored project; `version` (its updated_at) invalidates the cache on edits."""
+    from agents.registry import load_agent
+    from database.sqlite_demo.project_store import get_project_store
+
+    project = get_project_store().load_project(project_id)
+    if project is None:
+        return None
+    return load_agent("roadmap_generator", "generator").generate_roadmap(project["parts"])
 
+def session_roadmap():
+    """Roadmap of the project picked for this session (?project=<id> or the sidebar)."""
+    from database.sqlite_demo.project_store import get_project_store
+    from frontend.project_picker import session_project_id
+
+    project_id = session_project_id()
+    version = get_project_store().project_version(project_id) if project_id is not None else None
+    if version is None:
+        return None
+    return project_roadmap(project_id, version)
+
+if __name__ == "__main__":
+    roadmap = session_roadmap() or {}
+    roadmap_page(roadmap.get("parts_data"), roadmap.get("steps_data"))